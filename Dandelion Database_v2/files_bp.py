@@ -3,6 +3,8 @@ from functools import wraps
 from werkzeug.utils import secure_filename
 from pathlib import Path
 from mimetypes import guess_type
+import os
+import uuid
 from db import get_conn_cm
 from metadata_utils import extract_metadata
 
@@ -22,19 +24,18 @@ def login_required(f):
     return decorated_function
 
 def _unique_path(directory: Path, filename: str) -> Path:
+    """Reserve a new, never-used path for an upload (random token + safe name)."""
     safe = secure_filename(filename or "")
     if not safe:
         safe = "upload"
-    target = directory / safe
-    if not target.exists():
-        return target
-    stem, suffix = target.stem, target.suffix
-    i = 1
     while True:
-        candidate = directory / f"{stem}_{i}{suffix}"
-        if not candidate.exists():
-            return candidate
-        i += 1
+        candidate = directory / f"{uuid.uuid4().hex}_{safe}"
+        try:
+            fd = os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            continue
+        os.close(fd)
+        return candidate
 
 def _render_index(error=None):
     # Read column names + rows from DB (this populates the table)
@@ -84,10 +85,12 @@ def upload_file():
     try:
         file.save(str(dest))
     except Exception as e:
+        # Drop the placeholder _unique_path reserved
+        dest.unlink(missing_ok=True)
         return _render_index(error=f"Failed to save file: {e}"), 500
 
     metadata = extract_metadata(str(dest))
-    filename = dest.name
+    filename = secure_filename(file.filename) or "upload"
     size_bytes = dest.stat().st_size
     mime_type = file.mimetype or guess_type(str(dest))[0]
 
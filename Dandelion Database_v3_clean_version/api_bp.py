@@ -0,0 +1,270 @@
+from flask import Blueprint, request, abort, jsonify, g, Response
+from functools import wraps
+from werkzeug.exceptions import HTTPException
+import hashlib
+import json
+import secrets
+from db import get_conn_cm
+from pagination import page_size_from
+from search_utils import fts_query, plain_snippet
+from typed_metadata import parse_filters, prefer_correlated
+from cleanup import delete_files, sweeper
+from login_register_bp import md5_hash
+import sharing
+from files_bp import (
+    UPLOAD_DIR, HIDDEN_COLUMNS, METADATA_CHUNK_SIZE, _get_file_row, _load_metadata,
+    _list_files, _search_files, _save_uploads, _send_stored,
+)
+
+# JSON API for scripts and other programmatic clients, under /api/v1.
+#
+# Clients authenticate with a bearer token (Authorization: Bearer <token>),
+# never the cookie session: POST /api/v1/tokens with a username and password
+# returns a new token, shown once. The views run the same queries as the
+# HTML pages (files_bp), so a listing, search or download returns exactly
+# what the user would see there.
+#
+#   GET    /files                   a page of files (?scope, ?collection, ?filter,
+#                                   ?per_page, ?after/?before cursors, ?metadata=1)
+#   GET    /files?format=ndjson     every matching file with its metadata, streamed
+#                                   one JSON object per line
+#   GET    /files/<id>              one file with its metadata
+#   GET    /files/<id>/content      its content
+#   POST   /files                   upload (multipart "file", repeatable; "comment")
+#   DELETE /files/<id>              delete one file
+#   POST   /files/delete            delete {"ids": [...]}
+#   GET    /search?query=...        ranked full-text search, paged like /files
+#
+# NDJSON listings walk the same keyset pages as /files, METADATA_CHUNK_SIZE
+# rows at a time, each its own short read: an export of the whole archive
+# holds no more than one batch in memory, costs one index seek per batch, and
+# never keeps a connection or read snapshot open while the client is slow.
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# last_used_at is rewritten at most this often, so authenticating is a read
+TOKEN_TOUCH_SECONDS = 60
+
+# Server-side bookkeeping that clients have no use for
+API_HIDDEN_COLUMNS = ("storage_path", *HIDDEN_COLUMNS)
+
+api_bp = Blueprint("api", __name__)
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _token_user(token: str):
+    """The user_id a token belongs to, or None."""
+    if not token:
+        return None
+    digest = _hash_token(token)
+    with get_conn_cm() as conn:
+        row = conn.execute(
+            "SELECT user_id, last_used_at IS NULL OR last_used_at < datetime('now', ?) AS stale"
+            " FROM api_tokens WHERE token_sha256 = ?;",
+            (f"-{TOKEN_TOUCH_SECONDS} seconds", digest),
+        ).fetchone()
+        if row and row["stale"]:
+            conn.execute("UPDATE api_tokens SET last_used_at = CURRENT_TIMESTAMP WHERE token_sha256 = ?;", (digest,))
+    return row["user_id"] if row else None
+
+def token_required(f):
+    """Like files_bp.login_required, for a bearer token; sets g.user_id and g.token."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        scheme, _, token = (request.headers.get("Authorization") or "").partition(" ")
+        token = token.strip()
+        user_id = _token_user(token) if scheme.lower() == "bearer" else None
+        if user_id is None:
+            abort(401, description="A valid bearer token is required")
+        g.user_id, g.token = user_id, token
+        return f(*args, **kwargs)
+    return decorated_function
+
+@api_bp.errorhandler(HTTPException)
+def json_error(e):
+    resp = jsonify(error=e.description)
+    resp.status_code = e.code
+    if e.code == 401:
+        resp.headers["WWW-Authenticate"] = 'Bearer realm="dandelion"'
+    return resp
+
+def _file_json(row, metadata=None):
+    """A files row (plus any extra columns, like a search score) as a JSON-ready dict."""
+    data = {k: row[k] for k in row.keys() if k not in API_HIDDEN_COLUMNS}
+    if "snippet" in data:
+        data["snippet"] = plain_snippet(data["snippet"])
+    if metadata is not None:
+        data["metadata"] = metadata
+    return data
+
+def _page_json(conn, page, total_count, with_metadata=False):
+    metadata = _load_metadata(conn, [r["id"] for r in page.rows]) if with_metadata else {}
+    return {
+        "files": [_file_json(r, metadata.get(r["id"])) for r in page.rows],
+        "next": page.next_cursor,
+        "prev": page.prev_cursor,
+        "total": total_count(),
+    }
+
+def _ndjson_lines(user_id, scope, collection_id, filters):
+    """A listing's files (with metadata) as one JSON object per line, a page per chunk."""
+    after = None
+    # One plan for the whole export; the choice does not depend on the cursor
+    with get_conn_cm() as conn:
+        correlated = bool(filters) and prefer_correlated(conn, filters, METADATA_CHUNK_SIZE)
+    while True:
+        with get_conn_cm() as conn:
+            listed = _list_files(
+                conn, user_id, scope, collection_id, filters, METADATA_CHUNK_SIZE,
+                after=after, correlated=correlated,
+            )
+            if listed is None:
+                return
+            page = listed[0]
+            metadata = _load_metadata(conn, [r["id"] for r in page.rows])
+        if page.rows:
+            yield "".join(
+                json.dumps(_file_json(r, metadata[r["id"]]), separators=(",", ":")) + "\n"
+                for r in page.rows
+            )
+        if not page.next_cursor:
+            return
+        after = page.next_cursor
+
+def _wants_ndjson():
+    if request.args.get("format") == "ndjson":
+        return True
+    best = request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+@api_bp.post("/tokens")
+def create_token():
+    """Exchange a username and password (JSON or form) for a new API token."""
+    data = request.get_json(silent=True) or request.form
+    username = (data.get("username") or "").strip()
+    password = data.get("password") or ""
+    name = (data.get("name") or "").strip() or None
+    with get_conn_cm() as conn:
+        row = conn.execute(
+            "SELECT id FROM users WHERE username = ? AND password_md5 = ?;",
+            (username, md5_hash(password)),
+        ).fetchone()
+        if not username or not password or not row:
+            abort(401, description="Invalid credentials")
+        token = secrets.token_urlsafe(32)
+        conn.execute(
+            "INSERT INTO api_tokens (token_sha256, user_id, name) VALUES (?, ?, ?);",
+            (_hash_token(token), row["id"], name),
+        )
+    return jsonify(token=token, name=name), 201
+
+@api_bp.delete("/tokens/current")
+@token_required
+def revoke_token():
+    """Revoke the token this request was made with."""
+    with get_conn_cm() as conn:
+        conn.execute("DELETE FROM api_tokens WHERE token_sha256 = ?;", (_hash_token(g.token),))
+    return "", 204
+
+@api_bp.get("/files")
+@token_required
+def list_files():
+    """
+    The files the user lists in a scope, newest first, as a keyset page
+    ({"files", "next", "prev", "total"}) or, for ?format=ndjson or
+    Accept: application/x-ndjson, all of them streamed.
+    """
+    collection_id = request.args.get("collection", type=int)
+    scope = sharing.SHARED if request.args.get("scope") == sharing.SHARED else sharing.MINE
+    try:
+        filters = parse_filters(request.args.getlist("filter"))
+    except ValueError as e:
+        abort(400, description=str(e))
+
+    if _wants_ndjson():
+        with get_conn_cm() as conn:
+            if sharing.scope_sql(conn, g.user_id, scope, collection_id) is None:
+                abort(404, description="Collection not found")
+        return Response(_ndjson_lines(g.user_id, scope, collection_id, filters), mimetype=NDJSON_MIMETYPE)
+
+    page_size = page_size_from(request.args.get("per_page"))
+    with get_conn_cm() as conn:
+        listed = _list_files(
+            conn, g.user_id, scope, collection_id, filters, page_size,
+            after=request.args.get("after"), before=request.args.get("before"),
+        )
+        if listed is None:
+            abort(404, description="Collection not found")
+        return _page_json(conn, *listed, with_metadata=request.args.get("metadata") == "1")
+
+@api_bp.get("/files/<int:file_id>")
+@token_required
+def get_file(file_id: int):
+    row = _get_file_row(file_id, g.user_id)
+    if not row:
+        abort(404, description="File not found")
+    with get_conn_cm() as conn:
+        metadata = _load_metadata(conn, [file_id])[file_id]
+    return _file_json(row, metadata)
+
+@api_bp.get("/files/<int:file_id>/content")
+@token_required
+def get_file_content(file_id: int):
+    row = _get_file_row(file_id, g.user_id)
+    if not row:
+        abort(404, description="File not found")
+    return _send_stored(row)
+
+@api_bp.post("/files")
+@token_required
+def upload_files():
+    """Store the uploaded files; returns them (metadata may still be pending)."""
+    uploads = [f for f in request.files.getlist("file") if f and f.filename]
+    if not uploads:
+        abort(400, description="No file uploaded (multipart field \"file\")")
+    comment = (request.form.get("comment") or "").strip() or None
+    try:
+        file_ids = _save_uploads(uploads, g.user_id, comment)
+    except Exception as e:
+        abort(500, description=f"Failed to save file: {e}")
+    with get_conn_cm() as conn:
+        rows = conn.execute(
+            "SELECT * FROM files WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id;",
+            (json.dumps(file_ids),),
+        ).fetchall()
+    return jsonify(files=[_file_json(r) for r in rows]), 201
+
+@api_bp.delete("/files/<int:file_id>")
+@token_required
+def delete_file(file_id: int):
+    with get_conn_cm() as conn:
+        deleted = delete_files(conn, sharing.owned_ids(conn, g.user_id, [file_id]), UPLOAD_DIR)
+    if not deleted:
+        abort(404, description="File not found")
+    sweeper.notify()
+    return "", 204
+
+@api_bp.post("/files/delete")
+@token_required
+def delete_selected():
+    """Delete {"ids": [...]} in one transaction; returns the ids actually deleted (the user's own)."""
+    ids = (request.get_json(silent=True) or {}).get("ids")
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        abort(400, description="Expected {\"ids\": [file ids]}")
+    with get_conn_cm() as conn:
+        deleted = delete_files(conn, sharing.owned_ids(conn, g.user_id, ids), UPLOAD_DIR)
+    sweeper.notify()
+    return {"deleted": sorted(r["id"] for r in deleted)}
+
+@api_bp.get("/search")
+@token_required
+def search():
+    """Full-text search, as on /files/search: {"files" (with score and snippet), "next", "prev", "total"}."""
+    page_size = page_size_from(request.args.get("per_page"))
+    with get_conn_cm() as conn:
+        page, total_count = _search_files(
+            conn, g.user_id, fts_query(request.args.get("query") or ""), page_size,
+            after=request.args.get("after"), before=request.args.get("before"),
+        )
+        return _page_json(conn, page, total_count, with_metadata=request.args.get("metadata") == "1")
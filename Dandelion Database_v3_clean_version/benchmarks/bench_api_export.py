@@ -0,0 +1,120 @@
+"""
+Benchmark: exporting every file and its metadata through the JSON API.
+
+Fills the archive with --files files (one user, --keys metadata keys each)
+and reads all of them back with a bearer token, two ways:
+
+  pages     GET /api/v1/files?metadata=1&per_page=N, following "next"
+  ndjson    GET /api/v1/files?format=ndjson, one streamed response
+
+reporting wall time, files per second and the peak Python memory
+(tracemalloc, in a second untimed run) while the response is consumed
+chunk by chunk. The client only keeps a checksum of what it read, so the
+peak is what serving the export costs; both ways must give the same one.
+
+    python benchmarks/bench_api_export.py --files 50000 --keys 12
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+os.environ["TEMPLATE_CACHE_DIR"] = os.path.join(_TMP, "TemplateCache")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app  # noqa: E402
+from db import get_conn_cm  # noqa: E402
+
+
+def populate(user_id: int, n_files: int, n_keys: int):
+    with get_conn_cm() as conn:
+        conn.executemany(
+            "INSERT INTO files (user_id, filename, mime_type, size_bytes, storage_path, sha256) VALUES (?, ?, ?, ?, ?, ?);",
+            ((user_id, f"survey_{i}.pdf", "application/pdf", 1024 * i, f"/tmp/{i}.pdf", f"{i:064x}")
+             for i in range(n_files)),
+        )
+        conn.executemany(
+            "INSERT INTO metadata (file_id, meta_key, meta_value) SELECT id, ?, ? || id FROM files;",
+            ((f"key_{k}", f"value {k} of file ") for k in range(n_keys)),
+        )
+
+
+def checksum(f):
+    """Order-independent: the files come newest first from pages, in id order from ndjson."""
+    return zlib.crc32(json.dumps([f["id"], f["metadata"]], sort_keys=True).encode())
+
+
+def read_pages(client, headers, per_page):
+    count, total, url = 0, 0, f"/api/v1/files?metadata=1&per_page={per_page}"
+    while url:
+        page = client.get(url, headers=headers).get_json()
+        count += len(page["files"])
+        total += sum(checksum(f) for f in page["files"])
+        url = page["next"] and f"/api/v1/files?metadata=1&per_page={per_page}&after={page['next']}"
+    return count, total
+
+
+def read_ndjson(client, headers):
+    count, total, buffered = 0, 0, b""
+    resp = client.get("/api/v1/files?format=ndjson", headers=headers, buffered=False)
+    try:
+        assert resp.status_code == 200, resp.status_code
+        for chunk in resp.response:
+            lines = (buffered + chunk).split(b"\n")
+            buffered = lines.pop()
+            for line in lines:
+                count += 1
+                total += checksum(json.loads(line))
+    finally:
+        resp.close()
+    return count, total
+
+
+def measured(fn, *args):
+    """(result, seconds, peak traced MiB); tracemalloc slows Python down, so it gets its own run."""
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--keys", type=int, default=12, help="metadata keys per file")
+    parser.add_argument("--per-page", type=int, default=200)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    client.post("/register", data={"username": "bench", "password": "bench"})
+    token = client.post("/api/v1/tokens", json={"username": "bench", "password": "bench"}).get_json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    with get_conn_cm() as conn:
+        user_id = conn.execute("SELECT id FROM users WHERE username = 'bench';").fetchone()[0]
+    populate(user_id, args.files, args.keys)
+
+    paged, pages_t, pages_mb = measured(read_pages, client, headers, args.per_page)
+    streamed, ndjson_t, ndjson_mb = measured(read_ndjson, client, headers)
+    assert streamed[0] == args.files, streamed[0]
+    assert streamed == paged, "NDJSON export differs from the paged listing"
+
+    print(f"{'mode':<8} | {'seconds':>8} {'files/s':>9} | {'peak MiB':>8}")
+    print(f"{'pages':<8} | {pages_t:>8.2f} {args.files / pages_t:>9.0f} | {pages_mb:>8.1f}")
+    print(f"{'ndjson':<8} | {ndjson_t:>8.2f} {args.files / ndjson_t:>9.0f} | {ndjson_mb:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
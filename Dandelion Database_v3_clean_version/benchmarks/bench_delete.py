@@ -0,0 +1,107 @@
+"""
+Benchmark: deleting files - one request per file vs the batch delete.
+
+Creates --files blob-backed rows (a share of them pointing at the same
+content) and deletes them in --batch sized selections three ways:
+
+  per-file   the old delete_file: look the row up on one connection, delete
+             metadata, row and blob on another, unlink before commit
+  batch      cleanup.delete_files on one connection, unlinks left queued
+  + sweep    the same followed by cleanup.sweep, i.e. the total disk work
+
+and checks that no rows, blobs rows or blob files are left afterwards.
+
+    python benchmarks/bench_delete.py --files 20000 --batch 500
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from blobstore import blob_path, register_blob  # noqa: E402
+from cleanup import delete_files, sweep  # noqa: E402
+from db import get_conn_cm, init_db, insert_files  # noqa: E402
+from files_bp import BLOB_DIR, UPLOAD_DIR  # noqa: E402
+
+# Every SHARED-th file repeats the previous file's content
+SHARED = 4
+
+
+def populate(n: int):
+    records = []
+    with get_conn_cm() as conn:
+        for i in range(n):
+            content = f"content {i - 1 if i % SHARED == 0 and i else i}".encode()
+            sha256 = hashlib.sha256(content).hexdigest()
+            path = blob_path(BLOB_DIR, sha256)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(content)
+            register_blob(conn, path, sha256, len(content))
+            records.append({
+                "filename": f"file_{i}.txt", "size_bytes": len(content), "storage_path": str(path),
+                "sha256": sha256, "metadata": {"lines": 1, "encoding": "ascii"},
+            })
+        return insert_files(conn, records)
+
+
+def per_file(ids):
+    for file_id in ids:
+        with get_conn_cm() as conn:
+            row = conn.execute("SELECT * FROM files WHERE id = ?", (file_id,)).fetchone()
+        with get_conn_cm() as conn:
+            conn.execute("DELETE FROM metadata WHERE file_id = ?", (file_id,))
+            conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            freed = conn.execute(
+                "DELETE FROM blobs WHERE sha256 = ? AND refcount <= 0 RETURNING storage_path;",
+                (row["sha256"],),
+            ).fetchone()
+            if freed:
+                os.unlink(freed["storage_path"])
+
+
+def batch(ids):
+    with get_conn_cm() as conn:
+        delete_files(conn, ids, UPLOAD_DIR)
+
+
+def run(label, fn, ids, size, then_sweep=False):
+    start = time.perf_counter()
+    for i in range(0, len(ids), size):
+        fn(ids[i:i + size])
+        if then_sweep:
+            sweep()
+    elapsed = time.perf_counter() - start
+    sweep()
+    with get_conn_cm() as conn:
+        left = conn.execute("SELECT COUNT(*) FROM files;").fetchone()[0]
+        blobs = conn.execute("SELECT COUNT(*) FROM blobs;").fetchone()[0]
+    on_disk = sum(1 for p in BLOB_DIR.rglob("*") if p.is_file())
+    assert left == 0 and blobs == 0 and on_disk == 0, (left, blobs, on_disk)
+    print(f"{label:<10} | {len(ids):>7} | {elapsed:>8.2f} | {len(ids) / elapsed:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=500, help="files selected per delete request")
+    args = parser.parse_args()
+
+    init_db()
+    print(f"{'method':<10} | {'files':>7} | {'seconds':>8} | {'files/s':>9}")
+    run("per-file", per_file, populate(args.files), args.batch)
+    run("batch", batch, populate(args.files), args.batch)
+    run("+ sweep", batch, populate(args.files), args.batch, then_sweep=True)
+
+
+if __name__ == "__main__":
+    main()
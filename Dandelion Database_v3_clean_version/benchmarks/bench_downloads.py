@@ -0,0 +1,148 @@
+"""
+Benchmark: full, ranged, resumed and revalidated downloads.
+
+Uploads one `--size-mb` file through the real app with Flask's test client,
+then times a full download, a transfer interrupted at `--cut` and resumed
+with a Range request, and a browser revalidating a copy it already has
+(If-None-Match / If-Modified-Since). Every run also checks the status codes,
+headers and bytes it gets back, so a regression fails loudly instead of just
+looking fast.
+
+    python benchmarks/bench_downloads.py --size-mb 256 --cut 0.6 --repeat 5
+"""
+import argparse
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+os.environ["TEMPLATE_CACHE_DIR"] = os.path.join(_TMP, "TemplateCache")
+os.environ["THUMB_CACHE_DIR"] = os.path.join(_TMP, "ThumbCache")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app  # noqa: E402
+
+URL = "/files/files/1/download"
+
+
+def upload(client, size: int) -> bytes:
+    body = os.urandom(size)
+    resp = client.post(
+        "/files/upload",
+        data={"file": (io.BytesIO(body), "dataset.bin")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 302, resp.status_code
+    return body
+
+
+def read(resp) -> bytes:
+    """Drain a (possibly streamed) response body."""
+    try:
+        return b"".join(resp.response)
+    finally:
+        resp.close()
+
+
+def full(client, body):
+    resp = client.get(URL, buffered=False)
+    assert resp.status_code == 200, resp.status_code
+    assert resp.headers["Accept-Ranges"] == "bytes"
+    assert resp.headers["ETag"] == f'"{hashlib.sha256(body).hexdigest()}"'
+    assert "no-store" not in resp.headers["Cache-Control"]
+    assert read(resp) == body
+    return resp.headers["ETag"], resp.headers["Last-Modified"]
+
+
+def resumed(client, body, cut, etag):
+    """Take the first `cut` bytes, then fetch the rest with Range + If-Range."""
+    first = client.get(URL, headers={"Range": f"bytes=0-{cut - 1}"}, buffered=False)
+    assert first.status_code == 206, first.status_code
+    assert first.headers["Content-Range"] == f"bytes 0-{cut - 1}/{len(body)}"
+    head = read(first)
+    rest = client.get(URL, headers={"Range": f"bytes={cut}-", "If-Range": etag}, buffered=False)
+    assert rest.status_code == 206, rest.status_code
+    assert rest.headers["Content-Range"] == f"bytes {cut}-{len(body) - 1}/{len(body)}"
+    assert head + read(rest) == body
+    return len(body)
+
+
+def stale_if_range(client, body, cut):
+    """A resume against a different version must get the whole file back."""
+    resp = client.get(URL, headers={"Range": f"bytes={cut}-", "If-Range": '"not-this-one"'}, buffered=False)
+    assert resp.status_code == 200, resp.status_code
+    assert read(resp) == body
+
+
+def revalidate(client, etag, last_modified):
+    for headers in ({"If-None-Match": etag}, {"If-Modified-Since": last_modified}):
+        resp = client.get(URL, headers=headers, buffered=False)
+        assert resp.status_code == 304, (headers, resp.status_code)
+        assert read(resp) == b""
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--cut", type=float, default=0.6, help="fraction received before the 'interruption'")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    # Uploads record their uploader, so the session needs a real user
+    client.post("/register", data={"username": "bench", "password": "bench"})
+    client.post("/login", data={"username": "bench", "password": "bench"})
+    size = args.size_mb * 1024 * 1024
+    body = upload(client, size)
+    cut = int(size * args.cut)
+
+    etag, last_modified = full(client, body)
+    stale_if_range(client, body, cut)
+    revalidate(client, etag, last_modified)
+
+    def run_full():
+        full(client, body)
+        return size
+
+    def run_tail():
+        read(client.get(URL, headers={"Range": f"bytes={cut}-"}, buffered=False))
+        return size - cut
+
+    def run_revalidate():
+        revalidate(client, etag, last_modified)
+        return 0
+
+    runs = [
+        ("full download", run_full),
+        (f"resume from {args.cut:.0%} (2 requests)", lambda: resumed(client, body, cut, etag)),
+        ("remaining bytes only", run_tail),
+        ("revalidate (304 x2)", run_revalidate),
+    ]
+    print(f"{args.size_mb} MiB file, best of {args.repeat}; all self-checks passed")
+    print(f"{'request':<32} | {'ms':>9} | {'MiB sent':>9} | {'MiB/s':>9}")
+    for label, fn in runs:
+        elapsed, sent = timed(fn, args.repeat)
+        mib = sent / 1024 / 1024
+        rate = f"{mib / elapsed:>9.0f}" if sent else f"{'-':>9}"
+        print(f"{label:<32} | {elapsed * 1000:>9.2f} | {mib:>9.1f} | {rate}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: streaming ZIP export throughput and peak memory.
+
+Uploads `--files` files of `--size-kb` each (half compressible text, half
+random "PDFs" that are stored rather than deflated), then exports growing
+subsets through /files/export with Flask's test client. The response is
+consumed chunk by chunk and discarded, the way a client socket would, and
+tracemalloc reports the peak Python heap while it streams; that peak should
+stay flat as the export grows.
+
+    python benchmarks/bench_export.py --files 2000 --size-kb 256
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+os.environ["TEMPLATE_CACHE_DIR"] = os.path.join(_TMP, "TemplateCache")
+os.environ["THUMB_CACHE_DIR"] = os.path.join(_TMP, "ThumbCache")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app  # noqa: E402
+from extraction_worker import worker  # noqa: E402
+
+
+def upload(client, count: int, size: int):
+    for i in range(count):
+        if i % 2:
+            body, name = b"%PDF-1.4\n" + os.urandom(size), f"scan_{i}.pdf"
+        else:
+            body, name = (f"sample {i}\tA\tC\tG\tT\n" * (size // 20 + 1)).encode()[:size], f"reads_{i}.txt"
+        resp = client.post(
+            "/files/upload",
+            data={"file": (io.BytesIO(body), name)},
+            content_type="multipart/form-data",
+        )
+        assert resp.status_code == 302, resp.status_code
+    worker.wait_idle(timeout=600)
+
+
+def export(client, count: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    resp = client.post("/files/export", data={"ids": [str(i) for i in range(1, count + 1)]}, buffered=False)
+    assert resp.status_code == 200, resp.status_code
+    sent = 0
+    try:
+        for chunk in resp.response:
+            sent += len(chunk)
+    finally:
+        resp.close()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, sent, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--size-kb", type=int, default=256)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    # Uploads record their uploader, so the session needs a real user
+    client.post("/register", data={"username": "bench", "password": "bench"})
+    client.post("/login", data={"username": "bench", "password": "bench"})
+    upload(client, args.files, args.size_kb * 1024)
+
+    print(f"{'files':>7} | {'input MiB':>9} | {'zip MiB':>9} | {'seconds':>8} | {'MiB/s':>7} | {'peak heap MiB':>13}")
+    count = max(1, args.files // 8)
+    while True:
+        count = min(count, args.files)
+        elapsed, sent, peak = export(client, count)
+        mib_in = count * args.size_kb / 1024
+        print(f"{count:>7} | {mib_in:>9.1f} | {sent / 2**20:>9.1f} | {elapsed:>8.2f} | "
+              f"{mib_in / elapsed:>7.0f} | {peak / 2**20:>13.2f}")
+        if count == args.files:
+            break
+        count *= 2
+
+
+if __name__ == "__main__":
+    main()
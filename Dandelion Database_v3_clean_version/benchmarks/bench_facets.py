@@ -0,0 +1,111 @@
+"""
+Benchmark: facet sidebar - GROUP BY over files vs the facet_counts table.
+
+Grows a synthetic archive through the requested sizes and, at each size,
+times one user's sidebar breakdowns (MIME type, month, size bucket) computed
+with GROUP BY scans against facets.load_facets, and checks that the
+trigger-maintained counts equal the scanned ones for every owner. Insert throughput with the
+facet triggers is reported too, since they are what keeps the counts current.
+
+    python benchmarks/bench_facets.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db import get_conn_cm, init_db  # noqa: E402
+from facets import load_facets, rebuild_facet_counts  # noqa: E402
+
+MIME_TYPES = ("application/pdf", "image/jpeg", "image/png", "text/csv", "text/plain", "application/zip")
+USERS = 20
+
+# Without facet_counts the sidebar is these, over the whole table, per request
+GROUP_BY = {
+    "mime_type": "SELECT user_id, COALESCE(mime_type, ''), COUNT(*) FROM files GROUP BY 1, 2;",
+    "month": "SELECT user_id, COALESCE(strftime('%Y-%m', created_at), ''), COUNT(*) FROM files GROUP BY 1, 2;",
+    "size": """
+        SELECT user_id, COALESCE((SELECT MAX(lower) FROM size_buckets WHERE lower <= size_bytes), ''), COUNT(*)
+        FROM files GROUP BY 1, 2;
+    """,
+}
+
+
+def populate(conn, start: int, stop: int, rng: random.Random, batch: int = 10000):
+    for lo in range(start, stop, batch):
+        hi = min(lo + batch, stop)
+        conn.executemany(
+            "INSERT INTO files (id, user_id, filename, mime_type, size_bytes, storage_path, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?);",
+            (
+                (i, rng.randint(1, USERS), f"file_{i}", rng.choice(MIME_TYPES),
+                 int(rng.lognormvariate(12, 2.5)), f"/tmp/{i}",
+                 f"20{rng.randint(18, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 12:00:00")
+                for i in range(lo + 1, hi + 1)
+            ),
+        )
+        conn.commit()
+
+
+def scanned(conn):
+    counts = {}
+    for facet, sql in GROUP_BY.items():
+        for owner, value, count in conn.execute(sql):
+            counts[(owner, facet, str(value))] = count
+    return counts
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--seed", type=int, default=670)
+    args = parser.parse_args()
+
+    init_db()
+    rng = random.Random(args.seed)
+    have = 0
+    with get_conn_cm() as conn:
+        conn.executemany(
+            "INSERT INTO users (id, username, password_md5) VALUES (?, ?, '');",
+            ((i, f"user{i}") for i in range(1, USERS + 1)),
+        )
+        print(f"{'rows':>9} | {'insert/s':>9} | {'GROUP BY ms':>11} | {'facets ms':>9}")
+        for n in sorted(args.sizes):
+            start = time.perf_counter()
+            populate(conn, have, n, rng)
+            insert_rate = (n - have) / (time.perf_counter() - start)
+            have = n
+            counts, scan_t = timed(scanned, conn)
+            _, facet_t = timed(load_facets, conn, 1)
+            # The triggers must agree with a full recount
+            stored = {
+                (r["owner"], r["facet"], r["value"]): r["count"]
+                for r in conn.execute("SELECT owner, facet, value, count FROM facet_counts;")
+            }
+            assert stored == counts, "facet_counts out of step with files"
+            print(f"{n:>9} | {insert_rate:>9.0f} | {scan_t * 1000:>11.1f} | {facet_t * 1000:>9.2f}")
+        start = time.perf_counter()
+        rebuild_facet_counts(conn)
+        print(f"-- rebuild_facet_counts over {have} rows: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: image metadata throughput (images/second).
+
+Generates a corpus in a temp dir (camera JPEGs with EXIF and GPS, a PNG
+with an ICC profile, a 16-bit TIFF stack and an animated WebP) plus any
+WebP/TIFF/JPEG/PNG files under --extra (defaults to the old upload dir in
+"Dandelion Database"), and compares per file type:
+
+  open      Image.open + size, what extract_metadata used to do
+  probe     image_probe.probe_image (header only, EXIF/ICC/frames)
+  decode    Image.open + load(), i.e. what reading pixels would cost
+
+    python benchmarks/bench_image_metadata.py --repeat 20 --stack 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from PIL import Image  # noqa: E402
+
+from image_probe import probe_image  # noqa: E402
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".webp", ".gif"}
+
+
+def camera_jpeg(path: Path, size=(4000, 3000)):
+    exif = Image.Exif()
+    exif[0x010F] = "Dandelion Optics"
+    exif[0x0110] = "FieldCam 2"
+    exif.get_ifd(0x8769)[0x9003] = "2024:05:17 14:03:22"
+    gps = exif.get_ifd(0x8825)
+    gps.update({1: "N", 2: (44.0, 58.0, 12.5), 3: "W", 4: (93.0, 15.0, 41.0), 5: 0, 6: 256.0})
+    Image.effect_noise(size, 40).convert("RGB").save(path, "JPEG", exif=exif, quality=90)
+
+
+def corpus(directory: Path, stack: int):
+    from PIL import ImageCms
+
+    paths = {}
+    paths["camera.jpg"] = directory / "camera.jpg"
+    camera_jpeg(paths["camera.jpg"])
+    paths["icc.png"] = directory / "icc.png"
+    srgb = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+    Image.new("RGB", (2000, 2000), "yellow").save(paths["icc.png"], icc_profile=srgb)
+    paths[f"stack-{stack}.tif"] = directory / "stack.tif"
+    frames = [Image.effect_noise((512, 512), 30).convert("I;16") for _ in range(stack)]
+    frames[0].save(paths[f"stack-{stack}.tif"], save_all=True, append_images=frames[1:])
+    paths["animated.webp"] = directory / "animated.webp"
+    anim = [Image.effect_noise((640, 480), 60).convert("RGB") for _ in range(60)]
+    anim[0].save(paths["animated.webp"], save_all=True, append_images=anim[1:], duration=40, loop=0)
+    return paths
+
+
+def old_open(path):
+    with Image.open(path) as img:
+        return f"{img.width}x{img.height}", img.format
+
+
+def full_decode(path):
+    with Image.open(path) as img:
+        for frame in range(getattr(img, "n_frames", 1)):
+            img.seek(frame)
+            img.load()
+
+
+def rate(fn, path, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(path)
+    return repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--stack", type=int, default=100, help="frames in the TIFF stack")
+    parser.add_argument("--extra", type=Path, default=ROOT.parent / "Dandelion Database",
+                        help="directory of real images to include")
+    parser.add_argument("--no-decode", action="store_true", help="skip the (slow) full decode column")
+    args = parser.parse_args()
+
+    paths = corpus(Path(tempfile.mkdtemp(prefix="dandelion-bench-")), args.stack)
+    if args.extra.is_dir():
+        for dirpath, _, names in os.walk(args.extra):
+            for name in sorted(names):
+                if Path(name).suffix.lower() in IMAGE_SUFFIXES:
+                    paths[name] = Path(dirpath, name)
+
+    print(f"{'file':<22} | {'KiB':>7} | {'open/s':>8} | {'probe/s':>8} | {'decode/s':>8} | probe result")
+    for label, path in paths.items():
+        opened = rate(old_open, path, args.repeat)
+        probed = rate(probe_image, path, args.repeat)
+        decoded = "-" if args.no_decode else f"{rate(full_decode, path, max(1, args.repeat // 10)):.1f}"
+        meta = probe_image(path)
+        summary = ", ".join(
+            f"{k}={meta[k]}" for k in ("resolution", "mode", "bit_depth", "frames", "icc_profile",
+                                      "camera_model", "captured_at", "gps_latitude", "gps_longitude")
+            if k in meta
+        )
+        print(f"{label:<22} | {path.stat().st_size / 1024:>7.0f} | {opened:>8.0f} | {probed:>8.0f} | {decoded:>8} | {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: metadata loading for the /files index page.
+
+Compares the old per-row lookup (one SELECT per file) with the batched
+files_bp._load_metadata loader, reporting query count and latency as the
+number of files grows.
+
+    python benchmarks/bench_index_metadata.py --sizes 1000 10000 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db import get_conn_cm, init_db  # noqa: E402
+from files_bp import _load_metadata  # noqa: E402
+
+META_KEYS = ("mime_type", "resolution", "format")
+
+
+def populate(conn, n_files: int):
+    conn.execute("DELETE FROM metadata;")
+    conn.execute("DELETE FROM files;")
+    conn.executemany(
+        "INSERT INTO files (id, filename, mime_type, size_bytes, storage_path) VALUES (?, ?, ?, ?, ?);",
+        ((i, f"file_{i}.png", "image/png", 1024, f"/tmp/file_{i}.png") for i in range(1, n_files + 1)),
+    )
+    conn.executemany(
+        "INSERT INTO metadata (file_id, meta_key, meta_value) VALUES (?, ?, ?);",
+        ((i, k, f"{k}-{i}") for i in range(1, n_files + 1) for k in META_KEYS),
+    )
+    conn.commit()
+
+
+def load_per_row(conn, file_ids):
+    """The pre-batching loader: one metadata query per file."""
+    result = {}
+    for file_id in file_ids:
+        rows = conn.execute(
+            "SELECT meta_key, meta_value FROM metadata WHERE file_id = ?",
+            (file_id,),
+        ).fetchall()
+        result[file_id] = {m["meta_key"]: m["meta_value"] for m in rows}
+    return result
+
+
+def measure(conn, loader, file_ids):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    start = time.perf_counter()
+    result = loader(conn, file_ids)
+    elapsed = time.perf_counter() - start
+    conn.set_trace_callback(None)
+    return result, len(statements), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    args = parser.parse_args()
+
+    init_db()
+    print(f"{'files':>8} | {'per-row queries':>15} {'per-row ms':>11} | {'batched queries':>15} {'batched ms':>11} | speedup")
+    with get_conn_cm() as conn:
+        for n in args.sizes:
+            populate(conn, n)
+            file_ids = [r["id"] for r in conn.execute("SELECT id FROM files ORDER BY created_at DESC, id DESC;")]
+            old, old_q, old_t = measure(conn, load_per_row, file_ids)
+            new, new_q, new_t = measure(conn, _load_metadata, file_ids)
+            assert old == new, "batched loader returned different metadata"
+            print(f"{n:>8} | {old_q:>15} {old_t * 1000:>11.1f} | {new_q:>15} {new_t * 1000:>11.1f} | {old_t / new_t:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
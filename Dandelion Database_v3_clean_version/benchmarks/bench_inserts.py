@@ -0,0 +1,100 @@
+"""
+Benchmark: files + metadata insert throughput.
+
+Compares the old upload write path (INSERT file, SELECT last_insert_rowid(),
+one INSERT per metadata key, one commit per file) with db.insert_files,
+both one file per transaction (single upload) and many files per
+transaction (multi-file upload / bulk_import).
+
+    python benchmarks/bench_inserts.py --files 5000 --keys 8 --batch 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db import get_conn_cm, init_db, insert_files  # noqa: E402
+
+
+def make_files(n: int, keys: int):
+    return [
+        {
+            "filename": f"file_{i}.png",
+            "mime_type": "image/png",
+            "size_bytes": 1024,
+            "storage_path": f"/tmp/file_{i}.png",
+            "metadata": {f"key_{k}": f"value {i} {k}" for k in range(keys)},
+        }
+        for i in range(n)
+    ]
+
+
+def reset():
+    with get_conn_cm() as conn:
+        conn.execute("DELETE FROM metadata;")
+        conn.execute("DELETE FROM files;")
+
+
+def old_path(files, batch):
+    """The pre-refactor upload_file write path, one upload per transaction."""
+    for f in files:
+        with get_conn_cm() as conn:
+            conn.execute(
+                """
+                INSERT INTO files (filename, mime_type, size_bytes, storage_path, comment)
+                VALUES (?, ?, ?, ?, ?);
+                """,
+                (f["filename"], f["mime_type"], f["size_bytes"], f["storage_path"], None),
+            )
+            file_id = conn.execute("SELECT last_insert_rowid();").fetchone()[0]
+            for key, value in f["metadata"].items():
+                conn.execute(
+                    """
+                    INSERT INTO metadata (file_id, meta_key, meta_value)
+                    VALUES (?, ?, ?);
+                    """,
+                    (file_id, key, value),
+                )
+
+
+def new_path(files, batch):
+    for start in range(0, len(files), batch):
+        with get_conn_cm() as conn:
+            insert_files(conn, files[start:start + batch])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--keys", type=int, default=8, help="metadata keys per file")
+    parser.add_argument("--batch", type=int, default=500, help="files per transaction for the batched run")
+    args = parser.parse_args()
+
+    init_db()
+    files = make_files(args.files, args.keys)
+    runs = [
+        ("old: per-key INSERT, 1 file/txn", old_path, 1),
+        ("insert_files, 1 file/txn", new_path, 1),
+        (f"insert_files, {args.batch} files/txn", new_path, args.batch),
+    ]
+    print(f"{args.files} files x {args.keys} metadata keys")
+    print(f"{'path':<36} | {'seconds':>8} | {'files/s':>9} | {'rows/s':>9}")
+    for label, fn, batch in runs:
+        reset()
+        start = time.perf_counter()
+        fn(files, batch)
+        elapsed = time.perf_counter() - start
+        rows = args.files * (1 + args.keys)
+        print(f"{label:<36} | {elapsed:>8.2f} | {args.files / elapsed:>9.0f} | {rows / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
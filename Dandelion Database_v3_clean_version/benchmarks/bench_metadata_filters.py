@@ -0,0 +1,127 @@
+"""
+Benchmark: metadata filters - Python-side parsing vs the typed indexes.
+
+Grows a synthetic archive (PDFs with pages/created, images with
+resolution/width/height/captured_at) and, at each size, times a few filters
+two ways:
+
+  scan      read every metadata row for the key and compare in Python,
+            parsing "4000x3000" and dates from text (the pre-typed way)
+  indexed   typed_metadata.filter_sql through fetch_page (first page) plus
+            the match count, i.e. what /files/?filter= runs. The count is
+            timed separately, since the page streams out before it runs.
+
+    python benchmarks/bench_metadata_filters.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db import get_conn_cm, init_db, save_metadata  # noqa: E402
+from pagination import fetch_page  # noqa: E402
+from typed_metadata import filter_sql, parse_filters, parse_date, prefer_correlated  # noqa: E402
+
+PAGE_SIZE = 50
+# filter -> (key, python predicate on the text value) for the scan baseline
+FILTERS = {
+    "pages>100": ("pages", lambda v: int(v) > 100),
+    "width>=4000": ("resolution", lambda v: int(v.split("x")[0]) >= 4000),
+    "captured_at>=2024-06-01": ("captured_at", lambda v: parse_date(v) >= "2024-06-01 00:00:00"),
+    "pages>1000": ("pages", lambda v: int(v) > 1000),
+    "pages>1195": ("pages", lambda v: int(v) > 1195),
+}
+
+
+def populate(conn, start: int, stop: int, rng: random.Random, batch: int = 10000):
+    for lo in range(start, stop, batch):
+        hi = min(lo + batch, stop)
+        rows, metadata = [], {}
+        for i in range(lo + 1, hi + 1):
+            if i % 2:
+                rows.append((i, f"report_{i}.pdf", "application/pdf", f"/tmp/{i}.pdf"))
+                metadata[i] = {
+                    "pages": rng.randint(1, 1200),
+                    "created": f"20{rng.randint(10, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00Z",
+                }
+            else:
+                rows.append((i, f"scan_{i}.jpg", "image/jpeg", f"/tmp/{i}.jpg"))
+                width = rng.choice((640, 1920, 3000, 4000, 6000))
+                metadata[i] = {
+                    "resolution": f"{width}x{width * 3 // 4}",
+                    "captured_at": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T09:30:00",
+                }
+        conn.executemany(
+            "INSERT INTO files (id, filename, mime_type, storage_path) VALUES (?, ?, ?, ?);", rows
+        )
+        save_metadata(conn, metadata)
+        conn.commit()
+
+
+def scan(conn, key, predicate):
+    """All values for the key, filtered in Python; the first page of ids and the total."""
+    matches = sorted(
+        (r[0] for r in conn.execute("SELECT file_id, meta_value FROM metadata WHERE meta_key = ?;", (key,))
+         if predicate(r[1])),
+        reverse=True,
+    )
+    return len(matches[:PAGE_SIZE]), len(matches)
+
+
+def indexed(conn, text):
+    filters = parse_filters([text])
+    where, params = filter_sql(filters, correlated=prefer_correlated(conn, filters, PAGE_SIZE))
+    page = fetch_page(conn, "SELECT * FROM files", params=params, where=where, page_size=PAGE_SIZE)
+    return len(page.rows)
+
+
+def count(conn, text):
+    where, params = filter_sql(parse_filters([text]))
+    return conn.execute(f"SELECT COUNT(*) FROM files WHERE {where};", params).fetchone()[0]
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--seed", type=int, default=670)
+    args = parser.parse_args()
+
+    init_db()
+    rng = random.Random(args.seed)
+    have = 0
+    print(f"{'rows':>9} {'filter':<24} | {'scan total':>10} {'scan ms':>9} | {'page ms':>8} {'total':>9} {'count ms':>8}")
+    with get_conn_cm() as conn:
+        for n in sorted(args.sizes):
+            start = time.perf_counter()
+            populate(conn, have, n, rng)
+            have = n
+            print(f"-- populated {n} rows in {time.perf_counter() - start:.1f}s")
+            for text, (key, predicate) in FILTERS.items():
+                (_, scan_total), scan_t = timed(scan, conn, key, predicate)
+                page_rows, page_t = timed(indexed, conn, text)
+                total, count_t = timed(count, conn, text)
+                # Both ways must find the same files
+                assert total == scan_total and page_rows == min(total, PAGE_SIZE), (text, total, scan_total)
+                print(f"{n:>9} {text:<24} | {scan_total:>10} {scan_t * 1000:>9.1f} | {page_t * 1000:>8.1f} {total:>9} {count_t * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Benchmark: PDF metadata extraction, xref probe vs full PyPDF2 parse.
+
+Builds a small corpus of PDFs in a temp dir (one-page and many-page files,
+classic xref tables and PDF 1.5 xref/object streams, an incrementally
+updated file, an encrypted one and several malformed ones) and times, per
+file, the old extract_metadata path (PdfReader + len(pages)), probe_pdf on
+its own, and extract_pdf_metadata (probe, then the isolated full parse when
+the probe gives up). The last columns show which parser answered and the
+page count or pdf_error it reported.
+
+    python benchmarks/bench_pdf_metadata.py --pages 20000 --repeat 5
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pdf_probe import PdfProbeError, extract_pdf_metadata, probe_pdf  # noqa: E402
+
+INFO = b"<< /Title (Dandelion field survey) /Author (BIOT lab) /Producer (bench) /CreationDate (D:20240131093000+01'00') >>"
+
+
+def build_pdf(pages: int, content_bytes: int = 64, xref_stream: bool = False) -> bytes:
+    """A valid PDF with `pages` pages in a balanced-enough tree of /Kids."""
+    objects = {}  # num -> body bytes
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[3] = INFO
+    first_page = 4
+    kids = []
+    filler = b"BT /F1 12 Tf 72 720 Td (x) Tj ET\n" * max(1, content_bytes // 34)
+    for i in range(pages):
+        page, content = first_page + 2 * i, first_page + 2 * i + 1
+        objects[page] = b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R >>" % content
+        objects[content] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(filler), filler)
+        kids.append(b"%d 0 R" % page)
+    objects[2] = b"<< /Type /Pages /Count %d /Kids [%s] >>" % (pages, b" ".join(kids))
+    size = max(objects) + 1
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    in_stream = set()
+    if xref_stream:
+        # Put the small dictionaries (catalog, tree, info, pages) in one object stream
+        in_stream = {n for n, body in objects.items() if b"stream" not in body}
+        objstm_num, size = size, size + 1
+        header, body = [], io.BytesIO()
+        for n in sorted(in_stream):
+            header.append(b"%d %d" % (n, body.tell()))
+            body.write(objects[n] + b"\n")
+        header = b" ".join(header) + b"\n"
+        data = zlib.compress(header + body.getvalue())
+        objects[objstm_num] = b"<< /Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d >>\nstream\n%s\nendstream" % (
+            len(in_stream), len(header), len(data), data)
+    for n in sorted(objects):
+        if n in in_stream:
+            continue
+        offsets[n] = out.tell()
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (n, objects[n]))
+
+    xref_at = out.tell()
+    if not xref_stream:
+        out.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for n in range(1, size):
+            out.write(b"%010d 00000 n \n" % offsets[n])
+        out.write(b"trailer\n<< /Size %d /Root 1 0 R /Info 3 0 R >>\n" % size)
+    else:
+        xref_num = size
+        size += 1
+        offsets[xref_num] = xref_at
+        stm_index = {n: i for i, n in enumerate(sorted(in_stream))}
+        rows = bytearray()
+        prev = bytes(7)
+        for n in range(size):
+            if n in stm_index:
+                row = bytes([2]) + objstm_num.to_bytes(4, "big") + stm_index[n].to_bytes(2, "big")
+            elif n in offsets:
+                row = bytes([1]) + offsets[n].to_bytes(4, "big") + bytes(2)
+            else:
+                row = bytes([0, 0, 0, 0, 0, 255, 255])
+            # PNG "Up" predictor, as real writers use
+            rows += bytes([2]) + bytes((a - b) & 0xFF for a, b in zip(row, prev))
+            prev = row
+        data = zlib.compress(bytes(rows))
+        out.write(
+            b"%d 0 obj\n<< /Type /XRef /Size %d /W [1 4 2] /Root 1 0 R /Info 3 0 R /Filter /FlateDecode "
+            b"/DecodeParms << /Columns 7 /Predictor 12 >> /Length %d >>\nstream\n%s\nendstream\nendobj\n"
+            % (xref_num, size, len(data), data)
+        )
+    out.write(b"startxref\n%d\n%%%%EOF\n" % xref_at)
+    return out.getvalue()
+
+
+def incremental_update(pdf: bytes) -> bytes:
+    """Append a new /Info as an incremental update with a /Prev link."""
+    start = pdf.rindex(b"startxref") + 9
+    prev = int(pdf[start:pdf.index(b"%%EOF", start)].strip())
+    size = int(pdf[pdf.rindex(b"/Size ") + 6:].split()[0])
+    out = io.BytesIO(pdf)
+    out.seek(0, io.SEEK_END)
+    info_at = out.tell()
+    out.write(b"%d 0 obj\n<< /Title (Revised survey) /ModDate (D:20250202) >>\nendobj\n" % size)
+    xref_at = out.tell()
+    out.write(b"xref\n0 1\n0000000000 65535 f \n%d 1\n%010d 00000 n \n" % (size, info_at))
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R /Prev %d >>\n" % (size + 1, size, prev))
+    out.write(b"startxref\n%d\n%%%%EOF\n" % xref_at)
+    return out.getvalue()
+
+
+def encrypted(pdf: bytes) -> bytes:
+    from PyPDF2 import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    for page in PdfReader(io.BytesIO(pdf)).pages:
+        writer.add_page(page)
+    writer.encrypt(user_password="", owner_password="owner")
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def corpus(directory: Path, pages: int):
+    small = build_pdf(1)
+    large = build_pdf(pages, content_bytes=2000)
+    files = {
+        "small.pdf": small,
+        f"large-{pages}p.pdf": large,
+        f"large-{pages}p-xrefstream.pdf": build_pdf(pages, content_bytes=2000, xref_stream=True),
+        "incremental.pdf": incremental_update(small),
+        "encrypted.pdf": encrypted(build_pdf(3)),
+        "bad-startxref.pdf": large.replace(b"startxref\n", b"startxref\n1"),
+        "truncated.pdf": large[: len(large) // 2],
+        "not-a-pdf.pdf": os.urandom(64 * 1024),
+    }
+    paths = []
+    for name, data in files.items():
+        path = directory / name
+        path.write_bytes(data)
+        paths.append(path)
+    return paths
+
+
+def old_extract(path):
+    from PyPDF2 import PdfReader
+
+    with open(path, "rb") as f:
+        return {"pages": len(PdfReader(f).pages)}
+
+
+def timed(fn, path, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            result = fn(path)
+        except Exception as e:
+            result = e
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=5000, help="page count of the large files")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    directory = Path(tempfile.mkdtemp(prefix="dandelion-bench-"))
+    paths = corpus(directory, args.pages)
+    print(f"{'file':<28} | {'MiB':>6} | {'PdfReader ms':>12} | {'probe ms':>9} | {'extract ms':>10} | result")
+    for path in paths:
+        old_ms, _ = timed(old_extract, path, args.repeat)
+        probe_ms, probed = timed(probe_pdf, path, args.repeat)
+        extract_ms, result = timed(extract_pdf_metadata, path, args.repeat)
+        probe_ms = f"{probe_ms:>9.2f}" if not isinstance(probed, PdfProbeError) else f"{'fail':>9}"
+        if "pdf_error" in result:
+            outcome = f"pdf_error={result['pdf_error']}"
+        else:
+            outcome = f"{result['pdf_parser']}: {result['pages']} pages, encrypted={result['encrypted']}, title={result.get('title')}"
+        print(f"{path.name:<28} | {path.stat().st_size / 2**20:>6.1f} | {old_ms:>12.2f} | {probe_ms} | {extract_ms:>10.2f} | {outcome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: rendering the /files table with and without the row fragment cache.
+
+Fills the archive with --files files (one user, --keys metadata keys each)
+and times GET /files/?per_page=N through Flask's test client, body included:
+
+  render    every row rendered from _file_row.html, metadata loaded for all
+            (the fragment cache is emptied before each request)
+  cached    the same page again, rows stitched from template_cache fragments
+  edited    after changing --edit of the rows on the page, which must be
+            re-rendered while the rest still come from the cache
+
+and checks that the cached and edited pages are byte-for-byte what a fresh
+render produces.
+
+    python benchmarks/bench_row_fragments.py --files 5000 --per-page 50 250 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+os.environ["TEMPLATE_CACHE_DIR"] = os.path.join(_TMP, "TemplateCache")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app  # noqa: E402
+from db import get_conn_cm  # noqa: E402
+from template_cache import row_fragments  # noqa: E402
+
+
+def populate(user_id: int, n_files: int, n_keys: int):
+    with get_conn_cm() as conn:
+        conn.executemany(
+            "INSERT INTO files (user_id, filename, mime_type, size_bytes, storage_path, sha256) VALUES (?, ?, ?, ?, ?, ?);",
+            ((user_id, f"survey_{i}.pdf", "application/pdf", 1024 * i, f"/tmp/{i}.pdf", f"{i:064x}")
+             for i in range(n_files)),
+        )
+        conn.executemany(
+            "INSERT INTO metadata (file_id, meta_key, meta_value) SELECT id, ?, ? || id FROM files;",
+            ((f"key_{k}", f"value {k} of file ") for k in range(n_keys)),
+        )
+
+
+def get_page(client, per_page: int) -> str:
+    resp = client.get(f"/files/?per_page={per_page}")
+    try:
+        assert resp.status_code == 200, resp.status_code
+        return resp.get_data(as_text=True)
+    finally:
+        resp.close()
+
+
+def timed(fn, *args, repeat=5, before=None):
+    best = float("inf")
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--keys", type=int, default=12, help="metadata keys per file")
+    parser.add_argument("--per-page", type=int, nargs="+", default=[50, 250, 500])
+    parser.add_argument("--edit", type=int, default=5, help="rows changed before the edited run")
+    args = parser.parse_args()
+
+    client = app.test_client()
+    client.post("/register", data={"username": "bench", "password": "bench"})
+    client.post("/login", data={"username": "bench", "password": "bench"})
+    with get_conn_cm() as conn:
+        user_id = conn.execute("SELECT id FROM users WHERE username = 'bench';").fetchone()[0]
+    populate(user_id, args.files, args.keys)
+
+    print(f"{'rows':>5} | {'render ms':>9} | {'cached ms':>9} {'speedup':>7} | {'edited ms':>9}")
+    for per_page in args.per_page:
+        fresh, render_t = timed(get_page, client, per_page, before=row_fragments.clear)
+        cached, cached_t = timed(get_page, client, per_page)
+        assert cached == fresh, "cached page differs from a fresh render"
+
+        def edit():
+            # The newest rows are the ones on the first page
+            with get_conn_cm() as conn:
+                conn.execute(
+                    "UPDATE files SET comment = COALESCE(comment, '') || 'x'"
+                    " WHERE id IN (SELECT id FROM files ORDER BY created_at DESC, id DESC LIMIT ?);",
+                    (args.edit,),
+                )
+        edited, edited_t = timed(get_page, client, per_page, before=edit)
+        row_fragments.clear()
+        assert edited == get_page(client, per_page), "edited rows were served stale"
+        print(f"{per_page:>5} | {render_t * 1000:>9.2f} | {cached_t * 1000:>9.2f} {render_t / cached_t:>6.1f}x | {edited_t * 1000:>9.2f}")
+    print(f"-- fragment cache: {row_fragments.stats()}")
+
+
+if __name__ == "__main__":
+    main()
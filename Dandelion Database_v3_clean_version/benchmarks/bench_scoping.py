@@ -0,0 +1,121 @@
+"""
+Benchmark: one user's file listing as the rest of the archive grows.
+
+Gives one user --own files and grows everybody else's around them through
+the requested archive sizes. At each size it times that user's first page,
+a page --depth pages in, and the total shown under the table, three ways:
+
+  archive   the unscoped listing every user used to get (all files)
+  no index  the user's files, found by walking (created_at, id) and
+            skipping everybody else's rows
+  scoped    sharing.scope_sql through fetch_page, which seeks
+            (user_id, created_at, id), and facets.file_count for the total
+
+The scoped times should stay flat while the archive grows.
+
+    python benchmarks/bench_scoping.py --sizes 10000 100000 1000000 --own 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db import get_conn_cm, init_db  # noqa: E402
+from facets import file_count  # noqa: E402
+from pagination import fetch_page  # noqa: E402
+import sharing  # noqa: E402
+
+PAGE_SIZE = 50
+USERS = 50
+ME = 1
+
+
+def populate(conn, count: int, rng: random.Random, user_id=None, batch: int = 10000):
+    """Add count files, owned by user_id or spread over the other users, dated over seven years."""
+    for lo in range(0, count, batch):
+        conn.executemany(
+            "INSERT INTO files (user_id, filename, mime_type, size_bytes, storage_path, created_at)"
+            " VALUES (?, ?, 'text/plain', 1, '/tmp/x', ?);",
+            (
+                (user_id or rng.randint(2, USERS), f"file_{lo + i}.txt",
+                 f"20{rng.randint(18, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 12:00:00")
+                for i in range(min(batch, count - lo))
+            ),
+        )
+        conn.commit()
+
+
+def pages(conn, select_sql, where, params, depth):
+    """Ids of the first page and of the page depth pages in."""
+    page = first = fetch_page(conn, select_sql, params=params, where=where, page_size=PAGE_SIZE)
+    for _ in range(depth):
+        if not page.next_cursor:
+            break
+        page = fetch_page(conn, select_sql, params=params, where=where, after=page.next_cursor,
+                          page_size=PAGE_SIZE)
+    return [r["id"] for r in first.rows], [r["id"] for r in page.rows]
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--own", type=int, default=2000, help="files belonging to the timed user")
+    parser.add_argument("--depth", type=int, default=10, help="pages to walk for the deep page")
+    parser.add_argument("--seed", type=int, default=670)
+    args = parser.parse_args()
+
+    init_db()
+    rng = random.Random(args.seed)
+    print(f"{'rows':>9} {'own':>6} | {'method':<8} | {'page ms':>8} {'deep ms':>8} {'count ms':>8}")
+    with get_conn_cm() as conn:
+        conn.executemany(
+            "INSERT INTO users (id, username, password_md5) VALUES (?, ?, '');",
+            ((i, f"user{i}") for i in range(1, USERS + 1)),
+        )
+        populate(conn, args.own, rng, user_id=ME)
+        have = args.own
+        for n in sorted(args.sizes):
+            populate(conn, max(0, n - have), rng)
+            have = max(n, have)
+            where, params = sharing.scope_sql(conn, ME)
+            own = file_count(conn, ME)
+            methods = {
+                "archive": ("SELECT * FROM files", None, [],
+                            lambda: conn.execute("SELECT COUNT(*) FROM files;").fetchone()[0]),
+                "no index": ("SELECT * FROM files INDEXED BY idx_files_created", where, params,
+                             lambda: conn.execute(f"SELECT COUNT(*) FROM files NOT INDEXED WHERE {where};",
+                                                  params).fetchone()[0]),
+                "scoped": ("SELECT * FROM files", where, params, lambda: file_count(conn, ME)),
+            }
+            results = {}
+            for label, (select_sql, w, p, count) in methods.items():
+                _, page_t = timed(pages, conn, select_sql, w, p, 0)
+                results[label], deep_t = timed(pages, conn, select_sql, w, p, args.depth)
+                total, count_t = timed(count)
+                print(f"{have:>9} {own:>6} | {label:<8} | {page_t * 1000:>8.2f} {deep_t * 1000:>8.2f} {count_t * 1000:>8.2f}")
+                if label != "archive":
+                    assert total == own, (label, total, own)
+            # Both ways of listing the user's files must agree
+            assert results["no index"] == results["scoped"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: /files/search - LIKE scan vs the files_fts full-text index.
+
+Grows a synthetic archive through the requested sizes and, at each size,
+times the old `filename LIKE '%q%'` query against the FTS5 path used by
+files_bp.search (first bm25-ranked page plus the match count).
+
+    python benchmarks/bench_search.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from db import get_conn_cm, init_db  # noqa: E402
+from pagination import fetch_page  # noqa: E402
+from search_utils import fts_query, search_sql  # noqa: E402
+
+WORDS = (
+    "dandelion taraxacum root leaf seed pappus flower stem latex scan gel blot "
+    "sample assay plate culture strain primer sequence microscopy confocal "
+    "western northern southern pcr qpcr elisa protocol report draft final "
+    "figure table supplement raw processed"
+).split()
+# Broad terms hit a large share of rows; the numeric id and "nomatch" are selective
+QUERIES = ("dandelion", "conf", "qpcr report", "taraxacum seed", "4242", "nomatch")
+PAGE_SIZE = 50
+
+
+def populate(conn, start: int, stop: int, rng: random.Random, batch: int = 10000):
+    for lo in range(start, stop, batch):
+        hi = min(lo + batch, stop)
+        conn.executemany(
+            "INSERT INTO files (id, filename, mime_type, size_bytes, storage_path, comment) VALUES (?, ?, ?, ?, ?, ?);",
+            (
+                (i, "_".join(rng.sample(WORDS, 2)) + f"_{i}.pdf", "application/pdf", 1024,
+                 f"/tmp/{i}.pdf", " ".join(rng.sample(WORDS, 4)))
+                for i in range(lo + 1, hi + 1)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO metadata (file_id, meta_key, meta_value) VALUES (?, ?, ?);",
+            ((i, "title", " ".join(rng.sample(WORDS, 3))) for i in range(lo + 1, hi + 1)),
+        )
+        conn.commit()
+
+
+def like_search(conn, q):
+    """The pre-FTS query: every filename matching %q%, all loaded at once."""
+    return len(conn.execute("SELECT * FROM files WHERE filename LIKE ?", ("%" + q + "%",)).fetchall())
+
+
+def fts_search(conn, q):
+    match = fts_query(q)
+    page = fetch_page(conn, search_sql(), params=(match,), keys=("score", "id"),
+                      descending=False, page_size=PAGE_SIZE)
+    total = conn.execute("SELECT COUNT(*) FROM files_fts WHERE files_fts MATCH ?;", (match,)).fetchone()[0]
+    return len(page.rows), total
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--seed", type=int, default=670)
+    args = parser.parse_args()
+
+    init_db()
+    rng = random.Random(args.seed)
+    have = 0
+    print(f"{'rows':>9} {'query':<16} | {'LIKE rows':>9} {'LIKE ms':>9} | {'FTS page':>8} {'FTS total':>9} {'FTS ms':>8}")
+    with get_conn_cm() as conn:
+        for n in sorted(args.sizes):
+            start = time.perf_counter()
+            populate(conn, have, n, rng)
+            have = n
+            print(f"-- populated {n} rows in {time.perf_counter() - start:.1f}s")
+            for q in QUERIES:
+                like_rows, like_t = timed(like_search, conn, q)
+                (page_rows, total), fts_t = timed(fts_search, conn, q)
+                print(f"{n:>9} {q:<16} | {like_rows:>9} {like_t * 1000:>9.1f} | {page_rows:>8} {total:>9} {fts_t * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
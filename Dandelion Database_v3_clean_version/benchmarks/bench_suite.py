@@ -0,0 +1,251 @@
+"""
+Benchmark suite: the whole app on a synthetic archive, with JSON results.
+
+Generates a corpus (benchmarks/corpus.py: JPEG/PNG photos, PDFs, text notes
+and CSV tables) and drives the real app through Flask's test client with
+--users logged-in users sharing it out:
+
+  upload            each file posted by its owner
+  extraction_drain  waiting for the background worker to finish the queue
+  index             first page of /files/, the next page, and a filtered page
+  search            /files/search for words that occur in the corpus
+  download          each user fetching their own files
+  delete            single deletes, then one bulk delete of the same size
+  extract_*         metadata_utils.extract_metadata per kind, with no cache
+
+Every request is checked for the status it should return. Timings are
+written as JSON (p50/p95/mean/max in ms, operations per second) together
+with the commit, Python and SQLite versions, so runs can be compared across
+commits with --compare:
+
+    python benchmarks/bench_suite.py --users 5 --files 500 --output before.json
+    git checkout my-branch
+    python benchmarks/bench_suite.py --users 5 --files 500 --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+os.environ["TEMPLATE_CACHE_DIR"] = os.path.join(_TMP, "TemplateCache")
+os.environ["THUMB_CACHE_DIR"] = os.path.join(_TMP, "ThumbCache")
+os.environ["EXTRACTION_CACHE_PATH"] = os.path.join(_TMP, "ExtractionCache.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app  # noqa: E402
+from corpus import DEFAULT_MIX, WORDS, build_corpus, parse_mix  # noqa: E402
+from db import get_conn_cm  # noqa: E402
+from extraction_worker import worker  # noqa: E402
+from metadata_utils import extract_metadata  # noqa: E402
+
+# A p50 or p95 this much above the --compare run is reported as slower
+REGRESSION_RATIO = 1.2
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def summarize(seconds, nbytes=None):
+    total = sum(seconds)
+    result = {
+        "count": len(seconds),
+        "p50_ms": round(percentile(seconds, 50) * 1000, 3),
+        "p95_ms": round(percentile(seconds, 95) * 1000, 3),
+        "mean_ms": round(total / len(seconds) * 1000, 3),
+        "max_ms": round(max(seconds) * 1000, 3),
+        "per_second": round(len(seconds) / total, 1) if total else None,
+    }
+    if nbytes is not None and total:
+        result["mb_per_second"] = round(nbytes / total / 1024 / 1024, 2)
+    return result
+
+
+def timed_request(client, method, url, expect, **kwargs):
+    """(seconds, body) for one request, including streaming the whole body."""
+    start = time.perf_counter()
+    resp = client.open(url, method=method, **kwargs)
+    try:
+        body = resp.get_data()
+    finally:
+        resp.close()
+    elapsed = time.perf_counter() - start
+    assert resp.status_code == expect, (method, url, resp.status_code)
+    return elapsed, body
+
+
+def login(username):
+    client = app.test_client()
+    client.post("/register", data={"username": username, "password": "bench"})
+    resp = client.post("/login", data={"username": username, "password": "bench"})
+    assert resp.status_code == 302, resp.status_code
+    return client
+
+
+def owned_files(username):
+    with get_conn_cm() as conn:
+        return [r["id"] for r in conn.execute(
+            "SELECT f.id FROM files f JOIN users u ON u.id = f.user_id WHERE u.username = ? ORDER BY f.id;",
+            (username,),
+        )]
+
+
+def run(args, samples):
+    results = {}
+    clients = {f"bench{u}": login(f"bench{u}") for u in range(args.users)}
+    names = list(clients)
+    rng = random.Random(args.seed)
+
+    # upload: files are dealt out to the users in turn
+    times, nbytes = [], 0
+    for i, sample in enumerate(samples):
+        data = sample.path.read_bytes()
+        with open(sample.path, "rb") as f:
+            elapsed, _ = timed_request(
+                clients[names[i % len(names)]], "POST", "/files/upload", 302,
+                data={"file": (f, sample.filename)}, content_type="multipart/form-data",
+            )
+        times.append(elapsed)
+        nbytes += len(data)
+    results["upload"] = summarize(times, nbytes)
+
+    start = time.perf_counter()
+    assert worker.wait_idle(timeout=600), "extraction worker did not drain"
+    results["extraction_drain"] = {"seconds": round(time.perf_counter() - start, 3)}
+
+    first, following, filtered = [], [], []
+    for _ in range(args.repeat):
+        for client in clients.values():
+            elapsed, body = timed_request(client, "GET", "/files/", 200)
+            first.append(elapsed)
+            m = re.search(rb'href="([^"]*after=[^"]*)"', body)
+            if m:
+                following.append(timed_request(client, "GET", m.group(1).decode().replace("&amp;", "&"), 200)[0])
+            filtered.append(timed_request(client, "GET", "/files/?filter=mime_type=image/jpeg", 200)[0])
+    results["index"] = summarize(first)
+    if following:
+        results["index_next_page"] = summarize(following)
+    results["index_filtered"] = summarize(filtered)
+
+    times = []
+    for _ in range(args.repeat):
+        for client in clients.values():
+            query = " ".join(rng.sample(WORDS, rng.randint(1, 2)))
+            times.append(timed_request(client, "GET", f"/files/search?query={query}", 200)[0])
+    results["search"] = summarize(times)
+
+    times, nbytes = [], 0
+    owned = {name: owned_files(name) for name in names}
+    for name, client in clients.items():
+        for file_id in owned[name][:args.downloads]:
+            elapsed, body = timed_request(client, "GET", f"/files/files/{file_id}/download", 200)
+            times.append(elapsed)
+            nbytes += len(body)
+    results["download"] = summarize(times, nbytes)
+
+    single, bulk = [], []
+    for name, client in clients.items():
+        ids = owned[name]
+        share = max(1, int(len(ids) * args.delete_share))
+        for file_id in ids[:share]:
+            single.append(timed_request(client, "POST", f"/files/delete/{file_id}", 302)[0])
+        batch = ids[share:2 * share]
+        if batch:
+            bulk.append(timed_request(client, "POST", "/files/delete", 302, data={"ids": batch})[0] / len(batch))
+    results["delete"] = summarize(single)
+    if bulk:
+        # Per file, so it compares directly with the single deletes
+        results["delete_bulk_per_file"] = summarize(bulk)
+
+    by_kind = {}
+    for sample in samples[:args.extract]:
+        start = time.perf_counter()
+        metadata = extract_metadata(str(sample.path), filename=sample.filename)
+        by_kind.setdefault(sample.kind, []).append(time.perf_counter() - start)
+        assert "error" not in metadata, (sample.filename, metadata)
+    for kind, times in sorted(by_kind.items()):
+        results[f"extract_{kind}"] = summarize(times)
+    return results
+
+
+def environment(args):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+    }
+
+
+def print_table(results, previous=None):
+    print(f"{'operation':<22} | {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'per s':>8}" + (" | vs before" if previous else ""))
+    for op, r in results.items():
+        if "count" not in r:
+            print(f"{op:<22} | {r['seconds']:>8.2f} s")
+            continue
+        line = f"{op:<22} | {r['count']:>6} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['per_second'] or 0:>8.1f}"
+        old = (previous or {}).get(op)
+        if old and "count" in old:
+            p50, p95 = (r[k] / old[k] if old[k] else 1.0 for k in ("p50_ms", "p95_ms"))
+            flag = "  slower" if max(p50, p95) > REGRESSION_RATIO else ""
+            line += f" | p50 x{p50:.2f} p95 x{p95:.2f}{flag}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. image=4,pdf=3,text=2,csv=1")
+    parser.add_argument("--seed", type=int, default=670)
+    parser.add_argument("--repeat", type=int, default=20, help="index/search requests per user")
+    parser.add_argument("--downloads", type=int, default=50, help="downloads per user")
+    parser.add_argument("--delete-share", type=float, default=0.1, help="share of each user's files deleted singly (and again in bulk)")
+    parser.add_argument("--extract", type=int, default=200, help="samples timed through extract_metadata")
+    parser.add_argument("--output", type=Path, help="JSON file to write (default: bench_suite-<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier JSON output to compare against")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    samples = build_corpus(Path(_TMP) / "corpus", args.files, args.seed, args.mix)
+    print(f"-- generated {len(samples)} files in {time.perf_counter() - start:.1f}s under {_TMP}")
+
+    report = {"environment": environment(args), "results": run(args, samples)}
+    previous = None
+    if args.compare:
+        before = json.loads(args.compare.read_text())
+        previous = before["results"]
+        if before["environment"]["args"] != json.loads(json.dumps(report["environment"]["args"])):
+            print(f"-- warning: {args.compare} was run with different arguments: {before['environment']['args']}")
+    print_table(report["results"], previous)
+
+    output = args.output or Path(f"bench_suite-{report['environment']['commit'] or 'unknown'}.json")
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"-- results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
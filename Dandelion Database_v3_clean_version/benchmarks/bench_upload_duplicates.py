@@ -0,0 +1,90 @@
+"""
+Benchmark: upload latency as uploads with the same filename pile up.
+
+Uploads `--count` files all named scan.pdf (distinct contents) through the
+real app with Flask's test client and prints mean latency per window of
+uploads. For reference it also times the old _unique_path linear probe,
+which needed one stat() per earlier duplicate.
+
+    python benchmarks/bench_upload_duplicates.py --count 2000 --window 250
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-bench-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+os.environ["TEMPLATE_CACHE_DIR"] = os.path.join(_TMP, "TemplateCache")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app  # noqa: E402
+
+FILENAME = "scan.pdf"
+
+
+def linear_probe(directory: Path, name: str) -> Path:
+    """The pre-content-addressing naming scheme: try name, name_1, name_2, ..."""
+    target = directory / name
+    if not target.exists():
+        return target
+    stem, suffix = target.stem, target.suffix
+    i = 1
+    while True:
+        candidate = directory / f"{stem}_{i}{suffix}"
+        if not candidate.exists():
+            return candidate
+        i += 1
+
+
+def bench_app(count: int, window: int):
+    client = app.test_client()
+    # Uploads record their uploader, so the session needs a real user
+    client.post("/register", data={"username": "bench", "password": "bench"})
+    client.post("/login", data={"username": "bench", "password": "bench"})
+    print(f"{'uploads':>9} | {'mean ms/upload (app)':>20}")
+    elapsed = 0.0
+    for i in range(1, count + 1):
+        body = f"%PDF-1.4\n% upload {i}\n".encode() + os.urandom(256)
+        start = time.perf_counter()
+        resp = client.post(
+            "/files/upload",
+            data={"file": (io.BytesIO(body), FILENAME)},
+            content_type="multipart/form-data",
+        )
+        elapsed += time.perf_counter() - start
+        assert resp.status_code == 302, resp.status_code
+        if i % window == 0:
+            print(f"{i:>9} | {elapsed / window * 1000:>20.2f}")
+            elapsed = 0.0
+
+
+def bench_probe(count: int, window: int):
+    directory = Path(tempfile.mkdtemp(prefix="probe-", dir=_TMP))
+    print(f"{'existing':>9} | {'linear probe ms':>20}")
+    for i in range(count):
+        start = time.perf_counter()
+        path = linear_probe(directory, FILENAME)
+        probe_t = time.perf_counter() - start
+        path.touch()
+        if (i + 1) % window == 0:
+            print(f"{i + 1:>9} | {probe_t * 1000:>20.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--window", type=int, default=250)
+    args = parser.parse_args()
+    bench_app(args.count, args.window)
+    print()
+    bench_probe(args.count, args.window)
+
+
+if __name__ == "__main__":
+    main()
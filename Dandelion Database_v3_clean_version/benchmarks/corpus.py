@@ -0,0 +1,167 @@
+"""
+Synthetic archive contents for benchmarks: camera-style JPEGs and PNGs,
+multi-page PDFs with an Info dictionary, plain text notes and CSV tables.
+Everything is generated from a seed, so the same arguments give the same
+bytes on every machine and every commit.
+
+    from corpus import build_corpus
+    samples = build_corpus(Path("/tmp/corpus"), files=1000, seed=670)
+
+Run on its own to write a corpus to a directory:
+
+    python benchmarks/corpus.py /tmp/corpus --files 1000 --mix image=4,pdf=3,text=2,csv=1
+"""
+import argparse
+import io
+import random
+from dataclasses import dataclass
+from pathlib import Path
+
+from PIL import Image
+
+# Words used in names, titles, notes and table cells, so searches have hits
+WORDS = (
+    "dandelion taraxacum meadow seed achene pappus rosette taproot latex bract "
+    "floret pollen nectar bee survey transect quadrat plot field herbarium "
+    "specimen leaf petal stem root soil moisture nitrogen sample growth bloom "
+    "spring summer autumn north south ridge valley creek prairie roadside"
+).split()
+
+DEFAULT_MIX = {"image": 4, "pdf": 3, "text": 2, "csv": 1}
+
+
+@dataclass
+class Sample:
+    path: Path
+    kind: str        # image | pdf | text | csv
+    filename: str    # name to upload it under
+    words: tuple     # searchable words in its name/content
+
+
+def parse_mix(text: str) -> dict:
+    """{"image": 4, ...} from "image=4,pdf=3"; unknown kinds raise ValueError."""
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        kind, _, weight = part.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"Unknown kind {kind!r}: expected one of {', '.join(DEFAULT_MIX)}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def _words(rng, n):
+    return tuple(rng.choice(WORDS) for _ in range(n))
+
+
+def make_image(rng: random.Random, fmt: str) -> bytes:
+    """A noisy photo-sized image; JPEGs carry camera EXIF with a capture date."""
+    size = (rng.randint(320, 1600), rng.randint(240, 1200))
+    image = Image.effect_noise(size, rng.randint(10, 60)).convert("RGB")
+    out = io.BytesIO()
+    if fmt == "JPEG":
+        exif = Image.Exif()
+        exif[0x010F] = "Dandelion Optics"
+        exif[0x0110] = rng.choice(("FieldCam 2", "FieldCam 3", "Macro 1"))
+        exif.get_ifd(0x8769)[0x9003] = (
+            f"20{rng.randint(18, 24)}:{rng.randint(1, 12):02d}:{rng.randint(1, 28):02d} "
+            f"{rng.randint(6, 19):02d}:{rng.randint(0, 59):02d}:00"
+        )
+        image.save(out, "JPEG", exif=exif, quality=rng.randint(70, 92))
+    else:
+        image.save(out, "PNG", compress_level=1)
+    return out.getvalue()
+
+
+def make_pdf(rng: random.Random, title: str) -> bytes:
+    """A valid PDF with a classic xref table, 1-40 text pages and an Info dictionary."""
+    pages = rng.randint(1, 40)
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Title (%s) /Author (Field team) /CreationDate (D:20%02d%02d%02d120000Z) >>" % (
+            title.encode(), rng.randint(18, 24), rng.randint(1, 12), rng.randint(1, 28)),
+    }
+    kids = []
+    for i in range(pages):
+        page, content = 4 + 2 * i, 5 + 2 * i
+        text = " ".join(_words(rng, 12)).encode()
+        stream = b"BT /F1 12 Tf 72 720 Td (%s) Tj ET" % text
+        objects[page] = b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R >>" % content
+        objects[content] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        kids.append(b"%d 0 R" % page)
+    objects[2] = b"<< /Type /Pages /Count %d /Kids [%s] >>" % (pages, b" ".join(kids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = {}
+    for n in sorted(objects):
+        offsets[n] = out.tell()
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (n, objects[n]))
+    xref_at = out.tell()
+    size = max(objects) + 1
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+    for n in range(1, size):
+        out.write(b"%010d 00000 n \n" % offsets[n])
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R /Info 3 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref_at))
+    return out.getvalue()
+
+
+def make_text(rng: random.Random) -> bytes:
+    lines = [" ".join(_words(rng, rng.randint(4, 14))) for _ in range(rng.randint(5, 400))]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def make_csv(rng: random.Random) -> bytes:
+    columns = ["plot", "species", "count", "height_cm", "observed"]
+    rows = [",".join(columns)]
+    for i in range(rng.randint(10, 2000)):
+        rows.append(
+            f"{rng.choice(WORDS)}-{i},taraxacum {rng.choice(WORDS)},{rng.randint(0, 300)},"
+            f"{rng.uniform(1, 40):.1f},20{rng.randint(18, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        )
+    return ("\n".join(rows) + "\n").encode()
+
+
+def build_corpus(directory: Path, files: int, seed: int = 670, mix: dict = None):
+    """Write `files` samples to directory, drawn from mix (kind -> weight); returns [Sample]."""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds, weights = zip(*mix.items())
+    directory.mkdir(parents=True, exist_ok=True)
+    samples = []
+    for i in range(files):
+        kind = rng.choices(kinds, weights)[0]
+        words = _words(rng, 2)
+        stem = f"{'_'.join(words)}_{i:06d}"
+        if kind == "image":
+            fmt = rng.choice(("JPEG", "JPEG", "PNG"))
+            name = stem + (".jpg" if fmt == "JPEG" else ".png")
+            data = make_image(rng, fmt)
+        elif kind == "pdf":
+            name = stem + ".pdf"
+            data = make_pdf(rng, " ".join(words))
+        elif kind == "text":
+            name = stem + ".txt"
+            data = make_text(rng)
+        else:
+            name = stem + ".csv"
+            data = make_csv(rng)
+        path = directory / name
+        path.write_bytes(data)
+        samples.append(Sample(path, kind, name, words))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=670)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. image=4,pdf=3,text=2,csv=1")
+    args = parser.parse_args()
+    samples = build_corpus(args.directory, args.files, args.seed, args.mix)
+    size = sum(s.path.stat().st_size for s in samples)
+    print(f"{len(samples)} files, {size / 1024 / 1024:.1f} MiB in {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
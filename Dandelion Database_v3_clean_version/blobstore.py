@@ -0,0 +1,66 @@
+import os
+from pathlib import Path
+
+# Uploads are stored once per distinct content, named by SHA-256 and sharded
+# two levels deep (ab/cd/abcd...) so no directory grows past 256 entries
+# before reaching the blobs themselves.
+
+
+def blob_path(root: Path, sha256: str) -> Path:
+    return Path(root) / sha256[:2] / sha256[2:4] / sha256
+
+
+def place_blob(root: Path, spool) -> Path:
+    """
+    Move a finished spool file (ingest.HashingSpoolFile) to its content address
+    under root, or discard it if that content is already stored. Returns the path.
+    """
+    path = blob_path(root, spool.hexdigest())
+    if path.exists():
+        spool.close()
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        spool.commit_to(path)
+    return path
+
+
+def place_spooled(root: Path, spool_path, sha256: str) -> Path:
+    """
+    Like place_blob, for a finished spool file left on disk by another process
+    (HashingSpoolFile.detach, in bulk_import's workers). As with store_blob,
+    call it after register_blob, inside the transaction that made the row.
+    """
+    path = blob_path(root, sha256)
+    if path.exists():
+        Path(spool_path).unlink(missing_ok=True)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(spool_path, path)
+    return path
+
+
+def register_blob(conn, path: Path, sha256: str, size_bytes: int):
+    conn.execute(
+        """
+        INSERT INTO blobs (sha256, storage_path, size_bytes)
+        VALUES (?, ?, ?)
+        ON CONFLICT (sha256) DO NOTHING;
+        """,
+        (sha256, str(path), size_bytes),
+    )
+
+
+def store_blob(conn, root: Path, spool) -> Path:
+    """
+    Make sure the content in `spool` (an ingest.HashingSpoolFile) exists as a
+    blob under root and has a row in `blobs`; return the blob's path.
+
+    Call this inside the transaction that inserts the referencing files row.
+    The INSERT here takes SQLite's write lock first, so a concurrent delete
+    cannot remove the blob between the exists() check and our commit.
+    If the blob already exists the spooled copy is simply discarded.
+    The files insert trigger bumps blobs.refcount.
+    """
+    register_blob(conn, blob_path(root, spool.hexdigest()), spool.hexdigest(), spool.size)
+    return place_blob(root, spool)
+
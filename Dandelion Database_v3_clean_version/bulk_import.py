@@ -0,0 +1,239 @@
+"""
+Bulk import an existing directory tree into the Dandelion Database.
+
+    python bulk_import.py /path/to/lab/documents --workers 8 --batch-size 500
+
+Files are hashed into the blob store and run through extract_metadata on a
+process pool; rows are written in batched transactions. The run is
+resumable: files already imported with the same path, mtime and size are
+skipped without being read, and content already in the archive is skipped
+after hashing (use --allow-duplicates to import it again anyway).
+
+Imported files belong to the user named by --owner. Without it they have no
+owner: every user can read them, but nobody can delete them from the app.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from mimetypes import guess_type
+from pathlib import Path
+
+from blobstore import blob_path, place_spooled, register_blob
+from db import ensure_db, get_conn_cm, insert_files
+from files_bp import BLOB_DIR, UPLOAD_DIR
+from ingest import spool_stream
+from metadata_utils import extract_metadata
+from werkzeug.utils import secure_filename
+
+
+def _walk(root: Path):
+    for dirpath, dirnames, filenames in os.walk(root):
+        # Skip hidden directories and never re-import our own upload store
+        dirnames[:] = [
+            d for d in dirnames
+            if not d.startswith(".") and Path(dirpath, d).resolve() != UPLOAD_DIR.resolve()
+        ]
+        for name in filenames:
+            if not name.startswith("."):
+                yield Path(dirpath, name)
+
+
+def _ingest_one(source: str, mtime_ns: int, size_bytes: int) -> dict:
+    """
+    Runs in a worker process: copy the file into a spool file (hashing it on
+    the way) and extract its metadata from the original path. The parent moves
+    the spool into the blob store once the blob is registered, in the same
+    order as blobstore.store_blob, so the sweeper can never unlink it between
+    the two.
+    """
+    with open(source, "rb") as src:
+        spool = spool_stream(src, UPLOAD_DIR)
+    sha256, size = spool.hexdigest(), spool.size
+    spool_path = spool.detach()
+    try:
+        metadata = extract_metadata(source, sha256=sha256)
+    except Exception as e:
+        metadata = {"error": f"Metadata extraction failed: {e}"}
+    return {
+        "source": source,
+        "mtime_ns": mtime_ns,
+        "size_bytes": size,
+        "sha256": sha256,
+        "spool_path": str(spool_path),
+        "metadata": metadata,
+    }
+
+
+def _write_batch(results, comment, allow_duplicates, owner_id=None):
+    """Insert one batch of ingested files in a single transaction. Returns rows inserted."""
+    log_rows = []
+    kept = []
+    records = []
+    # Earlier files of this batch with the same content, by sha256
+    first_in_batch = {}
+    repeats = []
+    with get_conn_cm() as conn:
+        for r in results:
+            if not allow_duplicates:
+                existing = conn.execute(
+                    "SELECT id FROM files WHERE sha256 = ? LIMIT 1;", (r["sha256"],)
+                ).fetchone()
+                if existing or r["sha256"] in first_in_batch:
+                    Path(r["spool_path"]).unlink(missing_ok=True)
+                    if existing:
+                        log_rows.append((r["source"], r["mtime_ns"], r["size_bytes"], existing["id"]))
+                    else:
+                        repeats.append(r)
+                    continue
+                first_in_batch[r["sha256"]] = len(kept)
+            path = blob_path(BLOB_DIR, r["sha256"])
+            register_blob(conn, path, r["sha256"], r["size_bytes"])
+            place_spooled(BLOB_DIR, r["spool_path"], r["sha256"])
+            filename = secure_filename(Path(r["source"]).name) or "upload"
+            records.append({
+                "user_id": owner_id,
+                "filename": filename,
+                "mime_type": guess_type(filename)[0],
+                "size_bytes": r["size_bytes"],
+                "storage_path": str(path),
+                "comment": comment,
+                "sha256": r["sha256"],
+                "metadata_status": "failed" if "error" in r["metadata"] else "done",
+                "metadata": r["metadata"],
+            })
+            kept.append(r)
+        file_ids = insert_files(conn, records)
+        log_rows.extend(
+            (r["source"], r["mtime_ns"], r["size_bytes"], file_id)
+            for r, file_id in zip(kept, file_ids)
+        )
+        log_rows.extend(
+            (r["source"], r["mtime_ns"], r["size_bytes"], file_ids[first_in_batch[r["sha256"]]])
+            for r in repeats
+        )
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO import_log (source_path, mtime_ns, size_bytes, file_id)
+            VALUES (?, ?, ?, ?);
+            """,
+            log_rows,
+        )
+    return len(file_ids)
+
+
+class Progress:
+    def __init__(self, total: int, stream=sys.stderr):
+        self.total = total
+        self.done = 0
+        self.imported = 0
+        self.failed = 0
+        self.stream = stream
+        self.start = time.monotonic()
+        self._last = 0.0
+
+    def update(self, done=0, imported=0, failed=0, force=False):
+        self.done += done
+        self.imported += imported
+        self.failed += failed
+        now = time.monotonic()
+        if not force and now - self._last < 0.5:
+            return
+        self._last = now
+        elapsed = max(now - self.start, 1e-9)
+        rate = self.done / elapsed
+        eta = (self.total - self.done) / rate if rate else 0
+        self.stream.write(
+            f"\r{self.done}/{self.total} processed, {self.imported} imported, "
+            f"{self.failed} failed | {rate:.1f} files/s | ETA {eta:.0f}s   "
+        )
+        self.stream.flush()
+
+
+def _flush(batch, progress, comment, allow_duplicates, owner_id):
+    imported = _write_batch(batch, comment, allow_duplicates, owner_id)
+    failed = sum(1 for r in batch if "error" in r["metadata"])
+    progress.update(done=len(batch), imported=imported, failed=failed)
+
+
+def run(root: Path, workers: int, batch_size: int, comment=None, allow_duplicates=False, owner=None):
+    ensure_db()
+    with get_conn_cm() as conn:
+        owner_id = None
+        if owner is not None:
+            row = conn.execute("SELECT id FROM users WHERE username = ?;", (owner,)).fetchone()
+            if not row:
+                raise SystemExit(f"No user called {owner!r}")
+            owner_id = row["id"]
+        seen = {
+            r["source_path"]: (r["mtime_ns"], r["size_bytes"])
+            for r in conn.execute("SELECT source_path, mtime_ns, size_bytes FROM import_log;")
+        }
+
+    todo = []
+    skipped = 0
+    for path in _walk(root):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        key = str(path.resolve())
+        if seen.get(key) == (st.st_mtime_ns, st.st_size):
+            skipped += 1
+            continue
+        todo.append((key, st.st_mtime_ns, st.st_size))
+    print(f"{len(todo)} files to import ({skipped} already imported)", file=sys.stderr)
+
+    progress = Progress(len(todo))
+    batch = []
+    window = workers * 4
+    pending = set()
+    items = iter(todo)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            # Keep a bounded number of files in flight so memory stays flat
+            while len(pending) < window:
+                item = next(items, None)
+                if item is None:
+                    break
+                pending.add(pool.submit(_ingest_one, *item))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                try:
+                    batch.append(fut.result())
+                except Exception as e:
+                    print(f"\nskipping file: {e}", file=sys.stderr)
+                    progress.update(done=1, failed=1)
+            if len(batch) >= batch_size:
+                _flush(batch, progress, comment, allow_duplicates, owner_id)
+                batch = []
+        if batch:
+            _flush(batch, progress, comment, allow_duplicates, owner_id)
+    progress.update(force=True)
+    print(file=sys.stderr)
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import a directory tree of files.")
+    parser.add_argument("root", type=Path, help="directory to import")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="extraction processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="files written per transaction (default: 500)")
+    parser.add_argument("--comment", default=None, help="comment stored on every imported file")
+    parser.add_argument("--allow-duplicates", action="store_true",
+                        help="import files whose content is already in the archive")
+    parser.add_argument("--owner", default=None,
+                        help="username that owns (and may delete) the imported files")
+    args = parser.parse_args(argv)
+    if not args.root.is_dir():
+        parser.error(f"{args.root} is not a directory")
+    run(args.root, args.workers, args.batch_size, args.comment, args.allow_duplicates, args.owner)
+
+
+if __name__ == "__main__":
+    main()
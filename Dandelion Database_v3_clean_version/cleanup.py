@@ -0,0 +1,300 @@
+"""
+Deleting files, and cleaning up upload storage behind them.
+
+delete_files() removes rows in one DELETE ... RETURNING per batch and queues
+the content that nothing references any more in pending_unlinks, in the same
+transaction. The sweeper thread unlinks queued paths in the background, so a
+delete request never waits on the filesystem, and the queue survives a
+restart. reconcile_orphans() is the safety net: it compares the upload
+directory with the files and blobs tables and queues whatever is left over
+from crashes, old versions or manual copying. Run it by hand with
+
+    python cleanup.py --dry-run          # list orphans only
+    python cleanup.py --check-missing    # also report rows whose file is gone
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from db import ensure_db, get_conn_cm
+
+# Files younger than this are never orphans: uploads and bulk_import spool into
+# the upload directory, and place blobs, before their rows are committed
+ORPHAN_GRACE_SECONDS = int(os.environ.get("ORPHAN_GRACE_SECONDS", "3600"))
+# How often the sweeper also reconciles the upload directory (0: never)
+ORPHAN_SCAN_HOURS = float(os.environ.get("ORPHAN_SCAN_HOURS", "24"))
+# Rows per DELETE ... RETURNING, and paths claimed per sweep transaction
+DELETE_BATCH_SIZE = 500
+SWEEP_BATCH_SIZE = 200
+POLL_SECONDS = 30.0
+
+log = logging.getLogger(__name__)
+
+_SHA256_NAME = re.compile(r"[0-9a-f]{64}")
+
+
+def resolve_storage_path(storage_path, upload_dir) -> Path:
+    """Where a files/blobs storage_path lives on disk (relative ones are under upload_dir)."""
+    p = Path(storage_path)
+    return p if p.is_absolute() else Path(upload_dir) / p
+
+
+def delete_files(conn, file_ids, upload_dir):
+    """
+    Delete files rows (with their metadata) inside the caller's transaction,
+    DELETE_BATCH_SIZE ids per statement, and queue any content that is no
+    longer referenced for the sweeper. Returns the deleted rows (id, sha256,
+    storage_path); ids that do not exist are skipped.
+    """
+    file_ids = list(file_ids)
+    deleted = []
+    for start in range(0, len(file_ids), DELETE_BATCH_SIZE):
+        ids = json.dumps(file_ids[start:start + DELETE_BATCH_SIZE])
+        # A row is blob-backed when it points at its blob; rows stored before
+        # the blob store own a file of their own, even if they have a sha256
+        blob_paths = dict(conn.execute(
+            """
+            SELECT b.sha256, b.storage_path FROM blobs b
+            WHERE b.sha256 IN (SELECT f.sha256 FROM files f
+                               WHERE f.id IN (SELECT value FROM json_each(?)));
+            """,
+            (ids,),
+        ).fetchall())
+        conn.execute("DELETE FROM metadata WHERE file_id IN (SELECT value FROM json_each(?));", (ids,))
+        rows = conn.execute(
+            "DELETE FROM files WHERE id IN (SELECT value FROM json_each(?)) RETURNING id, sha256, storage_path;",
+            (ids,),
+        ).fetchall()
+        # The files delete trigger has decremented refcount; drop blobs nobody shares now
+        freed = conn.execute(
+            """
+            DELETE FROM blobs
+            WHERE sha256 IN (SELECT value FROM json_each(?)) AND refcount <= 0
+            RETURNING sha256, storage_path;
+            """,
+            (json.dumps(list(blob_paths)),),
+        ).fetchall()
+        unlinks = [(str(resolve_storage_path(r["storage_path"], upload_dir)), r["sha256"]) for r in freed]
+        unlinks += [
+            (str(resolve_storage_path(r["storage_path"], upload_dir)), None)
+            for r in rows
+            if r["storage_path"] and blob_paths.get(r["sha256"]) != r["storage_path"]
+        ]
+        queue_unlinks(conn, unlinks)
+        deleted.extend(rows)
+    return deleted
+
+
+def queue_unlinks(conn, paths):
+    """Queue (path, sha256) pairs for the sweeper; sha256 is set for blob store paths."""
+    conn.executemany(
+        "INSERT OR IGNORE INTO pending_unlinks (path, sha256) VALUES (?, ?);",
+        paths,
+    )
+
+
+def sweep(batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """Unlink every queued path; returns how many files were removed."""
+    removed = 0
+    while True:
+        with get_conn_cm() as conn:
+            # Claiming with a DELETE takes the write lock first. An upload of the
+            # same content registers its blob under that lock before reusing the
+            # file, so the blobs check below cannot race with it.
+            rows = conn.execute(
+                """
+                DELETE FROM pending_unlinks WHERE path IN (
+                    SELECT path FROM pending_unlinks ORDER BY queued_at, path LIMIT ?
+                ) RETURNING path, sha256;
+                """,
+                (batch_size,),
+            ).fetchall()
+            if not rows:
+                return removed
+            for r in rows:
+                if r["sha256"] and _referenced(conn, [r["sha256"]]):
+                    # Uploaded again since it was deleted; the file is in use
+                    continue
+                try:
+                    os.unlink(r["path"])
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    # Left on disk; the next reconcile_orphans finds it again
+                    pass
+
+
+def _referenced(conn, hashes):
+    """The hashes still in use by a blobs row or (to be safe) any files row."""
+    return {
+        r[0] for r in conn.execute(
+            """
+            SELECT sha256 FROM blobs WHERE sha256 IN (SELECT value FROM json_each(?1))
+            UNION
+            SELECT sha256 FROM files WHERE sha256 IN (SELECT value FROM json_each(?1));
+            """,
+            (json.dumps(hashes),),
+        )
+    }
+
+
+def _legacy_names(conn):
+    """File names of rows stored outside the blob store (one scan of files)."""
+    return {
+        Path(r[0]).name
+        for r in conn.execute(
+            "SELECT storage_path FROM files WHERE sha256 IS NULL OR substr(storage_path, -64) != sha256;"
+        )
+    }
+
+
+def find_orphans(upload_dir, blob_dir, grace_seconds: int = ORPHAN_GRACE_SECONDS):
+    """
+    [(path, sha256)] for files under upload_dir that no row references and
+    that are older than grace_seconds. Looked at: blobs under blob_dir (named
+    by hash, so checked against the blobs table) and files directly in
+    upload_dir (uploads from before the blob store, and abandoned
+    .upload-*.part spools), which are matched by name since the directory may
+    have moved since their storage_path was written. Anything else is left alone.
+    """
+    cutoff = time.time() - grace_seconds
+    orphans = []
+    with get_conn_cm() as conn:
+        legacy = _legacy_names(conn)
+    with os.scandir(upload_dir) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < cutoff and entry.name not in legacy:
+                orphans.append((entry.path, None))
+
+    blobs = []
+    if Path(blob_dir).is_dir():
+        for dirpath, _, names in os.walk(blob_dir):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                if _SHA256_NAME.fullmatch(name) and os.stat(path).st_mtime < cutoff:
+                    blobs.append((path, name))
+    for start in range(0, len(blobs), DELETE_BATCH_SIZE):
+        chunk = blobs[start:start + DELETE_BATCH_SIZE]
+        with get_conn_cm() as conn:
+            known = _referenced(conn, [sha for _, sha in chunk])
+        orphans.extend((path, sha) for path, sha in chunk if sha not in known)
+    return orphans
+
+
+def reconcile_orphans(upload_dir, blob_dir, grace_seconds: int = ORPHAN_GRACE_SECONDS):
+    """Queue every orphan found by find_orphans for the sweeper; returns them."""
+    orphans = find_orphans(upload_dir, blob_dir, grace_seconds)
+    with get_conn_cm() as conn:
+        queue_unlinks(conn, orphans)
+    return orphans
+
+
+def find_missing(upload_dir):
+    """Ids of files rows whose stored file does not exist (one stat per distinct path)."""
+    missing = []
+    with get_conn_cm() as conn:
+        rows = conn.execute("SELECT id, storage_path FROM files ORDER BY storage_path;").fetchall()
+    exists = {}
+    for r in rows:
+        path = r["storage_path"]
+        if path not in exists:
+            exists[path] = bool(path) and resolve_storage_path(path, upload_dir).exists()
+        if not exists[path]:
+            missing.append(r["id"])
+    return missing
+
+
+class Sweeper:
+    """Background thread that empties pending_unlinks and, now and then, reconciles orphans."""
+
+    def __init__(self):
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.upload_dir = self.blob_dir = None
+
+    def start(self, upload_dir, blob_dir):
+        if self._thread is not None:
+            return
+        self.upload_dir, self.blob_dir = upload_dir, blob_dir
+        self._thread = threading.Thread(target=self._run, name="sweeper", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Wake the sweeper after paths were queued."""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop.clear()
+
+    def wait_idle(self, timeout: float = 30.0) -> bool:
+        """Block until pending_unlinks is empty (for scripts/benchmarks)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with get_conn_cm() as conn:
+                if conn.execute("SELECT 1 FROM pending_unlinks LIMIT 1;").fetchone() is None:
+                    return True
+            self.notify()
+            time.sleep(0.02)
+        return False
+
+    def _run(self):
+        next_scan = time.monotonic()
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                if ORPHAN_SCAN_HOURS > 0 and time.monotonic() >= next_scan:
+                    next_scan = time.monotonic() + ORPHAN_SCAN_HOURS * 3600
+                    reconcile_orphans(self.upload_dir, self.blob_dir)
+                sweep()
+            except Exception:
+                # Try again on the next wake-up rather than lose the thread
+                log.exception("sweeper failed; retrying in %gs", POLL_SECONDS)
+            self._wake.wait(POLL_SECONDS)
+
+
+sweeper = Sweeper()
+
+
+def main(argv=None):
+    from files_bp import BLOB_DIR, UPLOAD_DIR
+
+    parser = argparse.ArgumentParser(description="Remove upload files that no row references.")
+    parser.add_argument("--dry-run", action="store_true", help="list orphans without removing them")
+    parser.add_argument("--grace", type=int, default=ORPHAN_GRACE_SECONDS,
+                        help=f"ignore files modified in the last N seconds (default: {ORPHAN_GRACE_SECONDS})")
+    parser.add_argument("--check-missing", action="store_true",
+                        help="also list files rows whose stored file no longer exists")
+    args = parser.parse_args(argv)
+
+    ensure_db()
+    if args.dry_run:
+        orphans = find_orphans(UPLOAD_DIR, BLOB_DIR, args.grace)
+    else:
+        orphans = reconcile_orphans(UPLOAD_DIR, BLOB_DIR, args.grace)
+    size = sum(os.path.getsize(p) for p, _ in orphans if os.path.exists(p))
+    for path, _ in orphans:
+        print(path)
+    print(f"{len(orphans)} orphaned files, {size / 1024 / 1024:.1f} MiB", end="")
+    if args.dry_run:
+        print(" (dry run, nothing removed)")
+    else:
+        print(f", {sweep()} removed")
+    if args.check_missing:
+        missing = find_missing(UPLOAD_DIR)
+        print(f"{len(missing)} rows whose file is missing: {missing[:50]}{' ...' if len(missing) > 50 else ''}")
+
+
+if __name__ == "__main__":
+    main()
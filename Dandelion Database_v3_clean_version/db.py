@@ -1,45 +1,217 @@
-from contextlib import contextmanager
-import sqlite3
-import os
-from pathlib import Path
-
-# Project directory
-BASE_DIR = Path(__file__).resolve().parent
-
-# DB and schema live alongside your code by default
-DB_PATH = os.environ.get("DATABASE_PATH", str(BASE_DIR / "Tables.db"))
-SCHEMA_PATH = os.environ.get("SCHEMA_PATH", str(BASE_DIR / "schema.sql"))
-
-def connect():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON;")
-    return conn
-
-@contextmanager
-def get_conn_cm():
-    conn = connect()
-    try:
-        yield conn
-        conn.commit()
-    finally:
-        conn.close()
-
-def init_db(schema_path: str = SCHEMA_PATH):
-    with open(schema_path, "r", encoding="utf-8") as f:
-        schema_sql = f.read()
-    with get_conn_cm() as conn:
-        conn.executescript(schema_sql)
-
-def ensure_db():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    # initialize if tables missing
-    with get_conn_cm() as conn:
-        has_files = conn.execute(
-            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='files';"
-        ).fetchone() is not None
-        has_users = conn.execute(
-            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='users';"
-        ).fetchone() is not None
-    if not (has_files and has_users):
-        init_db()
+from contextlib import contextmanager
+import queue
+import sqlite3
+import os
+import threading
+from pathlib import Path
+from typed_metadata import normalize_metadata, typed_values, backfill_typed_metadata
+from metrics import connection_factory
+
+# Project directory
+BASE_DIR = Path(__file__).resolve().parent
+
+# DB and schema live alongside your code by default
+DB_PATH = os.environ.get("DATABASE_PATH", str(BASE_DIR / "Tables.db"))
+SCHEMA_PATH = os.environ.get("SCHEMA_PATH", str(BASE_DIR / "schema.sql"))
+
+# Connection tuning. WAL lets page loads read while an upload is writing, and
+# NORMAL sync is durable in WAL mode except for the last commits on power loss.
+JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Negative values are KiB, so the default is a 64 MiB page cache per connection
+CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", "-65536"))
+BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Idle connections kept for reuse; extra ones are closed when released
+POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", "8"))
+
+def connect():
+    # connection_factory counts and times statements when METRICS_ENABLED=1
+    conn = sqlite3.connect(
+        DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False, factory=connection_factory
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON;")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS};")
+    conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE};")
+    conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS};")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE};")
+    conn.execute(f"PRAGMA cache_size = {CACHE_SIZE};")
+    return conn
+
+_pool = queue.LifoQueue()
+_local = threading.local()
+
+def _acquire():
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        return connect()
+
+def _release(conn):
+    if _pool.qsize() < POOL_SIZE:
+        _pool.put(conn)
+    else:
+        conn.close()
+
+def close_pool():
+    """Close every idle pooled connection (e.g. before pointing DB_PATH elsewhere)."""
+    while True:
+        try:
+            _pool.get_nowait().close()
+        except queue.Empty:
+            return
+
+def _reset_after_fork():
+    # Connections must not be shared across fork(); the child starts with an empty pool
+    global _pool, _local
+    _pool = queue.LifoQueue()
+    _local = threading.local()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+@contextmanager
+def get_conn_cm():
+    """
+    Yield a pooled connection, committing on success and rolling back on error.
+    A nested get_conn_cm() on the same thread reuses the outer connection and
+    its transaction, so one code path never holds two connections at once.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        yield conn
+        return
+    conn = _acquire()
+    _local.conn = conn
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _local.conn = None
+        _release(conn)
+
+# Columns a caller may set when inserting into files (the rest have defaults)
+FILE_COLUMNS = (
+    "user_id", "filename", "mime_type", "size_bytes", "storage_path",
+    "comment", "sha256", "metadata_status",
+)
+
+def insert_files(conn, files):
+    """
+    Insert a batch of files rows and all of their metadata inside the caller's
+    transaction, and return the new ids in input order.
+
+    Each item is a dict of FILE_COLUMNS values plus an optional "metadata" dict.
+    File rows need one execute each (for lastrowid); metadata for the whole
+    batch goes in with a single executemany. Single uploads, multi-file uploads
+    and bulk_import all write through here.
+    """
+    file_ids = []
+    metadata = {}
+    for f in files:
+        cols = [c for c in FILE_COLUMNS if c in f]
+        cur = conn.execute(
+            f"INSERT INTO files ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))});",
+            [f[c] for c in cols],
+        )
+        file_ids.append(cur.lastrowid)
+        if f.get("metadata"):
+            metadata[cur.lastrowid] = f["metadata"]
+    save_metadata(conn, metadata)
+    return file_ids
+
+def save_metadata(conn, metadata_by_file):
+    """
+    Write {file_id: {meta_key: meta_value}} with one executemany (existing keys
+    are updated), along with each value's typed copy for filtering.
+    """
+    # An upsert rather than INSERT OR REPLACE: REPLACE deletes the old row
+    # without firing the delete triggers, so files_fts would keep its text
+    conn.executemany(
+        """
+        INSERT INTO metadata (file_id, meta_key, meta_value, num_value, date_value)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (file_id, meta_key) DO UPDATE SET
+            meta_value = excluded.meta_value,
+            num_value  = excluded.num_value,
+            date_value = excluded.date_value;
+        """,
+        [
+            (file_id, key, value, *typed_values(value))
+            for file_id, metadata in metadata_by_file.items()
+            for key, value in normalize_metadata(metadata).items()
+        ],
+    )
+
+def init_db(schema_path: str = SCHEMA_PATH):
+    with open(schema_path, "r", encoding="utf-8") as f:
+        schema_sql = f.read()
+    with get_conn_cm() as conn:
+        conn.executescript(schema_sql)
+
+def _table_exists(conn, table_name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?;", (table_name,)
+    ).fetchone() is not None
+
+# Columns added to existing tables after their first release. CREATE TABLE IF
+# NOT EXISTS leaves old tables alone, so ensure_db adds these with ALTER TABLE.
+ADDED_COLUMNS = {
+    "files": [
+        ("sha256", "TEXT"),
+        ("metadata_status", "TEXT NOT NULL DEFAULT 'done'"),
+        ("row_version", "INTEGER NOT NULL DEFAULT 0"),
+    ],
+    "metadata": [
+        ("num_value", "REAL"),
+        ("date_value", "TEXT"),
+    ],
+}
+
+def _columns(conn, table_name: str):
+    return {c["name"] for c in conn.execute(f"PRAGMA table_info({table_name});")}
+
+def _add_missing_columns(conn):
+    for table, columns in ADDED_COLUMNS.items():
+        if not _table_exists(conn, table):
+            continue
+        existing = _columns(conn, table)
+        for name, decl in columns:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl};")
+
+def ensure_db():
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    with get_conn_cm() as conn:
+        had_search_index = _table_exists(conn, "files_fts")
+        had_facets = _table_exists(conn, "facet_counts")
+        if had_facets and "owner" not in _columns(conn, "facet_counts"):
+            # Counts from before they were kept per owner: drop them (and the
+            # triggers writing them) for init_db to recreate and a recount
+            for trigger in ("files_facets_insert", "files_facets_delete", "files_facets_update"):
+                conn.execute(f"DROP TRIGGER IF EXISTS {trigger};")
+            conn.execute("DROP TABLE facet_counts;")
+            had_facets = False
+        untyped_metadata = _table_exists(conn, "metadata") and "num_value" not in _columns(conn, "metadata")
+        _add_missing_columns(conn)
+    # schema.sql only uses IF NOT EXISTS, so re-running it on an existing
+    # database is safe and picks up indexes added since it was created
+    init_db()
+    if not had_search_index:
+        # Databases created before full-text search need their rows indexed once
+        from search_utils import rebuild_search_index
+        with get_conn_cm() as conn:
+            rebuild_search_index(conn)
+    if not had_facets:
+        # Likewise the sidebar counts, which the triggers only keep up to date
+        from facets import rebuild_facet_counts
+        with get_conn_cm() as conn:
+            rebuild_facet_counts(conn)
+    if untyped_metadata:
+        # Metadata written before the typed columns existed gets them filled in once
+        with get_conn_cm() as conn:
+            backfill_typed_metadata(conn)
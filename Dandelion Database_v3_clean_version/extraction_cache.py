@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from db import DB_PATH, BUSY_TIMEOUT_MS
+
+# Extraction results by content hash, in their own SQLite file next to
+# Tables.db so the cache can be deleted (or grow) without touching the
+# archive. Entries are keyed by (sha256, extractor name) and remember the
+# extractor version that produced them: bumping one extractor's version
+# turns only its entries into misses, which are then overwritten.
+
+CACHE_PATH = os.environ.get(
+    "EXTRACTION_CACHE_PATH", str(Path(DB_PATH).with_name("ExtractionCache.db"))
+)
+CACHE_MAX_BYTES = int(os.environ.get("EXTRACTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extraction_cache (
+    sha256     TEXT NOT NULL,
+    extractor  TEXT NOT NULL,
+    version    INTEGER NOT NULL,
+    metadata   TEXT NOT NULL,           -- JSON
+    size_bytes INTEGER NOT NULL,
+    last_used  REAL NOT NULL,           -- unix time, for LRU eviction
+    PRIMARY KEY (sha256, extractor)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_extraction_cache_lru ON extraction_cache(last_used);
+"""
+
+
+class ExtractionCache:
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._total = None  # bytes of cached JSON, summed lazily on first write
+        self.hits = self.misses = self.stores = self.evictions = 0
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL;")
+            conn.execute("PRAGMA synchronous = NORMAL;")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, sha256: str, extractor: str, version: int):
+        """Cached metadata dict, or None on a miss (absent or older version)."""
+        row = self._conn().execute(
+            """
+            UPDATE extraction_cache SET last_used = ?
+            WHERE sha256 = ? AND extractor = ? AND version = ?
+            RETURNING metadata;
+            """,
+            (time.time(), sha256, extractor, version),
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, sha256: str, extractor: str, version: int, metadata: dict):
+        data = json.dumps(metadata, sort_keys=True, default=str)
+        conn = self._conn()
+        # Read the size of any entry being replaced (an older version, or a
+        # racing put) in the same write transaction, so _total only grows by
+        # the difference
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            old = conn.execute(
+                "SELECT size_bytes FROM extraction_cache WHERE sha256 = ? AND extractor = ?;",
+                (sha256, extractor),
+            ).fetchone()
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO extraction_cache
+                    (sha256, extractor, version, metadata, size_bytes, last_used)
+                VALUES (?, ?, ?, ?, ?, ?);
+                """,
+                (sha256, extractor, version, data, len(data), time.time()),
+            )
+            conn.execute("COMMIT;")
+        except BaseException:
+            conn.execute("ROLLBACK;")
+            raise
+        with self._lock:
+            self.stores += 1
+            if self._total is None:
+                self._total = self._size()
+            else:
+                self._total += len(data) - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _size(self) -> int:
+        return self._conn().execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM extraction_cache;"
+        ).fetchone()[0]
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is at 90% of its budget."""
+        conn = self._conn()
+        target = self.max_bytes * 0.9
+        # Other processes (bulk_import workers) write here too, so recount
+        total, entries = conn.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0), COUNT(*) FROM extraction_cache;"
+        ).fetchone()
+        while total > target and entries:
+            # Enough average-sized entries to get under the target in one go
+            batch = int((total - target) / (total / entries)) + 1
+            removed = conn.execute(
+                """
+                DELETE FROM extraction_cache WHERE (sha256, extractor) IN (
+                    SELECT sha256, extractor FROM extraction_cache ORDER BY last_used LIMIT ?
+                ) RETURNING size_bytes;
+                """,
+                (batch,),
+            ).fetchall()
+            if not removed:
+                break
+            total -= sum(r[0] for r in removed)
+            entries -= len(removed)
+            self.evictions += len(removed)
+        self._total = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "entries": self._conn().execute("SELECT COUNT(*) FROM extraction_cache;").fetchone()[0],
+                "size_bytes": self._size(),
+                "max_bytes": self.max_bytes,
+            }
+
+
+extraction_cache = ExtractionCache()
@@ -0,0 +1,208 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from db import get_conn_cm, save_metadata
+from cleanup import resolve_storage_path
+from metadata_utils import extract_metadata
+import thumbnails
+
+# Background metadata extraction. Uploads insert their files row with
+# metadata_status = 'pending' plus a row in extraction_jobs and return at once;
+# the worker below claims jobs from that table, runs extract_metadata on a
+# thread pool and writes the results. Files whose extractor is CHEAP were
+# already extracted during the upload and are only queued for thumbnails.
+# The queue lives in SQLite, so jobs that were waiting when the app stopped
+# are picked up again on the next start.
+
+WORKERS = int(os.environ.get("EXTRACTION_WORKERS", "2"))
+# A job that errors is retried until it has been claimed this many times
+MAX_ATTEMPTS = int(os.environ.get("EXTRACTION_MAX_ATTEMPTS", "3"))
+# Claims older than this belong to a worker that died mid-job
+STALE_CLAIM_SECONDS = int(os.environ.get("EXTRACTION_STALE_SECONDS", "600"))
+# How often an idle dispatcher re-checks the table without being notified
+POLL_SECONDS = 5.0
+# Pause after the dispatcher hits an error (say the database is locked by a long write)
+ERROR_BACKOFF_SECONDS = 1.0
+
+log = logging.getLogger(__name__)
+
+
+def enqueue(conn, file_id: int):
+    """Queue extraction for a files row. Call inside the transaction that inserts it."""
+    conn.execute(
+        "INSERT OR IGNORE INTO extraction_jobs (file_id) VALUES (?);",
+        (file_id,),
+    )
+
+
+def _claim_next():
+    with get_conn_cm() as conn:
+        return conn.execute(
+            """
+            UPDATE extraction_jobs
+            SET claimed_at = CURRENT_TIMESTAMP, attempts = attempts + 1
+            WHERE file_id = (
+                SELECT file_id FROM extraction_jobs
+                WHERE claimed_at IS NULL
+                ORDER BY enqueued_at, file_id
+                LIMIT 1
+            )
+            RETURNING file_id, attempts;
+            """
+        ).fetchone()
+
+
+def _release_stale_claims():
+    with get_conn_cm() as conn:
+        conn.execute(
+            """
+            UPDATE extraction_jobs SET claimed_at = NULL
+            WHERE claimed_at IS NOT NULL
+              AND claimed_at < datetime('now', ?);
+            """,
+            (f"-{STALE_CLAIM_SECONDS} seconds",),
+        )
+
+
+def _finish(file_id: int, status: str, metadata: dict):
+    with get_conn_cm() as conn:
+        updated = conn.execute(
+            "UPDATE files SET metadata_status = ? WHERE id = ?;",
+            (status, file_id),
+        ).rowcount
+        # The file may have been deleted while it was being parsed
+        if updated:
+            save_metadata(conn, {file_id: metadata})
+        conn.execute("DELETE FROM extraction_jobs WHERE file_id = ?;", (file_id,))
+
+
+def process_job(file_id: int, attempts: int, upload_dir):
+    """Extract metadata for one claimed job and record the outcome (relative storage paths are under upload_dir)."""
+    with get_conn_cm() as conn:
+        row = conn.execute(
+            "SELECT id, storage_path, filename, mime_type, sha256, metadata_status FROM files WHERE id = ?;",
+            (file_id,),
+        ).fetchone()
+    if row is None:
+        _finish(file_id, "done", {})
+        return
+    path = str(resolve_storage_path(row["storage_path"], upload_dir))
+    if row["metadata_status"] != "pending":
+        # Extracted inline at upload (CHEAP extractor); only the thumbnail is left
+        status, metadata = row["metadata_status"], {}
+    else:
+        try:
+            metadata = extract_metadata(path, filename=row["filename"], sha256=row["sha256"])
+        except Exception as e:
+            if attempts < MAX_ATTEMPTS:
+                with get_conn_cm() as conn:
+                    conn.execute(
+                        "UPDATE extraction_jobs SET claimed_at = NULL WHERE file_id = ?;",
+                        (file_id,),
+                    )
+                return
+            metadata = {"error": f"Metadata extraction failed: {e}"}
+        status = "failed" if "error" in metadata else "done"
+    if status == "done" and thumbnails.THUMBS_EAGER and thumbnails.is_previewable(row):
+        try:
+            thumbnails.thumb_cache.get(
+                thumbnails.cache_key(row), path, thumbnails.DEFAULT_THUMB_SIZE
+            )
+        except Exception:
+            # The thumb route will retry (and report) on first view
+            pass
+    _finish(file_id, status, metadata)
+
+
+class ExtractionWorker:
+    """Dispatcher thread that feeds claimed extraction jobs to a thread pool."""
+
+    def __init__(self, workers: int = WORKERS):
+        self.workers = max(1, workers)
+        self._pool = None
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Condition()
+        self._inflight = 0
+        self.upload_dir = None
+
+    def start(self, upload_dir):
+        if self._thread is not None:
+            return
+        self.upload_dir = upload_dir
+        _release_stale_claims()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="extract")
+        self._thread = threading.Thread(target=self._run, name="extract-dispatch", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Wake the dispatcher after a job was enqueued."""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            self._lock.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._pool.shutdown(wait=True)
+            self._thread = self._pool = None
+        self._stop.clear()
+
+    def wait_idle(self, timeout: float = 30.0) -> bool:
+        """Block until the queue is empty and nothing is in flight (for scripts/benchmarks)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                busy = self._inflight > 0
+            if not busy:
+                with get_conn_cm() as conn:
+                    if conn.execute("SELECT 1 FROM extraction_jobs LIMIT 1;").fetchone() is None:
+                        return True
+            self.notify()
+            time.sleep(0.02)
+        return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                while self._inflight >= self.workers and not self._stop.is_set():
+                    self._lock.wait()
+            if self._stop.is_set():
+                break
+            self._wake.clear()
+            try:
+                job = _claim_next()
+                if job is None:
+                    self._wake.wait(POLL_SECONDS)
+                    continue
+                with self._lock:
+                    self._inflight += 1
+                try:
+                    self._pool.submit(self._run_job, job["file_id"], job["attempts"])
+                except Exception:
+                    with self._lock:
+                        self._inflight -= 1
+                    raise
+            except Exception:
+                # Keep the thread: a claimed job that never ran is released
+                # as stale and claimed again later
+                log.exception("extraction dispatcher failed; retrying in %gs", ERROR_BACKOFF_SECONDS)
+                self._stop.wait(ERROR_BACKOFF_SECONDS)
+
+    def _run_job(self, file_id, attempts):
+        try:
+            process_job(file_id, attempts, self.upload_dir)
+        finally:
+            with self._lock:
+                self._inflight -= 1
+                self._lock.notify_all()
+            # A retried job goes back in the queue; make sure it is seen promptly
+            self._wake.set()
+
+
+worker = ExtractionWorker()
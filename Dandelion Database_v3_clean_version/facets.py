@@ -0,0 +1,109 @@
+import calendar
+
+# Sidebar facets for the files table. facet_counts holds one row per
+# (owner, facet, value) with the number of that owner's files that have it,
+# kept current by the files_facets_* triggers in schema.sql, so the sidebar is
+# a read of a few dozen rows no matter how many files there are. owner is the
+# uploader's users.id, or UNOWNED for files nobody owns (the shared listing).
+# Facet values are text:
+#   mime_type  the MIME type
+#   month      "YYYY-MM" of created_at
+#   size       lower bound in bytes of the size_buckets row the file falls in
+# with '' where the file has no value.
+
+# Values shown per facet (months are the most recent ones)
+FACET_LIMIT = 12
+
+# facet_counts.owner of files whose user_id is NULL
+UNOWNED = 0
+
+FACET_TITLES = {
+    "mime_type": "Type",
+    "month": "Uploaded",
+    "size": "Size",
+}
+
+
+def _size_label(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:g} {unit}"
+        n /= 1024
+
+
+def _next_month(month: str) -> str:
+    year, mon = (int(p) for p in month.split("-"))
+    year, mon = (year + 1, 1) if mon == 12 else (year, mon + 1)
+    return f"{year:04d}-{mon:02d}-01"
+
+
+def rebuild_facet_counts(conn):
+    """Recount facet_counts from files (for databases that predate it)."""
+    conn.execute("DELETE FROM facet_counts;")
+    conn.execute(
+        """
+        INSERT INTO facet_counts (owner, facet, value, count)
+        SELECT owner, facet, value, COUNT(*) FROM (
+            SELECT COALESCE(user_id, 0) AS owner, 'mime_type' AS facet,
+                   COALESCE(mime_type, '') AS value FROM files
+            UNION ALL SELECT COALESCE(user_id, 0), 'month',
+                             COALESCE(strftime('%Y-%m', created_at), '') FROM files
+            UNION ALL SELECT COALESCE(user_id, 0), 'size',
+                             COALESCE((SELECT MAX(lower) FROM size_buckets
+                                       WHERE lower <= size_bytes), '') FROM files
+        )
+        GROUP BY owner, facet, value;
+        """
+    )
+
+
+def file_count(conn, owner) -> int:
+    """How many files owner has (every file is in exactly one size bucket)."""
+    return conn.execute(
+        "SELECT COALESCE(SUM(count), 0) FROM facet_counts WHERE owner = ? AND facet = 'size';",
+        (owner,),
+    ).fetchone()[0]
+
+
+def load_facets(conn, owner):
+    """
+    [{"name", "title", "values": [{"label", "count", "filter"}]}] for the
+    sidebar of owner's files. "filter" is the /files/?filter= clause
+    selecting those files, or None where there is no way to express it
+    (files without a value).
+    """
+    facets = []
+    for name, title in FACET_TITLES.items():
+        order = {
+            "month": "value DESC",
+            "size": "CAST(value AS INTEGER)",
+        }.get(name, "count DESC, value")
+        rows = conn.execute(
+            f"SELECT value, count FROM facet_counts WHERE owner = ? AND facet = ?"
+            f" ORDER BY {order} LIMIT ?;",
+            (owner, name, FACET_LIMIT),
+        ).fetchall()
+        values = [_facet_value(conn, name, r["value"], r["count"]) for r in rows]
+        if values:
+            facets.append({"name": name, "title": title, "values": values})
+    return facets
+
+
+def _facet_value(conn, name, value, count):
+    label, clause = value, None
+    if value == "":
+        label = "unknown"
+    elif name == "mime_type":
+        clause = f"mime_type={value}"
+    elif name == "month":
+        year, mon = value.split("-")
+        label = f"{calendar.month_abbr[int(mon)]} {year}"
+        clause = f"created_at>={value}-01, created_at<{_next_month(value)}"
+    elif name == "size":
+        lower = int(value)
+        upper = conn.execute(
+            "SELECT MIN(lower) FROM size_buckets WHERE lower > ?;", (lower,)
+        ).fetchone()[0]
+        label = f"{_size_label(lower)} - {_size_label(upper)}" if upper else f"{_size_label(lower)} and up"
+        clause = f"size_bytes>={lower}" + (f", size_bytes<{upper}" if upper else "")
+    return {"label": label, "count": count, "filter": clause}
@@ -1,208 +1,520 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, abort, send_file, make_response
-from functools import wraps
-from werkzeug.utils import secure_filename
-from pathlib import Path
-from mimetypes import guess_type
-from db import get_conn_cm
-from metadata_utils import extract_metadata
-import sqlite3
-
-
-# Uploads directory lives alongside this file (project-root/Uploads)
-BASE_DIR = Path(__file__).resolve().parent
-UPLOAD_DIR = BASE_DIR / "Uploads"
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
-files_bp = Blueprint("files", __name__, template_folder="templates")
-
-def login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if "user_id" not in session:
-            return redirect(url_for("login_register_bp.login"))
-        return f(*args, **kwargs)
-    return decorated_function
-
-def _get_file_row(file_id: int):
-    """Return the row from files table or None if not found."""
-    from db import get_conn_cm
-    with get_conn_cm() as conn:
-        return conn.execute("SELECT * FROM files WHERE id = ?", (file_id,)).fetchone()
-
-def _resolve_disk_path(row):
-    """
-    Try to figure out where the file lives on disk, being tolerant of schema differences.
-    Prefers absolute stored paths if present; falls back to Uploads/<filename>.
-    """
-    # Try common column names people use for stored paths
-    candidates = ["stored_path", "file_path", "filepath", "path"]
-    for key in candidates:
-        if key in row.keys() and row[key]:
-            p = Path(row[key])
-            return p if p.is_absolute() else (UPLOAD_DIR / p)
-
-    # Fallback to filename in Uploads
-    name = row["filename"] if "filename" in row.keys() else None
-    return (UPLOAD_DIR / name) if name else None
-
-def _unique_path(directory: Path, filename: str) -> Path:
-    safe = secure_filename(filename or "")
-    if not safe:
-        safe = "upload"
-    target = directory / safe
-    if not target.exists():
-        return target
-    stem, suffix = target.stem, target.suffix
-    i = 1
-    while True:
-        candidate = directory / f"{stem}_{i}{suffix}"
-        if not candidate.exists():
-            return candidate
-        i += 1
-
-def _render_index(error=None):
-    with get_conn_cm() as conn:
-        col_info = conn.execute("PRAGMA table_info(files);").fetchall()
-        columns = [c["name"] for c in col_info]
-        raw_rows = conn.execute("SELECT * FROM files ORDER BY created_at DESC, id DESC;").fetchall()
-
-        enriched_rows = []
-        for r in raw_rows:
-            file_id = r["id"]
-            metadata_rows = conn.execute(
-                "SELECT meta_key, meta_value FROM metadata WHERE file_id = ?",
-                (file_id,)
-            ).fetchall()
-
-            r = dict(r)
-            r["metadata"] = {m["meta_key"]: m["meta_value"] for m in metadata_rows}
-            enriched_rows.append(r)
-
-    resp = make_response(render_template(
-        "index.html",
-        columns=columns,
-        rows=enriched_rows,
-        error=error,
-        upload_dir=str(UPLOAD_DIR),
-    ))
-    resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-    resp.headers["Pragma"] = "no-cache"
-    return resp
-
-@files_bp.get("/")
-@login_required
-def index():
-    return _render_index()
-
-@files_bp.post("/upload")
-@login_required
-def upload_file():
-    file = request.files.get("file")
-    comment = (request.form.get("comment") or "").strip() or None
-    if not file or not file.filename:
-        return _render_index(error="Please choose a file to upload."), 400
-
-    dest = _unique_path(UPLOAD_DIR, file.filename)
-    try:
-        file.save(str(dest))
-    except Exception as e:
-        return _render_index(error=f"Failed to save file: {e}"), 500
-
-    metadata = extract_metadata(str(dest))
-    filename = dest.name
-    size_bytes = dest.stat().st_size
-    mime_type = file.mimetype or guess_type(str(dest))[0]
-
-    with get_conn_cm() as conn:
-        conn.execute(
-            """
-            INSERT INTO files (filename, mime_type, size_bytes, storage_path, comment)
-            VALUES (?, ?, ?, ?, ?);
-            """,
-            (filename, mime_type, size_bytes, str(dest), comment),
-        )
-
-        file_id = conn.execute("SELECT last_insert_rowid();").fetchone()[0]
-
-        for key, value in metadata.items():
-            conn.execute(
-                """
-                INSERT INTO metadata (file_id, meta_key, meta_value)
-                VALUES (?, ?, ?);
-                """,
-                (file_id, key, value),
-            )
-
-    return redirect(url_for("files.index"))
-
-@files_bp.get("/files/<int:file_id>/download")
-@login_required
-def download_file(file_id):
-    row = _get_file_row(file_id)
-    if not row:
-        abort(404)
-    p = Path(row["storage_path"])
-    if not p.exists():
-        abort(404)
-    return send_file(p, as_attachment=True, download_name=row["filename"])
-
-@files_bp.route("/delete/<int:file_id>", methods=["POST", "GET"])
-@login_required
-def delete_file(file_id: int):
-    """
-    Delete a file record (and its metadata if present) and remove the file from disk.
-    Accepts GET for compatibility with existing templates, but prefer POST in forms.
-    """
-    row = _get_file_row(file_id)
-    if row is None:
-        # File ID doesn't exist
-        abort(404, description="File not found")
-
-    disk_path = _resolve_disk_path(row)
-
-    # 1) Remove DB rows first (so UI stops showing the file even if disk removal fails)
-    from db import get_conn_cm
-    with get_conn_cm() as conn:
-        # Best-effort: some schemas have a metadata table linked by file_id; ignore if it doesn't exist
-        try:
-            conn.execute("DELETE FROM metadata WHERE file_id = ?", (file_id,))
-        except sqlite3.OperationalError:
-            # metadata table (or column) may not exist; that's okay
-            pass
-
-        # Remove the file record itself
-        conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
-
-    # 2) Then try to remove the actual file from disk (won't raise if missing)
-    try:
-        if disk_path and disk_path.exists():
-            disk_path.unlink()
-    except Exception:
-        # Don't crash the request just because the file couldn't be deleted on disk
-        # (you can log this if you have logging configured)
-        pass
-
-    # Back to the index (or wherever you list files)
-    return redirect(url_for("files.index"))
-
-### search function added by DM
-@files_bp.post("/search")
-@login_required
-def search():
-    search_query = request.form['query']
-    with get_conn_cm() as conn:
-        col_info = conn.execute("PRAGMA table_info(files);").fetchall()
-        columns = [c["name"] for c in col_info]
-        rows = conn.execute(
-             "SELECT * FROM files WHERE filename LIKE ?", ('%' + search_query + '%',)
-        ).fetchall()
-
-    resp = make_response(render_template(
-        "search.html",
-        columns=columns,
-        rows=rows,
-        upload_dir=str(UPLOAD_DIR),  # optional to display where files go
-    ))
-    resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-    resp.headers["Pragma"] = "no-cache"
-    return resp
\ No newline at end of file
+from flask import (
+    Blueprint, stream_template, request, redirect, url_for, session, abort, send_file,
+    make_response, Response,
+)
+from functools import wraps
+from werkzeug.utils import secure_filename
+from pathlib import Path
+from mimetypes import guess_type
+from db import get_conn_cm, insert_files
+from pagination import fetch_page, page_size_from
+from search_utils import fts_query, search_sql, highlight
+from typed_metadata import parse_filters, filter_sql, prefer_correlated
+from facets import load_facets, file_count, UNOWNED
+import sharing
+from ingest import spool_upload
+from blobstore import store_blob
+import extraction_worker
+from zip_export import stream_zip
+from thumbnails import thumb_cache, cache_key, thumbnail_etag, snap_size, is_previewable, THUMBS_EAGER
+from metadata_utils import extract_metadata, extraction_cost, CHEAP
+from extraction_cache import extraction_cache
+from cleanup import delete_files, resolve_storage_path, sweeper
+from metrics import observe_upload
+from template_cache import render_rows
+import json
+import os
+
+
+# Uploads directory lives alongside this file (project-root/Uploads) by default
+BASE_DIR = Path(__file__).resolve().parent
+UPLOAD_DIR = Path(os.environ.get("UPLOAD_DIR", str(BASE_DIR / "Uploads")))
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# Content-addressed storage: one copy per distinct upload, shared by all its rows
+BLOB_DIR = UPLOAD_DIR / "blobs"
+
+# Downloads may be kept by the browser but must be revalidated (a cheap 304)
+# before reuse, since a file id can be deleted or belong to someone else later.
+DOWNLOAD_CACHE_CONTROL = "private, no-cache"
+
+files_bp = Blueprint("files", __name__, template_folder="templates")
+
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if "user_id" not in session:
+            return redirect(url_for("login_register_bp.login"))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def _get_file_row(file_id: int, user_id: int):
+    """Return the row from files table, or None if not found or not visible to user_id."""
+    where, params = sharing.visible_sql(user_id)
+    with get_conn_cm() as conn:
+        return conn.execute(f"SELECT * FROM files WHERE id = ? AND {where}", (file_id, *params)).fetchone()
+
+def _resolve_disk_path(row):
+    """Where a files row's content lives on disk (relative storage paths are under UPLOAD_DIR)."""
+    return resolve_storage_path(row["storage_path"], UPLOAD_DIR)
+
+# SQLite limits the number of bound parameters per statement (999 on older
+# builds), so metadata lookups are split into IN (...) chunks of this size.
+METADATA_CHUNK_SIZE = 500
+
+def _load_metadata(conn, file_ids):
+    """
+    Return {file_id: {meta_key: meta_value}} for every id in file_ids.
+    Issues one query per METADATA_CHUNK_SIZE ids instead of one per file.
+    """
+    file_ids = list(file_ids)
+    metadata = {file_id: {} for file_id in file_ids}
+    for start in range(0, len(file_ids), METADATA_CHUNK_SIZE):
+        chunk = file_ids[start:start + METADATA_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT file_id, meta_key, meta_value FROM metadata WHERE file_id IN ({placeholders})",
+            chunk,
+        ).fetchall()
+        for m in rows:
+            metadata[m["file_id"]][m["meta_key"]] = m["meta_value"]
+    return metadata
+
+# Bookkeeping columns that are not shown in the files table
+HIDDEN_COLUMNS = ("row_version",)
+
+def _display_columns(conn):
+    return [c["name"] for c in conn.execute("PRAGMA table_info(files);") if c["name"] not in HIDDEN_COLUMNS]
+
+def _lazy_count(sql, params=()):
+    """
+    Return a callable that runs a COUNT query when the template asks for it.
+    Pages are streamed, so the total is computed after the rows have gone out.
+    """
+    def count():
+        with get_conn_cm() as conn:
+            return conn.execute(sql, params).fetchone()[0]
+    return count
+
+def _lazy_file_count(owner):
+    """Like _lazy_count, for all of one owner's files (read from facet_counts, no scan)."""
+    def count():
+        with get_conn_cm() as conn:
+            return file_count(conn, owner)
+    return count
+
+def _facet_owner(user_id, scope, collection_id):
+    """Whose facet_counts cover a listing: user_id, UNOWNED, or None for a collection."""
+    # Counts are kept per owner, so collections have none
+    if collection_id is not None:
+        return None
+    return UNOWNED if scope == sharing.SHARED else user_id
+
+def _listing_sql(conn, user_id, scope, collection_id, filters, correlated=False):
+    """
+    WHERE fragment and params for the files user_id lists in a scope or
+    collection (see sharing) that match parsed filters, or None if user_id
+    may not open that collection.
+    """
+    scoped = sharing.scope_sql(conn, user_id, scope, collection_id)
+    if scoped is None:
+        return None
+    where, params = filter_sql(filters, correlated=correlated)
+    # The scope goes first so a user's listing seeks (user_id, created_at, id)
+    return " AND ".join(f"({w})" for w in (scoped[0], where) if w), [*scoped[1], *params]
+
+def _list_files(conn, user_id, scope, collection_id, filters, page_size, after=None, before=None, correlated=None):
+    """
+    One keyset page of a listing (see _listing_sql), newest first, and a
+    callable for its total. Returns None if the collection is not visible.
+    Shared by the files table and the JSON API. correlated picks the filter
+    plan; None asks prefer_correlated, so callers reading many pages of one
+    listing pass its answer instead of paying for it again on every page.
+    """
+    listing = _listing_sql(conn, user_id, scope, collection_id, filters)
+    if listing is None:
+        return None
+    page_where, page_params = listing
+    if correlated is None:
+        correlated = bool(filters) and prefer_correlated(conn, filters, page_size)
+    if filters and correlated:
+        page_where, page_params = _listing_sql(conn, user_id, scope, collection_id, filters, correlated=True)
+    page = fetch_page(
+        conn,
+        "SELECT * FROM files",
+        params=page_params,
+        where=page_where,
+        after=after,
+        before=before,
+        page_size=page_size,
+    )
+    owner = _facet_owner(user_id, scope, collection_id)
+    if filters or owner is None:
+        total_count = _lazy_count(f"SELECT COUNT(*) FROM files WHERE {listing[0]};", listing[1])
+    else:
+        total_count = _lazy_file_count(owner)
+    return page, total_count
+
+def _render_index(error=None, collection_id=None):
+    """
+    The files table. By default it lists the signed-in user's own files;
+    ?scope=shared lists files nobody owns and ?collection=<id> one collection
+    shared with them (see sharing). ?filter=pages>100,format=PDF (repeatable)
+    narrows it to files whose metadata matches every clause; see typed_metadata.
+    """
+    user_id = session["user_id"]
+    page_size = page_size_from(request.args.get("per_page"))
+    if collection_id is None:
+        collection_id = request.args.get("collection", type=int)
+    scope = sharing.SHARED if request.args.get("scope") == sharing.SHARED else sharing.MINE
+    scope_args = {"collection": collection_id} if collection_id is not None else (
+        {"scope": scope} if scope != sharing.MINE else {})
+    filter_text = ", ".join(v for v in request.args.getlist("filter") if v.strip())
+    bad_filter = False
+    try:
+        filters = parse_filters([filter_text])
+    except ValueError as e:
+        # Show everything, with the problem, rather than an empty table
+        error, bad_filter = error or str(e), True
+        filters = []
+    with get_conn_cm() as conn:
+        listed = _list_files(
+            conn, user_id, scope, collection_id, filters, page_size,
+            after=request.args.get("after"), before=request.args.get("before"),
+        )
+        if listed is None:
+            abort(404, description="Collection not found")
+        page, total_count = listed
+        collection = sharing.get_collection(conn, user_id, collection_id) if collection_id is not None else None
+        columns = _display_columns(conn)
+
+        # Rows seen before come from the fragment cache; only the rest need metadata
+        row_html = render_rows(page.rows, columns, lambda ids: _load_metadata(conn, ids))
+        # No sidebar for collections
+        owner = _facet_owner(user_id, scope, collection_id)
+        facets = load_facets(conn, owner) if owner is not None else []
+        collections = sharing.list_collections(conn, user_id)
+
+    resp = make_response(stream_template(
+        "index.html",
+        columns=columns,
+        rows=row_html,
+        page=page,
+        per_page=page_size,
+        pager_endpoint="files.index",
+        pager_args=dict(scope_args, filter=filter_text) if filter_text else scope_args,
+        total_count=total_count,
+        filter_text=filter_text,
+        facets=facets,
+        scope=scope,
+        scope_args=scope_args,
+        collection=collection,
+        collections=collections,
+        error=error,
+        upload_dir=str(UPLOAD_DIR),
+    ))
+    if bad_filter:
+        resp.status_code = 400
+    resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
+    resp.headers["Pragma"] = "no-cache"
+    return resp
+
+@files_bp.get("/")
+@login_required
+def index():
+    return _render_index()
+
+@files_bp.post("/upload")
+@login_required
+def upload_file():
+    """Store one or more uploaded files; all rows go in with a single transaction."""
+    uploads = [f for f in request.files.getlist("file") if f and f.filename]
+    comment = (request.form.get("comment") or "").strip() or None
+    if not uploads:
+        return _render_index(error="Please choose a file to upload."), 400
+    try:
+        _save_uploads(uploads, session["user_id"], comment)
+    except Exception as e:
+        return _render_index(error=f"Failed to save file: {e}"), 500
+    return redirect(url_for("files.index"))
+
+def _save_uploads(uploads, user_id, comment=None):
+    """
+    Store uploaded FileStorages for user_id and return their new file ids.
+    All rows go in with a single transaction; on failure the spooled uploads
+    are discarded and the exception propagates.
+    """
+    spools = []
+    try:
+        for file in uploads:
+            # Size and SHA-256 are accumulated while the upload streams to disk
+            spools.append((file, spool_upload(file, UPLOAD_DIR)))
+        observe_upload(sum(spool.size for _, spool in spools))
+
+        records = []
+        for file, spool in spools:
+            filename = secure_filename(file.filename) or "upload"
+            record = {
+                "user_id": user_id,
+                "filename": filename,
+                "mime_type": file.mimetype or guess_type(filename)[0],
+                "size_bytes": spool.size,
+                "comment": comment,
+                "sha256": spool.hexdigest(),
+                "metadata_status": "pending",
+            }
+            # Header-only extractors run now (before the write transaction);
+            # anything that reads the whole file is left to the worker
+            if extraction_cost(filename) == CHEAP:
+                record["metadata"] = extract_metadata(spool.path, filename=filename, sha256=record["sha256"])
+                record["metadata_status"] = "failed" if "error" in record["metadata"] else "done"
+            records.append(record)
+
+        with get_conn_cm() as conn:
+            for record, (_, spool) in zip(records, spools):
+                record["storage_path"] = str(store_blob(conn, BLOB_DIR, spool))
+            file_ids = insert_files(conn, records)
+            for file_id, record in zip(file_ids, records):
+                # The worker also pre-renders thumbnails for images
+                if record["metadata_status"] == "pending" or (THUMBS_EAGER and is_previewable(record)):
+                    extraction_worker.enqueue(conn, file_id)
+    except Exception:
+        for _, spool in spools:
+            spool.close()
+        raise
+
+    extraction_worker.worker.notify()
+    return file_ids
+
+@files_bp.get("/files/<int:file_id>/download")
+@login_required
+def download_file(file_id):
+    row = _get_file_row(file_id, session["user_id"])
+    if not row:
+        abort(404)
+    return _send_stored(row)
+
+def _send_stored(row):
+    """The content of a files row as an attachment, or 404 if it is gone from disk."""
+    p = _resolve_disk_path(row)
+    if not p.exists():
+        abort(404)
+    # conditional=True answers Range/If-Range with 206 and If-None-Match /
+    # If-Modified-Since with 304. Stored content never changes under a hash,
+    # so that hash is a strong validator; older rows get one from mtime/size.
+    resp = send_file(
+        p,
+        as_attachment=True,
+        download_name=row["filename"],
+        conditional=True,
+        etag=row["sha256"] or True,
+    )
+    resp.headers["Cache-Control"] = DOWNLOAD_CACHE_CONTROL
+    return resp
+
+@files_bp.get("/<int:file_id>/thumb")
+@login_required
+def thumbnail(file_id):
+    """WebP preview of an image upload (?size=128|256|512), generated on first request."""
+    row = _get_file_row(file_id, session["user_id"])
+    if not row or not is_previewable(row):
+        abort(404)
+    size = snap_size(request.args.get("size", type=int))
+    etag = thumbnail_etag(row, size)
+    # Revalidation from the browser never needs to touch the image at all
+    if etag in request.if_none_match:
+        resp = make_response("", 304)
+    else:
+        try:
+            path = thumb_cache.get(cache_key(row), _resolve_disk_path(row), size)
+        except FileNotFoundError:
+            abort(404)
+        except Exception:
+            abort(415, description="Could not render a preview for this file")
+        resp = send_file(path, mimetype="image/webp", etag=etag, conditional=True)
+    resp.set_etag(etag)
+    # Keyed by content hash, so a given URL's bytes never change for hashed rows
+    resp.headers["Cache-Control"] = "private, max-age=86400" + (", immutable" if row["sha256"] else "")
+    return resp
+
+def _export_batches(where, params):
+    """
+    Return batches(with_metadata), which yields (rows, metadata_by_id) for the
+    files matching where, METADATA_CHUNK_SIZE rows at a time in id order. Each
+    batch is its own short read, so a long download never holds a connection.
+    """
+    def batches(with_metadata):
+        last_id = 0
+        while True:
+            with get_conn_cm() as conn:
+                rows = conn.execute(
+                    f"SELECT * FROM files WHERE id > ? AND ({where}) ORDER BY id LIMIT ?;",
+                    (last_id, *params, METADATA_CHUNK_SIZE),
+                ).fetchall()
+                metadata = _load_metadata(conn, [r["id"] for r in rows]) if with_metadata else {}
+            if not rows:
+                return
+            yield rows, metadata
+            last_id = rows[-1]["id"]
+    return batches
+
+@files_bp.route("/export", methods=["GET", "POST"])
+@login_required
+def export_zip():
+    """
+    Stream a ZIP of the selected files (ids=1&ids=2...) or of everything
+    matching a search (query=...), with a manifest.csv of their metadata.
+    """
+    ids = request.values.getlist("ids", type=int)
+    match = fts_query(request.values.get("query") or "")
+    if ids:
+        where, params = "id IN (SELECT value FROM json_each(?))", (json.dumps(ids),)
+    elif match:
+        where, params = "id IN (SELECT rowid FROM files_fts WHERE files_fts MATCH ?)", (match,)
+    else:
+        abort(400, description="Select some files or enter a search to export")
+    visible, visible_params = sharing.visible_sql(session["user_id"])
+
+    resp = Response(
+        stream_zip(_export_batches(f"{where} AND {visible}", (*params, *visible_params)), _resolve_disk_path),
+        mimetype="application/zip",
+    )
+    resp.headers["Content-Disposition"] = "attachment; filename=dandelion-export.zip"
+    return resp
+
+@files_bp.get("/extraction-cache")
+@login_required
+def extraction_cache_stats():
+    """Hit/miss counters (this process) and size of the extraction cache, as JSON."""
+    return extraction_cache.stats()
+
+@files_bp.route("/delete/<int:file_id>", methods=["POST", "GET"])
+@login_required
+def delete_file(file_id: int):
+    """
+    Delete a file record and its metadata; the file itself is removed from
+    disk by the sweeper once nothing else references its content.
+    Accepts GET for compatibility with existing templates, but prefer POST in forms.
+    """
+    with get_conn_cm() as conn:
+        deleted = delete_files(conn, sharing.owned_ids(conn, session["user_id"], [file_id]), UPLOAD_DIR)
+    if not deleted:
+        abort(404, description="File not found")
+    sweeper.notify()
+    return redirect(url_for("files.index"))
+
+@files_bp.post("/delete")
+@login_required
+def delete_selected():
+    """
+    Delete every file checked in the bulk form (ids=1&ids=2...) in one
+    transaction. Files the user may only read (unowned ones, or those shared
+    through a collection) are skipped.
+    """
+    ids = request.form.getlist("ids", type=int)
+    if not ids:
+        abort(400, description="Select some files to delete")
+    with get_conn_cm() as conn:
+        delete_files(conn, sharing.owned_ids(conn, session["user_id"], ids), UPLOAD_DIR)
+    sweeper.notify()
+    return redirect(request.referrer or url_for("files.index"))
+
+@files_bp.post("/collections/add")
+@login_required
+def add_to_collection():
+    """Add the files checked in the bulk form to one of the user's collections (by name)."""
+    ids = request.form.getlist("ids", type=int)
+    if not ids:
+        abort(400, description="Select some files to add")
+    try:
+        with get_conn_cm() as conn:
+            collection_id = sharing.add_to_collection(conn, session["user_id"], request.form.get("collection"), ids)
+    except ValueError as e:
+        return _render_index(error=str(e)), 400
+    return redirect(url_for("files.index", collection=collection_id))
+
+@files_bp.post("/collections/<int:collection_id>/share")
+@login_required
+def share_collection(collection_id: int):
+    """Give another user (by username) access to one of the user's collections."""
+    try:
+        with get_conn_cm() as conn:
+            sharing.share_collection(conn, session["user_id"], collection_id, request.form.get("username"))
+    except ValueError as e:
+        return _render_index(error=str(e), collection_id=collection_id), 400
+    return redirect(url_for("files.index", collection=collection_id))
+
+def _search_files(conn, user_id, match, page_size, after=None, before=None):
+    """
+    One page of the files user_id may read that match an FTS query (from
+    fts_query), ranked by bm25 and paged by (score, id), and a callable for
+    the total. With no match, every visible file, newest first.
+    """
+    visible, visible_params = sharing.visible_sql(user_id)
+    if not match:
+        page = fetch_page(
+            conn,
+            "SELECT * FROM files",
+            params=visible_params,
+            where=visible,
+            after=after,
+            before=before,
+            page_size=page_size,
+        )
+        return page, _lazy_count(f"SELECT COUNT(*) FROM files WHERE {visible};", visible_params)
+    page = fetch_page(
+        conn,
+        search_sql(),
+        params=(match, *visible_params),
+        where=visible,
+        keys=("score", "id"),
+        descending=False,
+        after=after,
+        before=before,
+        page_size=page_size,
+    )
+    total_count = _lazy_count(
+        "SELECT COUNT(*) FROM files"
+        f" WHERE id IN (SELECT rowid FROM files_fts WHERE files_fts MATCH ?) AND {visible};",
+        (match, *visible_params),
+    )
+    return page, total_count
+
+### search function added by DM
+@files_bp.route("/search", methods=["GET", "POST"])
+@login_required
+def search():
+    """
+    Full-text search over filenames, comments and extracted metadata.
+    Each word is a prefix match; results are ranked by bm25 and paged by (score, id).
+    """
+    # POST comes from the search box; GET from the pager links
+    search_query = (request.values.get("query") or "").strip()
+    page_size = page_size_from(request.args.get("per_page"))
+    with get_conn_cm() as conn:
+        columns = _display_columns(conn)
+        page, total_count = _search_files(
+            conn, session["user_id"], fts_query(search_query), page_size,
+            after=request.args.get("after"), before=request.args.get("before"),
+        )
+
+    rows = []
+    for r in page.rows:
+        r = dict(r)
+        r["snippet"] = highlight(r.get("snippet"))
+        rows.append(r)
+
+    resp = make_response(stream_template(
+        "search.html",
+        columns=columns,
+        rows=rows,
+        query=search_query,
+        page=page,
+        per_page=page_size,
+        pager_endpoint="files.search",
+        pager_args={"query": search_query},
+        total_count=total_count,
+        upload_dir=str(UPLOAD_DIR),  # optional to display where files go
+    ))
+    resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
+    resp.headers["Pragma"] = "no-cache"
+    return resp
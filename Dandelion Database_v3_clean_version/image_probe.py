@@ -0,0 +1,230 @@
+import os
+import re
+import warnings
+
+# Image metadata from headers only. Pillow's Image.open parses just the file
+# header (pixels are decoded by load(), which is never called here), and
+# EXIF/ICC come out of that same header. WebP is the exception: Pillow reads
+# a whole (possibly animated, multi-MB) WebP into memory on open, so WebP
+# files are read by walking their RIFF chunk headers instead.
+
+# An EXIF block bigger than this is not worth reading (real ones are < 64 KB)
+MAX_EXIF_BYTES = int(os.environ.get("IMAGE_MAX_EXIF_BYTES", str(1024 * 1024)))
+# TIFF directories counted at most. Image probing runs inside the upload
+# request, so a crafted chain of IFDs must not be walked for long.
+MAX_TIFF_FRAMES = int(os.environ.get("IMAGE_MAX_TIFF_FRAMES", "10000"))
+# WebP RIFF chunks walked at most, for the same reason (empty chunks are 8 bytes)
+MAX_RIFF_CHUNKS = int(os.environ.get("IMAGE_MAX_RIFF_CHUNKS", "10000"))
+
+# Bits per channel for each Pillow mode; TIFF files say exactly in BitsPerSample
+MODE_BIT_DEPTH = {
+    "1": 1, "L": 8, "LA": 8, "La": 8, "P": 8, "PA": 8, "RGB": 8, "RGBA": 8, "RGBa": 8,
+    "RGBX": 8, "CMYK": 8, "YCbCr": 8, "LAB": 8, "HSV": 8,
+    "I;16": 16, "I;16L": 16, "I;16B": 16, "I;16N": 16, "I": 32, "F": 32,
+}
+
+# EXIF tag numbers
+_MAKE, _MODEL, _ORIENTATION, _DATETIME = 0x010F, 0x0110, 0x0112, 0x0132
+_EXIF_IFD, _GPS_IFD = 0x8769, 0x8825
+_DATETIME_ORIGINAL, _DATETIME_DIGITIZED, _OFFSET_TIME_ORIGINAL, _LENS_MODEL = 0x9003, 0x9004, 0x9011, 0xA434
+_BITS_PER_SAMPLE = 0x0102
+
+
+def _clean(value):
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", errors="replace")
+    if value is None:
+        return None
+    value = str(value).replace("\x00", "").strip()
+    return value or None
+
+
+_EXIF_DATETIME = re.compile(r"(\d{4}):(\d{2}):(\d{2})[ T](\d{2}):(\d{2}):(\d{2})")
+
+
+def _exif_datetime(value, offset=None):
+    """`2024:01:31 09:30:00` -> `2024-01-31T09:30:00` (plus the UTC offset when recorded)."""
+    value = _clean(value)
+    if not value:
+        return None
+    m = _EXIF_DATETIME.match(value)
+    if not m:
+        return value
+    result = "{}-{}-{}T{}:{}:{}".format(*m.groups())
+    offset = _clean(offset)
+    return result + offset if offset else result
+
+
+def _gps_coord(dms, ref):
+    try:
+        degrees = float(dms[0]) + float(dms[1]) / 60 + float(dms[2]) / 3600
+    except (TypeError, ValueError, IndexError, ZeroDivisionError):
+        return None
+    if _clean(ref) in ("S", "W"):
+        degrees = -degrees
+    return round(degrees, 7)
+
+
+def exif_fields(exif) -> dict:
+    """Camera, capture time and GPS position from a PIL.Image.Exif."""
+    metadata = {}
+    ifd = exif.get_ifd(_EXIF_IFD)
+    gps = exif.get_ifd(_GPS_IFD)
+    fields = {
+        "camera_make": _clean(exif.get(_MAKE)),
+        "camera_model": _clean(exif.get(_MODEL)),
+        "lens_model": _clean(ifd.get(_LENS_MODEL)),
+        "captured_at": _exif_datetime(
+            ifd.get(_DATETIME_ORIGINAL) or ifd.get(_DATETIME_DIGITIZED) or exif.get(_DATETIME),
+            ifd.get(_OFFSET_TIME_ORIGINAL),
+        ),
+        "orientation": exif.get(_ORIENTATION),
+        "gps_latitude": _gps_coord(gps.get(2), gps.get(1)),
+        "gps_longitude": _gps_coord(gps.get(4), gps.get(3)),
+    }
+    if gps.get(6) is not None:
+        try:
+            altitude = float(gps[6])
+            fields["gps_altitude"] = round(-altitude if gps.get(5) == 1 else altitude, 2)
+        except (TypeError, ValueError, ZeroDivisionError):
+            pass
+    for key, value in fields.items():
+        if value is not None:
+            metadata[key] = value
+    return metadata
+
+
+def _probe_webp(f) -> dict:
+    """Walk RIFF chunk headers: VP8X/VP8/VP8L for size, ANMF to count frames, ICCP, EXIF."""
+    metadata = {"format": "WEBP"}
+    width = height = None
+    frames = 0
+    alpha = icc = False
+    exif = None
+    f.seek(4)
+    # The RIFF size counts from offset 8; anything after it is not WebP data
+    end = 8 + int.from_bytes(f.read(4), "little")
+    f.seek(12)
+    for _ in range(MAX_RIFF_CHUNKS):
+        if f.tell() + 8 > end:
+            break
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        fourcc, size = header[:4], int.from_bytes(header[4:], "little")
+        start = f.tell()
+        if fourcc == b"VP8X":
+            data = f.read(10)
+            alpha, icc = bool(data[0] & 0x10), bool(data[0] & 0x20)
+            width = 1 + int.from_bytes(data[4:7], "little")
+            height = 1 + int.from_bytes(data[7:10], "little")
+        elif fourcc == b"VP8 " and width is None:
+            data = f.read(10)
+            width = int.from_bytes(data[6:8], "little") & 0x3FFF
+            height = int.from_bytes(data[8:10], "little") & 0x3FFF
+        elif fourcc == b"VP8L" and width is None:
+            bits = int.from_bytes(f.read(5)[1:], "little")
+            width, height = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            alpha = bool(bits >> 28 & 1)
+        elif fourcc == b"ANMF":
+            frames += 1
+        elif fourcc == b"ICCP":
+            icc = True
+        elif fourcc == b"EXIF" and size <= MAX_EXIF_BYTES:
+            exif = f.read(size)
+        # Chunks are padded to an even length
+        f.seek(start + size + (size & 1))
+    else:
+        # Stopped by MAX_RIFF_CHUNKS, so ANMF frames may be undercounted
+        metadata["frames_capped"] = "yes"
+    if width is None:
+        raise ValueError("WebP file has no image chunk")
+    metadata.update({
+        "width": width,
+        "height": height,
+        "mode": "RGBA" if alpha else "RGB",
+        "bit_depth": 8,
+        "frames": frames or 1,
+        "icc_profile": "yes" if icc else "no",
+    })
+    if exif:
+        from PIL import Image
+
+        parsed = Image.Exif()
+        parsed.load(exif)
+        metadata.update(exif_fields(parsed))
+    return metadata
+
+
+def _tiff_frame_count(f, limit=MAX_TIFF_FRAMES) -> int:
+    """
+    Count the IFDs of a TIFF, up to limit, by hopping from one directory's
+    next-IFD pointer to the next; Pillow's n_frames fully sets up every frame.
+    """
+    f.seek(0)
+    header = f.read(16)
+    order = "little" if header[:2] == b"II" else "big"
+    big = int.from_bytes(header[2:4], order) == 43
+    count_size, entry_size, offset_size = (8, 20, 8) if big else (2, 12, 4)
+    offset = int.from_bytes(header[8:16] if big else header[4:8], order)
+    frames = 0
+    seen = set()
+    while offset and offset not in seen and frames < limit:
+        seen.add(offset)
+        f.seek(offset)
+        entries = int.from_bytes(f.read(count_size), order)
+        f.seek(offset + count_size + entries * entry_size)
+        pointer = f.read(offset_size)
+        if len(pointer) < offset_size:
+            break
+        frames += 1
+        offset = int.from_bytes(pointer, order)
+    return frames
+
+
+def _probe_pillow(f) -> dict:
+    from PIL import Image
+
+    with warnings.catch_warnings():
+        # Nothing is decoded, so decompression-bomb warnings do not apply here
+        warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+        img = Image.open(f)
+    with img:
+        metadata = {
+            "format": img.format,
+            "width": img.width,
+            "height": img.height,
+            "mode": img.mode,
+            "bit_depth": MODE_BIT_DEPTH.get(img.mode),
+            "icc_profile": "yes" if img.info.get("icc_profile") else "no",
+        }
+        tags = getattr(img, "tag_v2", None)
+        if tags is not None and tags.get(_BITS_PER_SAMPLE):
+            bits = tags[_BITS_PER_SAMPLE]
+            metadata["bit_depth"] = max(bits) if isinstance(bits, tuple) else bits
+        if img.format == "TIFF":
+            metadata["frames"] = _tiff_frame_count(f)
+            if metadata["frames"] >= MAX_TIFF_FRAMES:
+                metadata["frames_capped"] = "yes"
+        else:
+            # n_frames walks frame headers (GIF blocks, APNG chunks), not pixel data
+            metadata["frames"] = getattr(img, "n_frames", 1)
+        # PNG keeps eXIf wherever it likes, and getexif() would decode the
+        # image to find one after IDAT; only use it if the header had it
+        if img.format != "PNG" or "exif" in img.info:
+            metadata.update(exif_fields(img.getexif()))
+    return {k: v for k, v in metadata.items() if v is not None}
+
+
+def probe_image(file_path) -> dict:
+    """Header-only image metadata, one key per metadata row."""
+    with open(file_path, "rb") as f:
+        head = f.read(12)
+        f.seek(0)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            metadata = _probe_webp(f)
+        else:
+            metadata = _probe_pillow(f)
+    # Kept from the original extractor, which only recorded this and format
+    metadata["resolution"] = f"{metadata['width']}x{metadata['height']}"
+    return metadata
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from flask import Request
+
+# Bytes copied per read when an upload has to be streamed from another file
+CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+
+class HashingSpoolFile:
+    """
+    Writable temp file that keeps a running size and SHA-256 of everything
+    written to it. Werkzeug's multipart parser writes each uploaded file into
+    one of these chunk by chunk, so by the time the view runs the upload is
+    already on disk next to its final location, with its digest computed.
+    Unless commit_to() moves it into place, the temp file is removed on close.
+    """
+
+    def __init__(self, directory):
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=str(directory), prefix=".upload-", suffix=".part")
+        self.path = Path(path)
+        self._f = os.fdopen(fd, "w+b")
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self._committed = False
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._f.write(data)
+
+    def read(self, *args):
+        return self._f.read(*args)
+
+    def readline(self, *args):
+        return self._f.readline(*args)
+
+    def seek(self, *args):
+        return self._f.seek(*args)
+
+    def tell(self):
+        return self._f.tell()
+
+    def flush(self):
+        self._f.flush()
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    @property
+    def closed(self):
+        return self._f.closed
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def commit_to(self, dest: Path):
+        """Close the spool file and atomically rename it to dest."""
+        self._f.close()
+        os.replace(self.path, dest)
+        self._committed = True
+
+    def detach(self) -> Path:
+        """Close the spool file but leave it on disk (for another process to place); returns its path."""
+        self._f.close()
+        self._committed = True
+        return self.path
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+        if not self._committed:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __iter__(self):
+        return iter(self._f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class IngestRequest(Request):
+    """Request class that spools file uploads into spool_dir through HashingSpoolFile."""
+
+    # Set by the app to the directory uploads end up in, so the final rename
+    # never crosses a filesystem boundary
+    spool_dir = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.spool_dir is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return HashingSpoolFile(self.spool_dir)
+
+
+def spool_stream(src, directory):
+    """
+    Copy a readable stream into a new HashingSpoolFile in directory, CHUNK_SIZE
+    bytes at a time. The caller decides where to commit_to() it (or closes it).
+    """
+    spool = HashingSpoolFile(directory)
+    try:
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            spool.write(chunk)
+        spool.flush()
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+
+def spool_upload(file_storage, directory):
+    """
+    Return the uploaded file as a hashed HashingSpoolFile in directory.
+    Uploads parsed by IngestRequest already are one; anything else is copied.
+    """
+    stream = file_storage.stream
+    if isinstance(stream, HashingSpoolFile) and stream.path.parent == Path(directory):
+        stream.flush()
+        return stream
+    return spool_stream(stream, directory)
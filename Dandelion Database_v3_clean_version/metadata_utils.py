@@ -1,27 +1,135 @@
-from mimetypes import guess_type
-from PIL import Image
-from PyPDF2 import PdfReader
-from pathlib import Path
-
-def extract_metadata(file_path: str) -> dict:
-    metadata = {}
-    mime_type = guess_type(file_path)[0] or ""
-
-    if mime_type.startswith("image"):
-        try:
-            with Image.open(file_path) as img:
-                metadata["resolution"] = f"{img.width}x{img.height}"
-                metadata["format"] = img.format
-        except Exception as e:
-            metadata["error"] = f"Image metadata error: {e}"
-
-    elif mime_type == "application/pdf":
-        try:
-            with open(file_path, "rb") as f:
-                reader = PdfReader(f)
-                metadata["pages"] = len(reader.pages)
-        except Exception as e:
-            metadata["error"] = f"PDF metadata error: {e}"
-
-    metadata["mime_type"] = mime_type
-    return metadata
+import importlib
+import os
+import time
+from mimetypes import guess_type
+from pathlib import Path
+from extraction_cache import extraction_cache
+from metrics import observe_extraction
+
+# Extractors are registered by MIME type and/or filename extension and named
+# as "module:function", so a plugin's module (and whatever it imports, like
+# Pillow or PyPDF2) is only loaded the first time a matching file shows up.
+# Each one declares a cost class, which decides where it runs:
+#   CHEAP      header-only and bounded; runs inline in the upload request
+#   EXPENSIVE  reads the whole file or may be slow; runs in extraction_worker
+# and a version, which is part of the extraction cache key: bump it when an
+# extractor starts producing different output, and only its cached results
+# are recomputed.
+CHEAP = "cheap"
+EXPENSIVE = "expensive"
+
+# Set to 0 to always parse (e.g. while developing an extractor)
+USE_CACHE = os.environ.get("EXTRACTION_CACHE", "1") == "1"
+
+
+class Extractor:
+    def __init__(self, name, target, mime_types=(), extensions=(), cost=EXPENSIVE, version=1):
+        self.name = name
+        self.version = version
+        self.target = target
+        self.mime_types = tuple(mime_types)
+        self.extensions = tuple(e.lower() for e in extensions)
+        self.cost = cost
+        self._func = None
+
+    def __call__(self, file_path) -> dict:
+        if self._func is None:
+            module, func = self.target.split(":")
+            self._func = getattr(importlib.import_module(module), func)
+        return self._func(file_path)
+
+    def __repr__(self):
+        return f"Extractor({self.name!r}, {self.target!r}, cost={self.cost!r}, version={self.version})"
+
+
+_by_extension = {}
+_by_mime = {}
+
+
+def register_extractor(name, target, mime_types=(), extensions=(), cost=EXPENSIVE, version=1) -> Extractor:
+    """
+    Register target ("module:function", taking a path and returning a dict)
+    for the given MIME types ("image/*" matches a whole major type) and
+    extensions (".fastq.gz" style compound suffixes work). Later
+    registrations win, so a deployment can override a built-in.
+    """
+    extractor = Extractor(name, target, mime_types, extensions, cost, version)
+    for mime_type in extractor.mime_types:
+        _by_mime[mime_type] = extractor
+    for extension in extractor.extensions:
+        _by_extension[extension] = extractor
+    return extractor
+
+
+def find_extractor(filename, mime_type=None):
+    """The extractor for a file, by extension first (most specific), then MIME type."""
+    suffixes = [s.lower() for s in Path(filename).suffixes]
+    for i in range(len(suffixes)):
+        extractor = _by_extension.get("".join(suffixes[i:]))
+        if extractor:
+            return extractor
+    mime_type = mime_type or guess_type(filename)[0] or ""
+    return _by_mime.get(mime_type) or _by_mime.get(mime_type.split("/")[0] + "/*")
+
+
+def extraction_cost(filename) -> str:
+    """Cost class for a file; files nobody extracts are CHEAP (only mime_type is recorded)."""
+    extractor = find_extractor(filename)
+    return extractor.cost if extractor else CHEAP
+
+
+def extract_metadata(file_path: str, filename: str = None, sha256: str = None) -> dict:
+    """
+    Metadata for one file. With sha256, results come from (and go to) the
+    extraction cache, so content seen before is never parsed again.
+    """
+    # Stored blobs are named by hash, so the type is guessed from the original name
+    name = filename or str(file_path)
+    mime_type = guess_type(name)[0] or ""
+    extractor = find_extractor(name, mime_type)
+    metadata = {}
+    if extractor is not None:
+        cached = None
+        if sha256 and USE_CACHE:
+            cached = extraction_cache.get(sha256, extractor.name, extractor.version)
+        if cached is not None:
+            metadata.update(cached)
+        else:
+            start = time.perf_counter()
+            try:
+                metadata.update(extractor(file_path))
+            except Exception as e:
+                metadata["error"] = f"{extractor.name} metadata error: {e}"
+            observe_extraction(mime_type, extractor.name, time.perf_counter() - start)
+            # Failures may be transient (timeouts, a file still being written)
+            if sha256 and USE_CACHE and "error" not in metadata:
+                extraction_cache.put(sha256, extractor.name, extractor.version, metadata)
+    metadata["mime_type"] = mime_type
+    return metadata
+
+
+# Built-in extractors
+register_extractor("Image", "image_probe:probe_image", mime_types=["image/*"], cost=CHEAP, version=2)
+# The probe is header-only, but its fallback is a full parse with a 30 s budget
+register_extractor("PDF", "pdf_probe:extract_pdf_metadata", mime_types=["application/pdf"])
+register_extractor(
+    "Text",
+    "text_probe:extract_text_metadata",
+    mime_types=["text/plain", "text/markdown"],
+    extensions=[".txt", ".md", ".log"],
+)
+register_extractor(
+    "Table",
+    "text_probe:extract_table_metadata",
+    mime_types=["text/csv", "text/tab-separated-values"],
+    extensions=[".csv", ".tsv", ".tab"],
+)
+register_extractor(
+    "Sequence",
+    "seq_probe:extract_sequence_metadata",
+    extensions=[
+        ext + gz
+        for ext in (".fa", ".fasta", ".fna", ".ffn", ".faa", ".frn", ".fas", ".fq", ".fastq")
+        for gz in ("", ".gz")
+    ],
+)
@@ -0,0 +1,285 @@
+import cProfile
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from flask import Response, abort, request
+from template_cache import row_fragments
+
+# Opt-in instrumentation. With METRICS_ENABLED=1 the app records, per route,
+# request latency and how many SQL statements each request ran (and how long
+# they took, so an N+1 loop shows up as a fat tail), plus extraction time per
+# MIME type and upload throughput, and serves them at /metrics in the
+# Prometheus text format to clients on this machine. PROFILE_DIR=<dir> writes
+# a cProfile dump of every request slower than PROFILE_MIN_MS to that
+# directory (open them with `python -m pstats` or snakeviz).
+#
+# When both are off nothing is hooked: db.connect makes plain connections and
+# the observe_* calls return straight away.
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "")
+PROFILE_MIN_MS = float(os.environ.get("PROFILE_MIN_MS", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+EXTRACTION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+THROUGHPUT_BUCKETS = tuple(2 ** n * 1024 * 1024 for n in range(-2, 11))  # 256 KiB/s .. 1 GiB/s
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        with _lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for values, total in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labels, values)} {_number(total)}"
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, *label_values):
+        with _lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [0] * len(self.buckets) + [0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for values, series in sorted(self._values.items()):
+            for bound, n in zip(self.buckets, series):
+                yield f"{self.name}_bucket{_labels(self.labels, values, [('le', _number(bound))])} {n}"
+            yield f"{self.name}_bucket{_labels(self.labels, values, [('le', '+Inf')])} {series[-1]}"
+            yield f"{self.name}_sum{_labels(self.labels, values)} {_number(series[-2])}"
+            yield f"{self.name}_count{_labels(self.labels, values)} {series[-1]}"
+
+
+_lock = threading.Lock()
+_current = threading.local()  # .stats: RequestStats while this thread serves a request
+
+REQUEST_SECONDS = Histogram(
+    "dandelion_request_duration_seconds", "Time from request start until the response body was sent.",
+    ("method", "route", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "dandelion_request_sql_queries", "SQL statements run while serving one request.",
+    ("method", "route"), QUERY_BUCKETS,
+)
+REQUEST_SQL_SECONDS = Histogram(
+    "dandelion_request_sql_seconds", "Time spent in SQL statements while serving one request.",
+    ("method", "route"),
+)
+SQL_QUERIES = Counter(
+    "dandelion_sql_queries_total", "SQL statements run, by requests or background threads.", ("context",)
+)
+SQL_SECONDS = Counter(
+    "dandelion_sql_seconds_total", "Time spent in SQL statements, by requests or background threads.", ("context",)
+)
+EXTRACTION_SECONDS = Histogram(
+    "dandelion_extraction_seconds", "Metadata extraction time per file (cache misses only).",
+    ("mime_type", "extractor"), EXTRACTION_BUCKETS,
+)
+UPLOAD_BYTES = Counter("dandelion_upload_bytes_total", "Bytes received in file uploads.")
+UPLOAD_THROUGHPUT = Histogram(
+    "dandelion_upload_bytes_per_second", "Upload rate per request, from request start to the body on disk.",
+    buckets=THROUGHPUT_BUCKETS,
+)
+
+_METRICS = (
+    REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_SQL_SECONDS, SQL_QUERIES, SQL_SECONDS,
+    EXTRACTION_SECONDS, UPLOAD_BYTES, UPLOAD_THROUGHPUT,
+)
+
+
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.profiler = None
+
+
+def _record_query(seconds):
+    stats = getattr(_current, "stats", None)
+    if stats is not None:
+        stats.queries += 1
+        stats.sql_seconds += seconds
+    context = "request" if stats is not None else "background"
+    SQL_QUERIES.inc(context)
+    SQL_SECONDS.inc(context, amount=seconds)
+
+
+class TimedConnection(sqlite3.Connection):
+    """
+    sqlite3 connection that counts and times execute/executemany/executescript.
+    The time covers running each statement up to its first row; fetching the
+    rest of a large result is not included.
+    """
+
+    def execute(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            _record_query(time.perf_counter() - start)
+
+    def executemany(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            _record_query(time.perf_counter() - start)
+
+    def executescript(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().executescript(*args)
+        finally:
+            _record_query(time.perf_counter() - start)
+
+
+# What db.connect builds connections with
+connection_factory = TimedConnection if METRICS_ENABLED else sqlite3.Connection
+
+
+def observe_extraction(mime_type, extractor, seconds):
+    if METRICS_ENABLED:
+        EXTRACTION_SECONDS.observe(seconds, mime_type or "unknown", extractor)
+
+
+def observe_upload(nbytes):
+    """Record an upload of nbytes whose body has just been stored, timed from the start of the request."""
+    stats = getattr(_current, "stats", None)
+    if not METRICS_ENABLED or stats is None:
+        return
+    UPLOAD_BYTES.inc(amount=nbytes)
+    elapsed = time.perf_counter() - stats.start
+    if elapsed > 0:
+        UPLOAD_THROUGHPUT.observe(nbytes / elapsed)
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _before_request():
+    stale = getattr(_current, "stats", None)
+    if stale is not None and stale.profiler is not None:
+        # The previous response on this thread was never closed
+        stale.profiler.disable()
+    stats = _current.stats = RequestStats()
+    if PROFILE_DIR:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            stats.profiler = profiler
+        except ValueError:
+            # Another profiler is active on this interpreter; skip this request
+            pass
+
+
+def _after_request(response):
+    stats = getattr(_current, "stats", None)
+    if stats is None:
+        return response
+    method, route, status = request.method, _route(), response.status_code
+    # Streamed pages keep running SQL after this hook, so the request is only
+    # finished once the server has sent (and closed) the body
+    response.call_on_close(lambda: _finish(stats, method, route, status))
+    return response
+
+
+def _finish(stats, method, route, status):
+    if getattr(_current, "stats", None) is stats:
+        _current.stats = None
+    elapsed = time.perf_counter() - stats.start
+    if stats.profiler is not None:
+        stats.profiler.disable()
+        if elapsed * 1000 >= PROFILE_MIN_MS:
+            name = re.sub(r"[^A-Za-z0-9_.-]+", "_", route.strip("/")) or "root"
+            path = Path(PROFILE_DIR) / f"{time.strftime('%Y%m%d-%H%M%S')}-{method}-{name}-{elapsed * 1000:.0f}ms.prof"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            stats.profiler.dump_stats(str(path))
+    if METRICS_ENABLED:
+        REQUEST_SECONDS.observe(elapsed, method, route, status)
+        REQUEST_QUERIES.observe(stats.queries, method, route)
+        REQUEST_SQL_SECONDS.observe(stats.sql_seconds, method, route)
+
+
+def _stats_lines(prefix, title, stats, fields):
+    for key, kind in fields:
+        name = f"{prefix}_{key}" + ("_total" if kind == "counter" else "")
+        yield f"# HELP {name} {title} {key.replace('_', ' ')} (counters are for this process)."
+        yield f"# TYPE {name} {kind}"
+        yield f"{name} {stats[key]}"
+
+
+def _cache_lines():
+    # Imported here: the extraction cache imports db, which imports this module
+    from extraction_cache import extraction_cache
+    yield from _stats_lines(
+        "dandelion_extraction_cache", "Extraction cache", extraction_cache.stats(),
+        (("hits", "counter"), ("misses", "counter"), ("stores", "counter"), ("evictions", "counter"),
+         ("entries", "gauge"), ("size_bytes", "gauge"), ("max_bytes", "gauge")),
+    )
+    yield from _stats_lines(
+        "dandelion_row_fragment_cache", "Files table row fragment cache", row_fragments.stats(),
+        (("hits", "counter"), ("misses", "counter"), ("entries", "gauge"), ("max_entries", "gauge")),
+    )
+
+
+def render() -> str:
+    lines = [line for metric in _METRICS for line in metric.render()]
+    lines.extend(_cache_lines())
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view():
+    # Served to this machine only; put a scraper next to the app or behind a tunnel
+    if request.remote_addr not in ("127.0.0.1", "::1"):
+        abort(404)
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    """Install the request hooks and /metrics on app, if metrics or profiling are switched on."""
+    if not (METRICS_ENABLED or PROFILE_DIR):
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    if METRICS_ENABLED:
+        app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,96 @@
+import base64
+import json
+import os
+
+# Rows per page for the files table; ?per_page= may override up to MAX_PAGE_SIZE
+DEFAULT_PAGE_SIZE = int(os.environ.get("FILES_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.environ.get("FILES_MAX_PAGE_SIZE", "500"))
+
+
+def encode_cursor(values) -> str:
+    """Pack the sort-key values of a row into an opaque, URL-safe token."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor. Returns None for a missing or malformed token."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def page_size_from(value) -> int:
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+class Page:
+    """One page of rows plus the cursors needed to link to its neighbours."""
+
+    def __init__(self, rows, next_cursor=None, prev_cursor=None):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def fetch_page(conn, select_sql, params=(), keys=("created_at", "id"), descending=True,
+               after=None, before=None, page_size=DEFAULT_PAGE_SIZE, where=None):
+    """
+    Keyset (seek) pagination.
+
+    select_sql is a "SELECT ... FROM ..." statement without WHERE/ORDER BY; extra
+    filters go in `where` (a SQL fragment) with their values in `params`.
+    Rows are ordered by `keys`, and the page starts strictly after (or ends
+    strictly before) the key values encoded in the `after` / `before` cursor,
+    so every page is an index seek of page_size + 1 rows - no OFFSET scan.
+    """
+    cursor_values = decode_cursor(before) if before else decode_cursor(after)
+    backwards = bool(before) and cursor_values is not None
+    if cursor_values is not None and len(cursor_values) != len(keys):
+        cursor_values = None
+        backwards = False
+
+    conditions = [where] if where else []
+    params = list(params)
+    if cursor_values is not None:
+        # Walking forward in a DESC listing means "smaller keys", and vice versa
+        op = "<" if descending != backwards else ">"
+        conditions.append(f"({', '.join(keys)}) {op} ({', '.join('?' * len(keys))})")
+        params.extend(cursor_values)
+
+    sql = select_sql
+    if conditions:
+        sql += " WHERE " + " AND ".join(f"({c})" for c in conditions)
+    direction = "DESC" if descending != backwards else "ASC"
+    sql += " ORDER BY " + ", ".join(f"{k} {direction}" for k in keys)
+    sql += " LIMIT ?"
+    params.append(page_size + 1)
+
+    rows = conn.execute(sql, params).fetchall()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    def key_of(row):
+        return encode_cursor(row[k] for k in keys)
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if backwards:
+            # We arrived from the page after this one, so it exists
+            next_cursor = key_of(rows[-1])
+            prev_cursor = key_of(rows[0]) if has_more else None
+        else:
+            next_cursor = key_of(rows[-1]) if has_more else None
+            prev_cursor = key_of(rows[0]) if cursor_values is not None else None
+    return Page(rows, next_cursor=next_cursor, prev_cursor=prev_cursor)
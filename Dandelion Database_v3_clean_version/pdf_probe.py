@@ -0,0 +1,684 @@
+"""
+PDF metadata straight from the trailer and cross-reference table.
+
+probe_pdf() reads the `startxref` pointer at the end of the file, follows
+the xref chain (classic tables, xref streams, hybrid files and /Prev links
+from incremental updates) and then parses only the handful of objects it
+needs: the trailer, the document catalog, the root of the page tree (whose
+/Count is the page count), /Info and /Encrypt. Nothing else in the file is
+read, so a 5,000-page scan costs about the same as a one-page letter.
+
+When the probe cannot make sense of a file (damaged xref, filters it does
+not decode, ...) extract_pdf_metadata() falls back to a full PyPDF2 parse in
+a child process with a time and memory limit, so a hostile or broken PDF
+cannot hang or exhaust the worker that is extracting it.
+
+    python pdf_probe.py some.pdf         # probe, with fallback
+    python pdf_probe.py --full some.pdf  # full parse only (used by the fallback)
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import zlib
+
+# Wall-clock and read budget for the xref probe itself
+PROBE_TIMEOUT = float(os.environ.get("PDF_PROBE_TIMEOUT", "2"))
+PROBE_MAX_BYTES = int(os.environ.get("PDF_PROBE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Limits for the PyPDF2 fallback, which runs in a child process
+FULL_PARSE_TIMEOUT = float(os.environ.get("PDF_FULL_PARSE_TIMEOUT", "30"))
+FULL_PARSE_MAX_MB = int(os.environ.get("PDF_FULL_PARSE_MAX_MB", "512"))
+
+# /Info entries we keep, and the metadata key each one is stored under
+INFO_KEYS = {
+    "Title": "title",
+    "Author": "author",
+    "Subject": "subject",
+    "Creator": "creator",
+    "Producer": "producer",
+    "CreationDate": "created",
+    "ModDate": "modified",
+}
+# Long incremental-update chains are legitimate, endless ones are not
+MAX_XREF_SECTIONS = 256
+
+
+class PdfProbeError(Exception):
+    """The probe could not read the file; `code` is stored as pdf_error."""
+
+    code = "malformed"
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        if code:
+            self.code = code
+
+
+class Ref(tuple):
+    """Indirect reference `num gen R`."""
+
+    def __new__(cls, num, gen):
+        return super().__new__(cls, (num, gen))
+
+
+class _Keyword(str):
+    pass
+
+
+class _Truncated(Exception):
+    """Ran off the end of the buffer; re-read with a bigger window."""
+
+
+_WS = b" \t\r\n\f\x00"
+_DELIMS = b"()<>[]{}/%"
+_NUMBER = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+_REF_TAIL = re.compile(rb"\s+(\d+)\s+R(?=[\s()<>\[\]{}/%]|$)")
+_OBJ_HEADER = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj")
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+
+
+class _Parser:
+    """Just enough of the PDF object syntax for dictionaries in the xref path."""
+
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def skip_ws(self):
+        data, n = self.data, len(self.data)
+        while self.pos < n:
+            c = data[self.pos:self.pos + 1]
+            if c in _WS:
+                self.pos += 1
+            elif c == b"%":
+                end = data.find(b"\n", self.pos)
+                if end < 0:
+                    raise _Truncated()
+                self.pos = end + 1
+            else:
+                return
+        raise _Truncated()
+
+    def parse(self):
+        self.skip_ws()
+        data, pos = self.data, self.pos
+        c = data[pos:pos + 1]
+        if data.startswith(b"<<", pos):
+            self.pos += 2
+            result = {}
+            while True:
+                self.skip_ws()
+                if self.data.startswith(b">>", self.pos):
+                    self.pos += 2
+                    return result
+                key = self.parse()
+                if not isinstance(key, str) or isinstance(key, _Keyword):
+                    raise PdfProbeError(f"bad dictionary key at {self.pos}")
+                result[key] = self.parse()
+        if c == b"[":
+            self.pos += 1
+            result = []
+            while True:
+                self.skip_ws()
+                if self.data.startswith(b"]", self.pos):
+                    self.pos += 1
+                    return result
+                result.append(self.parse())
+        if c == b"(":
+            return self._literal_string()
+        if c == b"<":
+            end = data.find(b">", pos)
+            if end < 0:
+                raise _Truncated()
+            self.pos = end + 1
+            digits = bytes(b for b in data[pos + 1:end] if b not in _WS)
+            return bytes.fromhex((digits + b"0" * (len(digits) % 2)).decode("ascii"))
+        if c == b"/":
+            end = pos + 1
+            while end < len(data) and data[end:end + 1] not in _WS and data[end:end + 1] not in _DELIMS:
+                end += 1
+            if end >= len(data):
+                raise _Truncated()
+            self.pos = end
+            raw = data[pos + 1:end]
+            return re.sub(rb"#([0-9A-Fa-f]{2})", lambda m: bytes([int(m.group(1), 16)]), raw).decode("latin-1")
+        m = _NUMBER.match(data, pos)
+        if m:
+            self.pos = m.end()
+            if self.pos >= len(data):
+                raise _Truncated()
+            token = m.group()
+            if b"." in token:
+                return float(token)
+            value = int(token)
+            ref = _REF_TAIL.match(data, self.pos)
+            if ref:
+                self.pos = ref.end()
+                return Ref(value, int(ref.group(1)))
+            return value
+        end = pos
+        while end < len(data) and data[end:end + 1] not in _WS and data[end:end + 1] not in _DELIMS:
+            end += 1
+        if end == pos:
+            raise PdfProbeError(f"unexpected {c!r} at {pos}")
+        self.pos = end
+        word = data[pos:end]
+        if word == b"true":
+            return True
+        if word == b"false":
+            return False
+        if word == b"null":
+            return None
+        return _Keyword(word.decode("latin-1"))
+
+    def _literal_string(self):
+        data = self.data
+        pos = self.pos + 1
+        depth = 1
+        out = bytearray()
+        while True:
+            if pos >= len(data):
+                raise _Truncated()
+            c = data[pos:pos + 1]
+            if c == b"\\":
+                nxt = data[pos + 1:pos + 2]
+                if not nxt:
+                    raise _Truncated()
+                if nxt in _ESCAPES:
+                    out += _ESCAPES[nxt]
+                    pos += 2
+                elif nxt in b"01234567":
+                    m = re.match(rb"[0-7]{1,3}", data[pos + 1:pos + 4])
+                    out.append(int(m.group(), 8) & 0xFF)
+                    pos += 1 + len(m.group())
+                elif nxt == b"\r":
+                    pos += 3 if data[pos + 2:pos + 3] == b"\n" else 2
+                elif nxt == b"\n":
+                    pos += 2
+                else:
+                    out += nxt
+                    pos += 2
+                continue
+            if c == b"(":
+                depth += 1
+            elif c == b")":
+                depth -= 1
+                if depth == 0:
+                    self.pos = pos + 1
+                    return bytes(out)
+            out += c
+            pos += 1
+
+
+def _png_unpredict(data: bytes, columns: int) -> bytes:
+    """Undo PNG row predictors (/Predictor >= 10), as used by xref streams."""
+    row_len = columns + 1
+    if len(data) % row_len:
+        raise PdfProbeError("xref stream rows do not match /Columns")
+    prev = bytearray(columns)
+    out = bytearray()
+    for start in range(0, len(data), row_len):
+        kind = data[start]
+        row = bytearray(data[start + 1:start + row_len])
+        if kind == 1:
+            for i in range(1, columns):
+                row[i] = (row[i] + row[i - 1]) & 0xFF
+        elif kind == 2:
+            for i in range(columns):
+                row[i] = (row[i] + prev[i]) & 0xFF
+        elif kind == 3:
+            for i in range(columns):
+                left = row[i - 1] if i else 0
+                row[i] = (row[i] + ((left + prev[i]) >> 1)) & 0xFF
+        elif kind == 4:
+            for i in range(columns):
+                a = row[i - 1] if i else 0
+                b, c = prev[i], prev[i - 1] if i else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                row[i] = (row[i] + (a if pa <= pb and pa <= pc else b if pb <= pc else c)) & 0xFF
+        elif kind != 0:
+            raise PdfProbeError(f"unknown PNG predictor {kind}")
+        out += row
+        prev = row
+    return bytes(out)
+
+
+class _ClassicSection:
+    """An `xref` table, located lazily: entries are read only when looked up."""
+
+    def __init__(self, pdf, subsections):
+        self.pdf = pdf
+        self.subsections = subsections  # [(first_obj, count, file_offset, entry_len)]
+
+    def lookup(self, num):
+        for first, count, offset, entry_len in self.subsections:
+            if first <= num < first + count:
+                entry = self.pdf.read(offset + (num - first) * entry_len, 18)
+                m = re.match(rb"(\d{10}) (\d{5}) ([nf])", entry)
+                if not m:
+                    raise PdfProbeError(f"bad xref entry for object {num}")
+                if m.group(3) == b"f":
+                    return ("free",)
+                return ("offset", int(m.group(1)))
+        return None
+
+
+class _StreamSection:
+    """A cross-reference stream (PDF 1.5+), decoded in full when loaded."""
+
+    def __init__(self, data, widths, index):
+        self.data = data
+        self.widths = widths
+        self.entry_len = sum(widths)
+        self.index = index  # [(first_obj, count, entry_number_of_first)]
+
+    def lookup(self, num):
+        for first, count, base in self.index:
+            if first <= num < first + count:
+                start = (base + num - first) * self.entry_len
+                fields = []
+                for width in self.widths:
+                    fields.append(int.from_bytes(self.data[start:start + width], "big") if width else None)
+                    start += width
+                kind = 1 if fields[0] is None else fields[0]
+                if kind == 1:
+                    return ("offset", fields[1])
+                if kind == 2:
+                    return ("objstm", fields[1], fields[2] or 0)
+                return ("free",)
+        return None
+
+
+class _PdfFile:
+    def __init__(self, f, deadline: float, max_bytes: int):
+        self.f = f
+        self.size = os.fstat(f.fileno()).st_size
+        self.deadline = deadline
+        self.budget = max_bytes
+        self.sections = []
+        self.trailer = {}
+        self._objects = {}
+        self._objstm = {}
+
+    def check_budget(self, nbytes=0):
+        self.budget -= nbytes
+        if self.budget < 0:
+            raise PdfProbeError("read budget exceeded", code="budget")
+        if time.monotonic() > self.deadline:
+            raise PdfProbeError("time budget exceeded", code="timeout")
+
+    def read(self, offset, n):
+        self.check_budget(n)
+        self.f.seek(offset)
+        return self.f.read(n)
+
+    def _parse(self, offset, header):
+        # Read a small window and grow it until the object fits
+        window = 4096
+        while True:
+            data = self.read(offset, window)
+            parser = _Parser(data)
+            try:
+                num = None
+                if header:
+                    m = _OBJ_HEADER.match(data)
+                    if not m:
+                        raise PdfProbeError(f"no object at offset {offset}")
+                    num, parser.pos = int(m.group(1)), m.end()
+                value = parser.parse()
+                return num, value, offset + parser.pos
+            except (_Truncated, IndexError):
+                if offset + window >= self.size or window >= 1024 * 1024:
+                    raise PdfProbeError(f"truncated object at offset {offset}")
+                window *= 4
+
+    def parse_value(self, offset):
+        return self._parse(offset, header=False)[1]
+
+    def parse_object(self, offset):
+        """Parse `N G obj <value>` at offset. Returns (N, value, offset just past value)."""
+        return self._parse(offset, header=True)
+
+    def stream_data(self, obj_dict, body_offset):
+        """Decoded bytes of the stream whose dictionary ends at body_offset."""
+        head = self.read(body_offset, 32)
+        m = re.match(rb"\s*stream(\r\n|\n|\r)", head)
+        if not m:
+            raise PdfProbeError(f"expected stream at {body_offset}")
+        start = body_offset + m.end()
+        length = self.resolve(obj_dict.get("Length"))
+        if not isinstance(length, int) or length < 0:
+            raise PdfProbeError("stream without a usable /Length")
+        raw = self.read(start, length)
+        filters = obj_dict.get("Filter")
+        filters = filters if isinstance(filters, list) else [filters] if filters else []
+        params = self.resolve(obj_dict.get("DecodeParms"))
+        if isinstance(params, list):
+            params = params[0] if params else None
+        for name in filters:
+            if name != "FlateDecode":
+                raise PdfProbeError(f"unsupported filter {name}", code="unsupported")
+            inflater = zlib.decompressobj()
+            try:
+                raw = inflater.decompress(raw, max(self.budget, 1))
+            except zlib.error as e:
+                raise PdfProbeError(f"corrupt stream: {e}")
+            self.check_budget(len(raw))
+            if inflater.unconsumed_tail:
+                raise PdfProbeError("read budget exceeded", code="budget")
+        if params and params.get("Predictor", 1) >= 10:
+            raw = _png_unpredict(raw, params.get("Columns", 1) * params.get("Colors", 1)
+                                 * params.get("BitsPerComponent", 8) // 8)
+        elif params and params.get("Predictor", 1) != 1:
+            raise PdfProbeError("unsupported predictor", code="unsupported")
+        return raw
+
+    def load_xref(self):
+        tail_len = min(self.size, 2048)
+        tail = self.read(self.size - tail_len, tail_len)
+        m = re.search(rb"startxref\s+(\d+)", tail[tail.rfind(b"startxref"):] if b"startxref" in tail else b"")
+        if not m:
+            raise PdfProbeError("no startxref")
+        offset = int(m.group(1))
+        seen = set()
+        while offset is not None:
+            if offset in seen or len(seen) >= MAX_XREF_SECTIONS:
+                raise PdfProbeError("xref /Prev chain loops")
+            if not 0 <= offset < self.size:
+                raise PdfProbeError(f"xref offset {offset} outside the file")
+            seen.add(offset)
+            trailer = self._load_section(offset)
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            offset = trailer.get("Prev")
+            if offset is not None and not isinstance(offset, int):
+                raise PdfProbeError("bad /Prev")
+        if "Root" not in self.trailer:
+            raise PdfProbeError("trailer has no /Root")
+
+    def _load_section(self, offset):
+        head = self.read(offset, 16)
+        if head.lstrip().startswith(b"xref"):
+            return self._load_classic(offset + head.index(b"xref") + 4)
+        _, xref, body = self.parse_object(offset)
+        if not isinstance(xref, dict) or xref.get("Type") != "XRef":
+            raise PdfProbeError(f"no xref at offset {offset}")
+        self._add_stream_section(xref, body)
+        return xref
+
+    def _add_stream_section(self, xref, body):
+        widths = xref.get("W")
+        size = xref.get("Size")
+        if not (isinstance(widths, list) and len(widths) == 3 and isinstance(size, int)):
+            raise PdfProbeError("bad xref stream dictionary")
+        index = xref.get("Index") or [0, size]
+        data = self.stream_data(xref, body)
+        pairs, base = [], 0
+        for first, count in zip(index[::2], index[1::2]):
+            pairs.append((first, count, base))
+            base += count
+        if len(data) < base * sum(widths):
+            raise PdfProbeError("xref stream shorter than its /Index")
+        self.sections.append(_StreamSection(data, widths, pairs))
+
+    def _load_classic(self, pos):
+        subsections = []
+        while True:
+            chunk = self.read(pos, 64)
+            m = re.match(rb"\s*(\d+)\s+(\d+)[ \t]*(\r\n|\n|\r)", chunk)
+            if not m:
+                break
+            first, count = int(m.group(1)), int(m.group(2))
+            entries = pos + m.end()
+            # Entries are 20 bytes by the spec; tolerate writers that use a bare EOL
+            sample = self.read(entries, 21) if count else b""
+            eol = re.match(rb"\d{10} \d{5} [nf]( \r| \n|\r\n|\n|\r)", sample)
+            if count and not eol:
+                raise PdfProbeError(f"bad xref entries at {entries}")
+            entry_len = 18 + len(eol.group(1)) if count else 20
+            subsections.append((first, count, entries, entry_len))
+            pos = entries + count * entry_len
+        rest = self.read(pos, 16)
+        if not rest.lstrip().startswith(b"trailer"):
+            raise PdfProbeError(f"expected trailer at {pos}")
+        trailer = self.parse_value(pos + rest.index(b"trailer") + 7)
+        if not isinstance(trailer, dict):
+            raise PdfProbeError("bad trailer")
+        self.sections.append(_ClassicSection(self, subsections))
+        # Hybrid files: objects only a PDF 1.5 reader should see are in a stream
+        if isinstance(trailer.get("XRefStm"), int):
+            _, xref, body = self.parse_object(trailer["XRefStm"])
+            self._add_stream_section(xref, body)
+        return trailer
+
+    def _locate(self, num):
+        for section in self.sections:
+            found = section.lookup(num)
+            if found is not None:
+                return found
+        return ("free",)
+
+    def get_object(self, ref: Ref):
+        num = ref[0]
+        if num in self._objects:
+            return self._objects[num]
+        self.check_budget()
+        loc = self._locate(num)
+        if loc[0] == "offset":
+            found, value, _ = self.parse_object(loc[1])
+            if found != num:
+                raise PdfProbeError(f"xref points object {num} at object {found}")
+        elif loc[0] == "objstm":
+            value = self._from_object_stream(loc[1], loc[2], num)
+        else:
+            value = None
+        self._objects[num] = value
+        return value
+
+    def _from_object_stream(self, stm_num, index, num):
+        if stm_num not in self._objstm:
+            loc = self._locate(stm_num)
+            if loc[0] != "offset":
+                raise PdfProbeError(f"object stream {stm_num} not found")
+            _, stm, body = self.parse_object(loc[1])
+            if not isinstance(stm, dict) or stm.get("Type") != "ObjStm":
+                raise PdfProbeError(f"object {stm_num} is not an object stream")
+            data = self.stream_data(stm, body)
+            parser = _Parser(data)
+            offsets = []
+            try:
+                for _ in range(stm.get("N", 0)):
+                    offsets.append((parser.parse(), parser.parse()))
+            except _Truncated:
+                raise PdfProbeError(f"object stream {stm_num} header is truncated")
+            self._objstm[stm_num] = (data, stm.get("First", 0), offsets)
+        data, first, offsets = self._objstm[stm_num]
+        if index >= len(offsets) or offsets[index][0] != num:
+            raise PdfProbeError(f"object {num} missing from object stream {stm_num}")
+        try:
+            return _Parser(data + b" ", first + offsets[index][1]).parse()
+        except _Truncated:
+            raise PdfProbeError(f"object {num} in object stream {stm_num} is truncated")
+
+    def resolve(self, value):
+        depth = 0
+        while isinstance(value, Ref):
+            depth += 1
+            if depth > 32:
+                raise PdfProbeError("reference cycle")
+            value = self.get_object(value)
+        return value
+
+
+def _text(value):
+    """Decode a PDF text string (UTF-16BE with BOM, UTF-8 with BOM, else PDFDocEncoding)."""
+    if not isinstance(value, bytes):
+        return None if value is None else str(value)
+    if value.startswith(b"\xfe\xff"):
+        text = value[2:].decode("utf-16-be", errors="replace")
+    elif value.startswith(b"\xef\xbb\xbf"):
+        text = value[3:].decode("utf-8", errors="replace")
+    else:
+        # Latin-1 matches PDFDocEncoding for everything but a few typographic marks
+        text = value.decode("latin-1")
+    return text.replace("\x00", "").strip() or None
+
+
+_PDF_DATE = re.compile(
+    r"(?:D:)?(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?\s*(?:([Zz+-])(\d{2})?'?(\d{2})?'?)?"
+)
+
+
+def pdf_date(value):
+    """`D:20240131093000+01'00'` -> `2024-01-31T09:30:00+01:00` (unparseable dates are kept as-is)."""
+    text = _text(value)
+    if not text:
+        return None
+    m = _PDF_DATE.match(text)
+    if not m:
+        return text
+    year, month, day, hour, minute, second, tz, tz_h, tz_m = m.groups()
+    result = f"{year}-{month or '01'}-{day or '01'}T{hour or '00'}:{minute or '00'}:{second or '00'}"
+    if tz in ("Z", "z"):
+        result += "Z"
+    elif tz:
+        result += f"{tz}{tz_h or '00'}:{tz_m or '00'}"
+    return result
+
+
+def probe_pdf(path, timeout: float = PROBE_TIMEOUT, max_bytes: int = PROBE_MAX_BYTES) -> dict:
+    """
+    Page count, document info and encryption status from the xref/trailer.
+    Raises PdfProbeError when the file cannot be read that way.
+    """
+    with open(path, "rb") as f:
+        pdf = _PdfFile(f, time.monotonic() + timeout, max_bytes)
+        header = pdf.read(0, 1024)
+        m = re.search(rb"%PDF-(\d\.\d)", header)
+        if not m:
+            raise PdfProbeError("not a PDF (no %PDF header)", code="not_pdf")
+        version = m.group(1).decode()
+        pdf.load_xref()
+
+        metadata = {}
+        root = pdf.resolve(pdf.trailer["Root"])
+        if not isinstance(root, dict):
+            raise PdfProbeError("document catalog is missing")
+        # A later update may raise the version in the catalog instead of the header
+        if isinstance(root.get("Version"), str) and root["Version"] > version:
+            version = root["Version"]
+        pages = pdf.resolve(root.get("Pages"))
+        count = pdf.resolve(pages.get("Count")) if isinstance(pages, dict) else None
+        if not isinstance(count, int) or count < 0:
+            raise PdfProbeError("page tree has no /Count")
+        metadata["pages"] = count
+        metadata["pdf_version"] = version
+
+        encrypt = pdf.trailer.get("Encrypt")
+        metadata["encrypted"] = "yes" if encrypt else "no"
+        if encrypt:
+            encrypt = pdf.resolve(encrypt)
+            if isinstance(encrypt, dict):
+                metadata["encryption"] = f"{encrypt.get('Filter', '?')} V{encrypt.get('V', 0)} R{encrypt.get('R', 0)}"
+        else:
+            # /Info strings are encrypted too in an encrypted file; skip them there
+            info = pdf.resolve(pdf.trailer.get("Info"))
+            if isinstance(info, dict):
+                for pdf_key, key in INFO_KEYS.items():
+                    value = pdf.resolve(info.get(pdf_key))
+                    value = pdf_date(value) if key in ("created", "modified") else _text(value)
+                    if value:
+                        metadata[key] = value
+        return metadata
+
+
+def _full_parse(path) -> dict:
+    """Full PyPDF2 parse; what extract_metadata did before the probe existed."""
+    from PyPDF2 import PdfReader
+
+    with open(path, "rb") as f:
+        reader = PdfReader(f)
+        metadata = {"encrypted": "yes" if reader.is_encrypted else "no"}
+        if reader.is_encrypted:
+            reader.decrypt("")
+        metadata["pages"] = len(reader.pages)
+        header = getattr(reader, "pdf_header", "") or ""
+        if header.startswith("%PDF-"):
+            metadata["pdf_version"] = header[5:]
+        info = reader.metadata or {}
+        for pdf_key, key in INFO_KEYS.items():
+            value = info.get("/" + pdf_key)
+            if value:
+                metadata[key] = pdf_date(str(value)) if key in ("created", "modified") else str(value)
+    return metadata
+
+
+def _limit_memory():
+    """Cap this process's address space (called in the --full child, before parsing)."""
+    try:
+        import resource
+    except ImportError:
+        # RLIMIT_AS is POSIX only; on Windows the timeout is the only limit
+        return
+    limit = FULL_PARSE_MAX_MB * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def full_parse_isolated(path, timeout: float = FULL_PARSE_TIMEOUT) -> dict:
+    """Run _full_parse in a child process under the time and memory limits."""
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--full", str(path)],
+            capture_output=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        raise PdfProbeError(f"full parse took longer than {timeout:g}s", code="timeout")
+    if proc.returncode != 0:
+        err = proc.stderr.decode(errors="replace").strip().splitlines()
+        if any("MemoryError" in line for line in err):
+            raise PdfProbeError(f"full parse exceeded {FULL_PARSE_MAX_MB} MB", code="memory")
+        raise PdfProbeError(err[-1] if err else f"full parse exited with {proc.returncode}")
+    return json.loads(proc.stdout)
+
+
+def extract_pdf_metadata(path) -> dict:
+    """
+    Probe first, full parse only if the probe fails. Failures are reported as
+    `error` (so the file is marked failed) plus a machine-readable `pdf_error`.
+    """
+    try:
+        metadata = probe_pdf(path)
+        metadata["pdf_parser"] = "xref"
+        return metadata
+    except PdfProbeError as e:
+        probe_error = e
+    except (OSError, ValueError, RecursionError) as e:
+        probe_error = PdfProbeError(str(e))
+    if probe_error.code == "not_pdf":
+        # PyPDF2 would reject it for the same reason, only slower
+        return {"error": f"PDF metadata error: {probe_error}", "pdf_error": probe_error.code}
+    try:
+        metadata = full_parse_isolated(path)
+        metadata["pdf_parser"] = "full"
+        return metadata
+    except PdfProbeError as e:
+        return {
+            "error": f"PDF metadata error: {e}",
+            "pdf_error": e.code,
+            "pdf_probe_error": str(probe_error),
+        }
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--full"]:
+        # Limited here rather than with preexec_fn, which is unsafe to use
+        # from the threads of the web process
+        _limit_memory()
+        json.dump(_full_parse(sys.argv[2]), sys.stdout)
+    else:
+        for arg in sys.argv[1:]:
+            print(arg, json.dumps(extract_pdf_metadata(arg), indent=2))
@@ -1,35 +1,269 @@
-PRAGMA foreign_keys = ON;
-
--- Users table
-CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT UNIQUE NOT NULL,
-    password_md5 TEXT NOT NULL
-);
-
--- Files table
-CREATE TABLE IF NOT EXISTS files (
-    id           INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id      INTEGER,
-    filename     TEXT    NOT NULL,
-    mime_type    TEXT,
-    size_bytes   INTEGER,
-    storage_path TEXT    NOT NULL,
-    comment      TEXT,
-    created_at   TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users(id)
-);
-
-CREATE TABLE IF NOT EXISTS metadata (
-    file_id    INTEGER      NOT NULL
-                            REFERENCES files (id),
-    meta_key   VARCHAR (50) NOT NULL,
-    meta_value TEXT,
-    PRIMARY KEY (
-        file_id,
-        meta_key
-    )
-);
-
--- Index on filenames
-CREATE INDEX IF NOT EXISTS idx_files_filename ON files (filename);
+PRAGMA foreign_keys = ON;
+
+-- Users table
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password_md5 TEXT NOT NULL
+);
+
+-- Files table
+CREATE TABLE IF NOT EXISTS files (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id      INTEGER,
+    filename     TEXT    NOT NULL,
+    mime_type    TEXT,
+    size_bytes   INTEGER,
+    storage_path TEXT    NOT NULL,
+    comment      TEXT,
+    created_at   TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sha256       TEXT,
+    metadata_status TEXT NOT NULL DEFAULT 'done',  -- pending | done | failed
+    row_version  INTEGER NOT NULL DEFAULT 0,       -- bumped on any change to the row or its metadata
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+-- Content-addressed upload storage. Each distinct upload is stored once under
+-- its SHA-256; files rows point at it via storage_path/sha256, and refcount
+-- (maintained by the triggers below) says how many rows still do.
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256       TEXT    PRIMARY KEY,
+    storage_path TEXT    NOT NULL,
+    size_bytes   INTEGER,
+    refcount     INTEGER NOT NULL DEFAULT 0,
+    created_at   TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS metadata (
+    file_id    INTEGER      NOT NULL
+                            REFERENCES files (id),
+    meta_key   VARCHAR (50) NOT NULL,
+    meta_value TEXT,
+    num_value  REAL,                    -- meta_value as a number, if it is one
+    date_value TEXT,                    -- or as 'YYYY-MM-DD HH:MM:SS', if it is a date
+    PRIMARY KEY (
+        file_id,
+        meta_key
+    )
+);
+
+-- Filters on metadata (pages>100, width>=4000, format=PDF, captured_at>=...)
+-- seek into one of these by key, then by typed value. file_id is included so
+-- collecting the matching ids never has to visit the table itself.
+CREATE INDEX IF NOT EXISTS idx_metadata_num ON metadata (meta_key, num_value, file_id)
+    WHERE num_value IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_metadata_date ON metadata (meta_key, date_value, file_id)
+    WHERE date_value IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_metadata_text ON metadata (meta_key, meta_value, file_id);
+
+-- Queue for the background metadata extraction worker (extraction_worker.py).
+-- A row exists while a file's metadata_status is 'pending'.
+CREATE TABLE IF NOT EXISTS extraction_jobs (
+    file_id     INTEGER   PRIMARY KEY
+                          REFERENCES files (id) ON DELETE CASCADE,
+    attempts    INTEGER   NOT NULL DEFAULT 0,
+    claimed_at  TIMESTAMP,
+    enqueued_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_extraction_jobs_queue
+    ON extraction_jobs (claimed_at, enqueued_at, file_id);
+
+-- Upload files to remove from disk, queued by cleanup.delete_files in the
+-- transaction that deletes their last row and unlinked by the sweeper thread.
+-- sha256 is set for blob store paths, which are only removed while no blobs
+-- row exists for them.
+CREATE TABLE IF NOT EXISTS pending_unlinks (
+    path      TEXT      PRIMARY KEY,
+    sha256    TEXT,
+    queued_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Files brought in by bulk_import.py, so an interrupted import can resume
+-- without re-reading files that are already in the archive
+CREATE TABLE IF NOT EXISTS import_log (
+    source_path TEXT    PRIMARY KEY,
+    mtime_ns    INTEGER NOT NULL,
+    size_bytes  INTEGER NOT NULL,
+    file_id     INTEGER,
+    imported_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Index on filenames
+CREATE INDEX IF NOT EXISTS idx_files_filename ON files (filename);
+
+-- Look up files by content digest
+CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files (sha256);
+
+-- Keyset pagination walks the files table in (created_at, id) order
+CREATE INDEX IF NOT EXISTS idx_files_created ON files (created_at, id);
+
+-- The same per owner: a user's listing and filename lookups seek to their own
+-- rows, so they cost what that user's files cost, not the whole archive
+CREATE INDEX IF NOT EXISTS idx_files_user_created ON files (user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_files_user_filename ON files (user_id, filename);
+
+-- Shared collections (sharing.py): an owner groups some of their files and
+-- shares the group with other users, who can then see and download them
+CREATE TABLE IF NOT EXISTS collections (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner_id   INTEGER NOT NULL REFERENCES users (id),
+    name       TEXT    NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (owner_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS collection_members (
+    collection_id INTEGER NOT NULL REFERENCES collections (id) ON DELETE CASCADE,
+    user_id       INTEGER NOT NULL REFERENCES users (id),
+    PRIMARY KEY (collection_id, user_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_collection_members_user ON collection_members (user_id, collection_id);
+
+CREATE TABLE IF NOT EXISTS collection_files (
+    collection_id INTEGER NOT NULL REFERENCES collections (id) ON DELETE CASCADE,
+    file_id       INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    PRIMARY KEY (collection_id, file_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_collection_files_file ON collection_files (file_id, collection_id);
+
+-- Bearer tokens for the JSON API (api_bp.py). Only a SHA-256 of each token is
+-- kept, so the table alone cannot be used to sign in; last_used_at is
+-- refreshed at most once a minute.
+CREATE TABLE IF NOT EXISTS api_tokens (
+    token_sha256 TEXT PRIMARY KEY,
+    user_id      INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    name         TEXT,
+    created_at   TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TEXT
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_api_tokens_user ON api_tokens (user_id);
+
+-- Full-text index over filenames, comments and extracted metadata values.
+-- rowid mirrors files.id; the triggers below keep it in sync.
+CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+    filename,
+    comment,
+    meta,
+    prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS files_fts_insert AFTER INSERT ON files BEGIN
+    INSERT INTO files_fts (rowid, filename, comment, meta)
+    VALUES (new.id, new.filename, new.comment, '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_fts_delete AFTER DELETE ON files BEGIN
+    DELETE FROM files_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_fts_update AFTER UPDATE OF filename, comment ON files BEGIN
+    UPDATE files_fts SET filename = new.filename, comment = new.comment
+    WHERE rowid = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS metadata_fts_insert AFTER INSERT ON metadata BEGIN
+    UPDATE files_fts SET meta = trim(meta || ' ' || COALESCE(new.meta_value, ''))
+    WHERE rowid = new.file_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS metadata_fts_delete AFTER DELETE ON metadata BEGIN
+    UPDATE files_fts
+    SET meta = COALESCE((SELECT group_concat(meta_value, ' ') FROM metadata
+                         WHERE file_id = old.file_id), '')
+    WHERE rowid = old.file_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS metadata_fts_update AFTER UPDATE OF meta_value ON metadata BEGIN
+    UPDATE files_fts
+    SET meta = COALESCE((SELECT group_concat(meta_value, ' ') FROM metadata
+                         WHERE file_id = new.file_id), '')
+    WHERE rowid = new.file_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS blobs_ref_insert AFTER INSERT ON files
+WHEN new.sha256 IS NOT NULL BEGIN
+    UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = new.sha256;
+END;
+
+CREATE TRIGGER IF NOT EXISTS blobs_ref_delete AFTER DELETE ON files
+WHEN old.sha256 IS NOT NULL BEGIN
+    UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = old.sha256;
+END;
+
+-- row_version keys the cached HTML of each files table row (template_cache.py),
+-- so it must change whenever anything shown in that row does: any column of
+-- the files row, or any of its metadata rows
+CREATE TRIGGER IF NOT EXISTS files_row_version AFTER UPDATE ON files
+WHEN new.row_version = old.row_version BEGIN
+    UPDATE files SET row_version = row_version + 1 WHERE id = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS metadata_row_version_insert AFTER INSERT ON metadata BEGIN
+    UPDATE files SET row_version = row_version + 1 WHERE id = new.file_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS metadata_row_version_update AFTER UPDATE ON metadata BEGIN
+    UPDATE files SET row_version = row_version + 1 WHERE id IN (old.file_id, new.file_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS metadata_row_version_delete AFTER DELETE ON metadata BEGIN
+    UPDATE files SET row_version = row_version + 1 WHERE id = old.file_id;
+END;
+
+-- Sidebar facet counts (facets.py): number of each owner's files per
+-- (facet, value), maintained by the triggers below so the sidebar never scans
+-- files. owner is files.user_id, or 0 for files nobody owns.
+CREATE TABLE IF NOT EXISTS facet_counts (
+    owner INTEGER NOT NULL,
+    facet TEXT    NOT NULL,   -- mime_type | month | size
+    value TEXT    NOT NULL,   -- '' when the file has no value
+    count INTEGER NOT NULL,
+    PRIMARY KEY (owner, facet, value)
+) WITHOUT ROWID;
+
+-- Size facet buckets, by lower bound in bytes
+CREATE TABLE IF NOT EXISTS size_buckets (
+    lower INTEGER PRIMARY KEY
+);
+
+INSERT OR IGNORE INTO size_buckets (lower) VALUES
+    (0), (102400), (1048576), (10485760), (104857600), (1073741824);
+
+-- Values whose count dropped to zero are removed through this (tiny) index
+CREATE INDEX IF NOT EXISTS idx_facet_counts_empty ON facet_counts (count) WHERE count <= 0;
+
+CREATE TRIGGER IF NOT EXISTS files_facets_insert AFTER INSERT ON files BEGIN
+    INSERT INTO facet_counts (owner, facet, value, count) VALUES
+        (COALESCE(new.user_id, 0), 'mime_type', COALESCE(new.mime_type, ''), 1),
+        (COALESCE(new.user_id, 0), 'month',     COALESCE(strftime('%Y-%m', new.created_at), ''), 1),
+        (COALESCE(new.user_id, 0), 'size',      COALESCE((SELECT MAX(lower) FROM size_buckets WHERE lower <= new.size_bytes), ''), 1)
+    ON CONFLICT (owner, facet, value) DO UPDATE SET count = count + excluded.count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_facets_delete AFTER DELETE ON files BEGIN
+    INSERT INTO facet_counts (owner, facet, value, count) VALUES
+        (COALESCE(old.user_id, 0), 'mime_type', COALESCE(old.mime_type, ''), -1),
+        (COALESCE(old.user_id, 0), 'month',     COALESCE(strftime('%Y-%m', old.created_at), ''), -1),
+        (COALESCE(old.user_id, 0), 'size',      COALESCE((SELECT MAX(lower) FROM size_buckets WHERE lower <= old.size_bytes), ''), -1)
+    ON CONFLICT (owner, facet, value) DO UPDATE SET count = count + excluded.count;
+    DELETE FROM facet_counts WHERE count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS files_facets_update
+AFTER UPDATE OF mime_type, user_id, size_bytes, created_at ON files BEGIN
+    INSERT INTO facet_counts (owner, facet, value, count) VALUES
+        (COALESCE(old.user_id, 0), 'mime_type', COALESCE(old.mime_type, ''), -1),
+        (COALESCE(old.user_id, 0), 'month',     COALESCE(strftime('%Y-%m', old.created_at), ''), -1),
+        (COALESCE(old.user_id, 0), 'size',      COALESCE((SELECT MAX(lower) FROM size_buckets WHERE lower <= old.size_bytes), ''), -1)
+    ON CONFLICT (owner, facet, value) DO UPDATE SET count = count + excluded.count;
+    INSERT INTO facet_counts (owner, facet, value, count) VALUES
+        (COALESCE(new.user_id, 0), 'mime_type', COALESCE(new.mime_type, ''), 1),
+        (COALESCE(new.user_id, 0), 'month',     COALESCE(strftime('%Y-%m', new.created_at), ''), 1),
+        (COALESCE(new.user_id, 0), 'size',      COALESCE((SELECT MAX(lower) FROM size_buckets WHERE lower <= new.size_bytes), ''), 1)
+    ON CONFLICT (owner, facet, value) DO UPDATE SET count = count + excluded.count;
+    DELETE FROM facet_counts WHERE count <= 0;
+END;
@@ -0,0 +1,70 @@
+import re
+from markupsafe import Markup, escape
+
+# bm25 column weights for files_fts(filename, comment, meta): a hit in the
+# filename counts for more than one in the comment or extracted metadata
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+# snippet() wraps matches in these control characters; they are swapped for
+# <mark> tags only after the rest of the snippet has been HTML-escaped
+_HL_START, _HL_END = "\x02", "\x03"
+SNIPPET_TOKENS = 12
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(text: str):
+    """
+    Turn free text from the search box into an FTS5 MATCH expression.
+    Every word becomes a quoted prefix term ("dand"* matches dandelion),
+    and all terms must match. Returns None if there is nothing to search for.
+    """
+    terms = _TERM_RE.findall(text or "")
+    if not terms:
+        return None
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def search_sql():
+    """
+    SELECT over matching files with a bm25 `score` (lower is better) and a
+    highlighted `snippet` column, shaped for pagination.fetch_page with
+    keys=("score", "id"). Takes the MATCH expression as its only parameter.
+    """
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    return (
+        "SELECT * FROM ("
+        " SELECT f.*,"
+        f" bm25(files_fts, {weights}) AS score,"
+        f" snippet(files_fts, -1, char(2), char(3), '...', {SNIPPET_TOKENS}) AS snippet"
+        " FROM files_fts JOIN files f ON f.id = files_fts.rowid"
+        " WHERE files_fts MATCH ?"
+        ")"
+    )
+
+
+def highlight(snippet):
+    """Escape an FTS snippet for HTML and turn its match markers into <mark> tags."""
+    if not snippet:
+        return Markup("")
+    safe = str(escape(snippet))
+    return Markup(safe.replace(_HL_START, "<mark>").replace(_HL_END, "</mark>"))
+
+
+def plain_snippet(snippet):
+    """An FTS snippet as plain text, without its match markers (for the JSON API)."""
+    return (snippet or "").replace(_HL_START, "").replace(_HL_END, "")
+
+
+def rebuild_search_index(conn):
+    """Repopulate files_fts from the files and metadata tables."""
+    conn.execute("DELETE FROM files_fts;")
+    conn.execute(
+        """
+        INSERT INTO files_fts (rowid, filename, comment, meta)
+        SELECT f.id, f.filename, f.comment,
+               COALESCE((SELECT group_concat(m.meta_value, ' ')
+                         FROM metadata m WHERE m.file_id = f.id), '')
+        FROM files f;
+        """
+    )
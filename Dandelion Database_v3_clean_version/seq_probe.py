@@ -0,0 +1,125 @@
+import gzip
+
+# FASTA / FASTQ files, plain or gzipped (told apart by content, since stored
+# blobs have no extension): record count, total and min/mean/max sequence
+# length, a guess at the alphabet and, for FASTQ, the quality encoding. The
+# whole file is read once, line by line, so this runs in the background.
+
+GZIP_MAGIC = b"\x1f\x8b"
+# Residues looked at to decide DNA / RNA / protein
+ALPHABET_SAMPLE = 100_000
+
+_NUCLEOTIDES = set(b"ACGTUNacgtun-.")
+
+
+def _open(path):
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    if magic == GZIP_MAGIC:
+        return gzip.open(path, "rb"), "gzip"
+    return open(path, "rb"), None
+
+
+def _alphabet(sample: bytes) -> str:
+    letters = bytes(b for b in sample if 65 <= (b & 0xDF) <= 90)
+    if not letters:
+        return "unknown"
+    nucleotide = sum(1 for b in letters if b in _NUCLEOTIDES)
+    if nucleotide / len(letters) < 0.9:
+        return "protein"
+    upper = letters.upper()
+    if upper.count(b"U") > upper.count(b"T"):
+        return "RNA"
+    return "DNA"
+
+
+def _summary(fmt, records, total, shortest, longest):
+    metadata = {"sequence_format": fmt, "records": records, "total_length": total}
+    if records:
+        metadata.update({
+            "min_length": shortest,
+            "max_length": longest,
+            "mean_length": round(total / records, 1),
+        })
+    return metadata
+
+
+def _fasta(f, first: bytes):
+    records = total = 0
+    shortest, longest = None, 0
+    current = None
+    sample = bytearray()
+    for line in _prepend(first, f):
+        if line.startswith(b">"):
+            if current is not None:
+                shortest = current if shortest is None else min(shortest, current)
+                longest = max(longest, current)
+                total += current
+            records += 1
+            current = 0
+        elif current is not None:
+            seq = line.rstrip()
+            current += len(seq)
+            if len(sample) < ALPHABET_SAMPLE:
+                sample += seq
+    if current is not None:
+        shortest = current if shortest is None else min(shortest, current)
+        longest = max(longest, current)
+        total += current
+    metadata = _summary("FASTA", records, total, shortest, longest)
+    metadata["alphabet"] = _alphabet(bytes(sample))
+    return metadata
+
+
+def _fastq(f, first: bytes):
+    records = total = 0
+    shortest, longest = None, 0
+    sample = bytearray()
+    lowest_quality = 255
+    lines = _prepend(first, f)
+    for header in lines:
+        if not header.strip():
+            continue
+        if not header.startswith(b"@"):
+            raise ValueError(f"FASTQ record {records + 1} does not start with '@'")
+        seq = next(lines, b"").rstrip()
+        plus = next(lines, b"")
+        quality = next(lines, b"").rstrip()
+        if not plus.startswith(b"+") or len(quality) != len(seq):
+            raise ValueError(f"FASTQ record {records + 1} is truncated or malformed")
+        records += 1
+        total += len(seq)
+        shortest = len(seq) if shortest is None else min(shortest, len(seq))
+        longest = max(longest, len(seq))
+        if len(sample) < ALPHABET_SAMPLE:
+            sample += seq
+            if quality:
+                lowest_quality = min(lowest_quality, min(quality))
+    metadata = _summary("FASTQ", records, total, shortest, longest)
+    metadata["alphabet"] = _alphabet(bytes(sample))
+    if records:
+        # Phred+64 files never use characters below ';' (59)
+        metadata["quality_encoding"] = "phred+33" if lowest_quality < 59 else "phred+64"
+    return metadata
+
+
+def _prepend(first, f):
+    yield first
+    yield from f
+
+
+def extract_sequence_metadata(file_path) -> dict:
+    f, compression = _open(file_path)
+    with f:
+        first = f.readline()
+        while first and not first.strip():
+            first = f.readline()
+        if first.startswith(b">"):
+            metadata = _fasta(f, first)
+        elif first.startswith(b"@"):
+            metadata = _fastq(f, first)
+        else:
+            raise ValueError("not a FASTA or FASTQ file")
+    if compression:
+        metadata["compression"] = compression
+    return metadata
@@ -0,0 +1,129 @@
+import json
+
+# Who can see which files. A file belongs to the user who uploaded it
+# (files.user_id). Rows without an owner, from before uploads recorded one or
+# from a bulk_import run without --owner, can be read by everybody but changed
+# or deleted by nobody. On top of that, an owner can put files in a
+# collection and share the collection with other users, who can then see and
+# download (but not delete) those files.
+#
+# Listings are scoped to one of: the user's own files (an index seek on
+# (user_id, created_at, id), so a page costs the same however large the rest
+# of the archive is), the unowned files, or one collection.
+
+MINE = "mine"
+SHARED = "shared"
+
+COLLECTION_NAME_MAX = 100
+
+
+def visible_sql(user_id):
+    """WHERE fragment (over files, or a select of files columns) and params for files user_id may read."""
+    return (
+        "(user_id = ? OR user_id IS NULL OR id IN ("
+        " SELECT cf.file_id FROM collection_files cf"
+        " JOIN collection_members cm ON cm.collection_id = cf.collection_id"
+        " WHERE cm.user_id = ?))",
+        [user_id, user_id],
+    )
+
+
+def owned_sql(user_id):
+    """WHERE fragment and params for files user_id may change or delete: only their own."""
+    return "user_id = ?", [user_id]
+
+
+def owned_ids(conn, user_id, file_ids):
+    """The ids among file_ids that user_id may delete."""
+    where, params = owned_sql(user_id)
+    return [
+        r[0] for r in conn.execute(
+            f"SELECT id FROM files WHERE id IN (SELECT value FROM json_each(?)) AND {where};",
+            (json.dumps(list(file_ids)), *params),
+        )
+    ]
+
+
+def scope_sql(conn, user_id, scope=MINE, collection_id=None):
+    """
+    WHERE fragment and params for one listing scope, or None if user_id may
+    not open that collection.
+    """
+    if collection_id is not None:
+        if get_collection(conn, user_id, collection_id) is None:
+            return None
+        return "id IN (SELECT file_id FROM collection_files WHERE collection_id = ?)", [collection_id]
+    if scope == SHARED:
+        return "user_id IS NULL", []
+    return "user_id = ?", [user_id]
+
+
+def list_collections(conn, user_id):
+    """Collections user_id owns or has been given, with their owner's name and size."""
+    return conn.execute(
+        """
+        SELECT c.id, c.name, c.owner_id, u.username AS owner,
+               (SELECT COUNT(*) FROM collection_files cf WHERE cf.collection_id = c.id) AS files
+        FROM collections c JOIN users u ON u.id = c.owner_id
+        WHERE c.owner_id = ?1
+           OR c.id IN (SELECT collection_id FROM collection_members WHERE user_id = ?1)
+        ORDER BY c.owner_id != ?1, c.name;
+        """,
+        (user_id,),
+    ).fetchall()
+
+
+def get_collection(conn, user_id, collection_id):
+    """The collection row if user_id owns it or is a member, else None."""
+    return conn.execute(
+        """
+        SELECT c.*, (SELECT username FROM users WHERE id = c.owner_id) AS owner
+        FROM collections c
+        WHERE c.id = ?1 AND (c.owner_id = ?2 OR EXISTS (
+            SELECT 1 FROM collection_members WHERE collection_id = ?1 AND user_id = ?2))
+        """,
+        (collection_id, user_id),
+    ).fetchone()
+
+
+def add_to_collection(conn, user_id, name: str, file_ids) -> int:
+    """
+    Add files user_id owns to their collection called name (created if
+    needed). Returns the collection id. Raises ValueError for a bad name.
+    """
+    name = " ".join((name or "").split())[:COLLECTION_NAME_MAX]
+    if not name:
+        raise ValueError("Give the collection a name.")
+    collection_id = conn.execute(
+        """
+        INSERT INTO collections (owner_id, name) VALUES (?, ?)
+        ON CONFLICT (owner_id, name) DO UPDATE SET name = excluded.name
+        RETURNING id;
+        """,
+        (user_id, name),
+    ).fetchone()[0]
+    where, params = owned_sql(user_id)
+    conn.executemany(
+        f"""
+        INSERT OR IGNORE INTO collection_files (collection_id, file_id)
+        SELECT ?, id FROM files WHERE id = ? AND {where};
+        """,
+        [(collection_id, file_id, *params) for file_id in file_ids],
+    )
+    return collection_id
+
+
+def share_collection(conn, owner_id, collection_id, username: str):
+    """Give username access to owner_id's collection. Raises ValueError if either is unknown."""
+    owned = conn.execute(
+        "SELECT 1 FROM collections WHERE id = ? AND owner_id = ?;", (collection_id, owner_id)
+    ).fetchone()
+    user = conn.execute("SELECT id FROM users WHERE username = ?;", ((username or "").strip(),)).fetchone()
+    if not owned:
+        raise ValueError("Only the owner can share a collection.")
+    if not user:
+        raise ValueError(f"No user called {username!r}.")
+    conn.execute(
+        "INSERT OR IGNORE INTO collection_members (collection_id, user_id) VALUES (?, ?);",
+        (collection_id, user["id"]),
+    )
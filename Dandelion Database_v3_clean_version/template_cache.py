@@ -0,0 +1,103 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from flask import current_app, render_template
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+# Two caches for the files table.
+#
+# Compiled templates: Jinja's bytecode for every template is kept under
+# TEMPLATE_CACHE_DIR, and precompile_templates() loads them all at startup,
+# so no request pays for parsing and compiling a template (a restart only
+# compiles templates whose source changed).
+#
+# Row fragments: the HTML of each files table row (_file_row.html, with its
+# metadata list) is kept in memory, keyed by the file's id and row_version.
+# Triggers in schema.sql bump row_version whenever the files row or any of
+# its metadata rows change, so a cached row is used exactly as long as
+# nothing it shows has changed; rows that changed simply miss and are
+# rendered again, and stale entries age out of the LRU. A page then only
+# loads metadata for, and renders, the rows it has not seen.
+
+BASE_DIR = Path(__file__).resolve().parent
+TEMPLATE_CACHE_DIR = Path(os.environ.get("TEMPLATE_CACHE_DIR", str(BASE_DIR / "TemplateCache")))
+# Rendered rows kept in memory (a few KB each)
+FRAGMENT_CACHE_ENTRIES = int(os.environ.get("FRAGMENT_CACHE_ENTRIES", "20000"))
+
+ROW_TEMPLATE = "_file_row.html"
+
+
+def precompile_templates(app):
+    """Use the on-disk bytecode cache for app's templates and load every one of them now."""
+    TEMPLATE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(str(TEMPLATE_CACHE_DIR))
+    for name in app.jinja_env.list_templates(extensions=["html"]):
+        app.jinja_env.get_template(name)
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered HTML fragments."""
+
+    def __init__(self, max_entries: int = FRAGMENT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def put(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+row_fragments = FragmentCache()
+
+
+def render_rows(rows, columns, load_metadata):
+    """
+    HTML (Markup) for each files row in rows, which must include id and
+    row_version. load_metadata(ids) -> {id: {key: value}} is only called
+    for the rows that are not cached. Must run in a request context.
+    """
+    # Keyed by the template object too: a reloaded template is a new object
+    template = current_app.jinja_env.get_template(ROW_TEMPLATE)
+    columns = tuple(columns)
+    keys = [(template, columns, r["id"], r["row_version"]) for r in rows]
+    fragments = [row_fragments.get(key) for key in keys]
+    missing = [i for i, html in enumerate(fragments) if html is None]
+    if missing:
+        metadata = load_metadata([rows[i]["id"] for i in missing])
+        for i in missing:
+            row = dict(rows[i], metadata=metadata[rows[i]["id"]])
+            fragments[i] = Markup(render_template(template, r=row, columns=columns))
+            row_fragments.put(keys[i], fragments[i])
+    return fragments
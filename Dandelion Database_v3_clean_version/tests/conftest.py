@@ -0,0 +1,43 @@
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Point the app at a throwaway database / upload dir before importing it
+_TMP = tempfile.mkdtemp(prefix="dandelion-test-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "test.db")
+os.environ["UPLOAD_DIR"] = os.path.join(_TMP, "Uploads")
+os.environ["TEMPLATE_CACHE_DIR"] = os.path.join(_TMP, "TemplateCache")
+os.environ["THUMB_CACHE_DIR"] = os.path.join(_TMP, "ThumbCache")
+os.environ["EXTRACTION_CACHE_PATH"] = os.path.join(_TMP, "ExtractionCache.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app as flask_app  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    client = flask_app.test_client()
+    client.post("/register", data={"username": "tester", "password": "tester"})
+    resp = client.post("/login", data={"username": "tester", "password": "tester"})
+    assert resp.status_code == 302
+    return client
+
+
+@pytest.fixture
+def uploaded(client):
+    """(download URL, content) of a file uploaded by the signed-in user."""
+    body = os.urandom(64 * 1024)
+    resp = client.post(
+        "/files/upload",
+        data={"file": (io.BytesIO(body), "dataset.bin")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 302
+    from db import get_conn_cm
+    with get_conn_cm() as conn:
+        file_id = conn.execute("SELECT MAX(id) FROM files;").fetchone()[0]
+    return f"/files/files/{file_id}/download", body
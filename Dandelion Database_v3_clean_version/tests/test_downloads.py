@@ -0,0 +1,92 @@
+from datetime import timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+
+
+def get(client, url, **headers):
+    resp = client.get(url, headers=headers)
+    try:
+        return resp, resp.get_data()
+    finally:
+        resp.close()
+
+
+def test_full_download_has_validators(client, uploaded):
+    url, body = uploaded
+    resp, data = get(client, url)
+    assert resp.status_code == 200
+    assert data == body
+    assert resp.headers["Accept-Ranges"] == "bytes"
+    assert resp.headers["ETag"]
+    assert resp.headers["Cache-Control"] == "private, no-cache"
+
+
+def test_range_returns_206_with_content_range(client, uploaded):
+    url, body = uploaded
+    resp, data = get(client, url, Range="bytes=100-1099")
+    assert resp.status_code == 206
+    assert resp.headers["Content-Range"] == f"bytes 100-1099/{len(body)}"
+    assert resp.headers["Content-Length"] == "1000"
+    assert data == body[100:1100]
+
+
+def test_open_ended_range_resumes_to_the_end(client, uploaded):
+    url, body = uploaded
+    resp, data = get(client, url, Range="bytes=60000-")
+    assert resp.status_code == 206
+    assert resp.headers["Content-Range"] == f"bytes 60000-{len(body) - 1}/{len(body)}"
+    assert data == body[60000:]
+
+
+def test_if_range_with_matching_etag_returns_the_range(client, uploaded):
+    url, body = uploaded
+    etag = get(client, url)[0].headers["ETag"]
+    resp, data = get(client, url, Range="bytes=0-9", **{"If-Range": etag})
+    assert resp.status_code == 206
+    assert data == body[:10]
+
+
+def test_if_range_with_stale_etag_returns_the_whole_file(client, uploaded):
+    url, body = uploaded
+    resp, data = get(client, url, Range="bytes=0-9", **{"If-Range": '"stale"'})
+    assert resp.status_code == 200
+    assert "Content-Range" not in resp.headers
+    assert data == body
+
+
+def test_if_none_match_returns_304(client, uploaded):
+    url, _ = uploaded
+    etag = get(client, url)[0].headers["ETag"]
+    resp, data = get(client, url, **{"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert data == b""
+    assert resp.headers["ETag"] == etag
+
+
+def test_if_none_match_with_other_etag_downloads(client, uploaded):
+    url, body = uploaded
+    resp, data = get(client, url, **{"If-None-Match": '"something-else"'})
+    assert resp.status_code == 200
+    assert data == body
+
+
+def test_if_modified_since_last_modified_returns_304(client, uploaded):
+    url, _ = uploaded
+    last_modified = get(client, url)[0].headers["Last-Modified"]
+    resp, data = get(client, url, **{"If-Modified-Since": last_modified})
+    assert resp.status_code == 304
+    assert data == b""
+
+
+def test_if_modified_since_earlier_date_downloads(client, uploaded):
+    url, body = uploaded
+    last_modified = parsedate_to_datetime(get(client, url)[0].headers["Last-Modified"])
+    earlier = format_datetime(last_modified - timedelta(days=1), usegmt=True)
+    resp, data = get(client, url, **{"If-Modified-Since": earlier})
+    assert resp.status_code == 200
+    assert data == body
+
+def test_unsatisfiable_range_returns_416(client, uploaded):
+    url, body = uploaded
+    resp, _ = get(client, url, Range=f"bytes={len(body) + 10}-{len(body) + 20}")
+    assert resp.status_code == 416
+    assert resp.headers["Content-Range"] == f"bytes */{len(body)}"
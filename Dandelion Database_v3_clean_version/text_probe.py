@@ -0,0 +1,131 @@
+import codecs
+import csv
+import io
+
+# Plain text and delimited (CSV/TSV) files: encoding, line endings, line
+# count and, for tables, delimiter, column count and header names. Encoding
+# and dialect are sniffed from the first SAMPLE_BYTES; the line count is a
+# chunked scan of the whole file, which is why this runs in the background.
+
+SAMPLE_BYTES = 64 * 1024
+READ_CHUNK = 1024 * 1024
+SNIFF_LINES = 50
+# Column names are stored for search, but not without limit
+MAX_HEADER_CHARS = 1000
+
+DELIMITER_NAMES = {",": "comma", "\t": "tab", ";": "semicolon", "|": "pipe"}
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+
+def sniff_encoding(sample: bytes) -> str:
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if b"\x00" in sample:
+        # NULs without a BOM: UTF-16 if they sit in every other byte, else binary
+        if sample[1::2].count(0) > len(sample) // 4:
+            return "utf-16-le"
+        if sample[0::2].count(0) > len(sample) // 4:
+            return "utf-16-be"
+        raise ValueError("file looks binary, not text")
+    try:
+        # The sample may end mid-character; an incremental decoder allows that
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8" if any(b > 0x7F for b in sample) else "ascii"
+    except UnicodeDecodeError:
+        # Excel on Windows writes cp1252; it decodes nearly anything single-byte
+        return "cp1252"
+
+
+def _line_endings(text: str):
+    crlf = text.count("\r\n")
+    lf = text.count("\n") - crlf
+    cr = text.count("\r") - crlf
+    counts = {"CRLF": crlf, "LF": lf, "CR": cr}
+    style = max(counts, key=counts.get)
+    return style if counts[style] else None
+
+
+def _count_lines(f, encoding: str, newline: bytes) -> int:
+    """Lines in the file (a last line without a terminator counts too)."""
+    f.seek(0)
+    if encoding.startswith("utf-16"):
+        reader = io.TextIOWrapper(f, encoding=encoding, newline="")
+        lines = last = 0
+        for chunk in iter(lambda: reader.read(READ_CHUNK), ""):
+            lines += chunk.count(newline.decode())
+            last = chunk[-1]
+        reader.detach()
+        return lines + (1 if last and last != newline.decode()[-1] else 0)
+    lines = 0
+    last = b""
+    for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+        lines += chunk.count(newline)
+        last = chunk[-1:]
+    return lines + (1 if last and last != newline[-1:] else 0)
+
+
+def _sniff_table(text: str):
+    # csv.Sniffer is slow on big samples; the first lines are what it needs.
+    # The last line of the sample may be cut off, so it is left out.
+    lines = text.splitlines()
+    sample = "\n".join(lines[:min(len(lines) - 1, SNIFF_LINES)] if len(lines) > 1 else lines)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",\t;|")
+        delimiter = dialect.delimiter
+    except csv.Error:
+        # One column, or too irregular to tell: tabs if there are any
+        delimiter = "\t" if "\t" in sample else ","
+    rows = list(csv.reader(io.StringIO(sample), delimiter=delimiter))
+    if not rows:
+        return {}
+    try:
+        has_header = csv.Sniffer().has_header(sample)
+    except csv.Error:
+        has_header = False
+    info = {
+        "delimiter": DELIMITER_NAMES.get(delimiter, delimiter),
+        "columns": max(len(r) for r in rows[:100]),
+        "has_header": "yes" if has_header else "no",
+    }
+    if has_header:
+        info["column_names"] = ", ".join(c.strip() for c in rows[0])[:MAX_HEADER_CHARS]
+    return info
+
+
+def _sample(f):
+    sample = f.read(SAMPLE_BYTES)
+    encoding = sniff_encoding(sample)
+    text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(sample, final=False)
+    return encoding, text.lstrip("\ufeff")
+
+
+def extract_text_metadata(file_path) -> dict:
+    """encoding, line_endings and lines."""
+    with open(file_path, "rb") as f:
+        encoding, text = _sample(f)
+        metadata = {"encoding": encoding}
+        endings = _line_endings(text)
+        if endings:
+            metadata["line_endings"] = endings
+        newline = {"CRLF": "\r\n", "CR": "\r"}.get(endings, "\n")
+        metadata["lines"] = _count_lines(f, encoding, newline.encode("ascii"))
+    return metadata
+
+
+def extract_table_metadata(file_path) -> dict:
+    """Text metadata plus delimiter, columns, has_header, column_names and data_rows."""
+    metadata = extract_text_metadata(file_path)
+    with open(file_path, "rb") as f:
+        _, text = _sample(f)
+    table = _sniff_table(text) if text else {}
+    metadata.update(table)
+    if table:
+        header_rows = 1 if table["has_header"] == "yes" else 0
+        metadata["data_rows"] = max(metadata["lines"] - header_rows, 0)
+    return metadata
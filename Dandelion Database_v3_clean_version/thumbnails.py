@@ -0,0 +1,113 @@
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+# WebP previews of image uploads, cached on disk so the files table can show
+# them without anyone downloading the (often 10-50 MB) original. Cache files
+# are keyed by the upload's content hash, so deduplicated uploads share them,
+# and a hit bumps the file's mtime, which is what LRU eviction goes by.
+
+BASE_DIR = Path(__file__).resolve().parent
+THUMB_DIR = Path(os.environ.get("THUMB_CACHE_DIR", str(BASE_DIR / "ThumbCache")))
+THUMB_CACHE_MAX_BYTES = int(os.environ.get("THUMB_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Generate the default size right after upload instead of on first view
+THUMBS_EAGER = os.environ.get("THUMBS_EAGER", "1") == "1"
+
+THUMB_SIZES = (128, 256, 512)
+DEFAULT_THUMB_SIZE = 256
+WEBP_QUALITY = 80
+
+
+def is_previewable(row) -> bool:
+    return (row["mime_type"] or "").startswith("image/")
+
+
+def snap_size(size) -> int:
+    """Map a requested size onto the nearest size we generate."""
+    if not size:
+        return DEFAULT_THUMB_SIZE
+    return min(THUMB_SIZES, key=lambda s: abs(s - size))
+
+
+def cache_key(row) -> str:
+    """Content hash when we have one; older rows fall back to their id."""
+    return row["sha256"] or f"file-{row['id']}"
+
+
+def thumbnail_etag(row, size: int) -> str:
+    return f"{cache_key(row)}-{size}"
+
+
+class ThumbnailCache:
+    def __init__(self, directory: Path = THUMB_DIR, max_bytes: int = THUMB_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = None  # bytes on disk, scanned lazily on first write
+
+    def path_for(self, key: str, size: int) -> Path:
+        return self.directory / key[:2] / f"{key}_{size}.webp"
+
+    def get(self, key: str, source_path, size: int) -> Path:
+        """Return the cached thumbnail, rendering it first if needed."""
+        path = self.path_for(key, size)
+        try:
+            os.utime(path)  # LRU touch
+            return path
+        except FileNotFoundError:
+            pass
+        self._render(Path(source_path), path, size)
+        return path
+
+    def _render(self, source: Path, dest: Path, size: int):
+        from PIL import Image
+
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with Image.open(source) as img:
+            # Let JPEG decode at a reduced scale instead of full resolution
+            img.draft("RGB", (size, size))
+            img.thumbnail((size, size))
+            if img.mode not in ("RGB", "RGBA"):
+                alpha = "A" in img.getbands() or "transparency" in img.info
+                img = img.convert("RGBA" if alpha else "RGB")
+            fd, tmp = tempfile.mkstemp(dir=str(dest.parent), suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    img.save(f, "WEBP", quality=WEBP_QUALITY)
+                os.replace(tmp, dest)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+        self._account(dest.stat().st_size)
+
+    def _account(self, added: int):
+        with self._lock:
+            if self._total is None:
+                self._total = sum(p.stat().st_size for p in self.directory.rglob("*.webp"))
+            else:
+                self._total += added
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete least recently used thumbnails until the cache is at 90% of its budget."""
+        entries = []
+        for p in self.directory.rglob("*.webp"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(e[1] for e in entries)
+        target = self.max_bytes * 0.9
+        for _, nbytes, p in entries:
+            if total <= target:
+                break
+            p.unlink(missing_ok=True)
+            total -= nbytes
+        self._total = total
+
+
+thumb_cache = ThumbnailCache()
@@ -0,0 +1,189 @@
+import math
+import re
+
+# Metadata values are stored as text, plus a typed copy when they look like a
+# number (num_value) or a date/time (date_value, "YYYY-MM-DD HH:MM:SS" like
+# files.created_at). Both typed columns are indexed with meta_key, so filters
+# such as pages>100 or captured_at>=2024-05-01 are index range scans instead
+# of parsing every row's text in Python.
+
+_NUMBER = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+# ISO 8601 (what the extractors write) and EXIF's 2024:05:17 14:03:22 (older rows)
+_DATE = re.compile(r"(\d{4})[-:](\d{2})[-:](\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2}))?)?")
+_RESOLUTION = re.compile(r"\s*(\d+)\s*[xX×]\s*(\d+)\s*")
+
+# Keys that hold "WxH" and the numeric keys they are split into
+SPLIT_KEYS = {
+    "resolution": ("width", "height"),
+}
+
+
+def parse_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+    elif isinstance(value, str) and _NUMBER.fullmatch(value.strip()):
+        number = float(value)
+    else:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def parse_date(value):
+    """Normalized "YYYY-MM-DD HH:MM:SS" for a date-like string (time zone dropped), else None."""
+    if not isinstance(value, str):
+        return None
+    m = _DATE.match(value.strip())
+    if not m:
+        return None
+    year, month, day, hour, minute, second = m.groups()
+    if not ("01" <= month <= "12" and "01" <= day <= "31"):
+        return None
+    return f"{year}-{month}-{day} {hour or '00'}:{minute or '00'}:{second or '00'}"
+
+
+def typed_values(value):
+    """(num_value, date_value) for one metadata value."""
+    number = parse_number(value)
+    return number, (parse_date(value) if number is None else None)
+
+
+def normalize_metadata(metadata: dict) -> dict:
+    """metadata plus numeric keys split out of "WxH" fields (width/height from resolution)."""
+    extra = {}
+    for key, parts in SPLIT_KEYS.items():
+        value = metadata.get(key)
+        m = _RESOLUTION.fullmatch(value) if isinstance(value, str) else None
+        if m:
+            for part, number in zip(parts, m.groups()):
+                if part not in metadata:
+                    extra[part] = int(number)
+    return {**metadata, **extra} if extra else metadata
+
+
+def backfill_typed_metadata(conn, batch: int = 10000):
+    """Fill num_value/date_value (and split keys) for rows written before they existed."""
+    last = (0, "")
+    while True:
+        rows = conn.execute(
+            """
+            SELECT file_id, meta_key, meta_value FROM metadata
+            WHERE (file_id, meta_key) > (?, ?)
+            ORDER BY file_id, meta_key LIMIT ?;
+            """,
+            (*last, batch),
+        ).fetchall()
+        if not rows:
+            return
+        conn.executemany(
+            "UPDATE metadata SET num_value = ?, date_value = ? WHERE file_id = ? AND meta_key = ?;",
+            [(*typed_values(r[2]), r[0], r[1]) for r in rows],
+        )
+        split = []
+        for r in rows:
+            if r[1] in SPLIT_KEYS:
+                for key, value in normalize_metadata({r[1]: r[2]}).items():
+                    if key != r[1]:
+                        split.append((r[0], key, str(value), float(value)))
+        conn.executemany(
+            "INSERT OR IGNORE INTO metadata (file_id, meta_key, meta_value, num_value) VALUES (?, ?, ?, ?);",
+            split,
+        )
+        last = (rows[-1][0], rows[-1][1])
+
+
+# Filters: "key op value" clauses, e.g. "pages>100", "width>=4000",
+# "captured_at>=2024-05-01", "format=PDF". Several clauses can share one
+# ?filter= value separated by commas, and all of them must match.
+_FILTER = re.compile(r"\s*([A-Za-z0-9_.\-]+)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*")
+
+# Columns of files itself that can be filtered on like metadata keys
+FILE_COLUMN_FILTERS = ("filename", "size_bytes", "mime_type", "created_at", "metadata_status", "user_id")
+
+
+def parse_filters(values):
+    """[(key, op, value), ...] from ?filter= values. Raises ValueError on a bad clause."""
+    filters = []
+    for value in values:
+        for clause in value.split(","):
+            if not clause.strip():
+                continue
+            m = _FILTER.fullmatch(clause)
+            if not m or not m.group(3):
+                raise ValueError(f"Bad filter {clause.strip()!r}: expected key=value, key>value, ...")
+            filters.append(m.groups())
+    return filters
+
+
+def _condition(column, op, value, whole_day=False):
+    """SQL condition and params for one comparison; whole_day makes = / != cover the entire date."""
+    if whole_day and op in ("=", "!="):
+        cond = f"{column} >= ? AND {column} < date(?, '+1 day')"
+        return (cond if op == "=" else f"NOT ({cond})"), [value, value]
+    return f"{column} {op} ?", [value]
+
+
+def _clause(key, op, raw):
+    """(condition, params) for one filter: over files for file columns, over metadata otherwise."""
+    number = parse_number(raw)
+    date = parse_date(raw) if number is None else None
+    if key in FILE_COLUMN_FILTERS:
+        # created_at is kept in the same "YYYY-MM-DD HH:MM:SS" form as date_value
+        column = key
+    else:
+        column = "num_value" if number is not None else "date_value" if date is not None else "meta_value"
+    value = number if number is not None else date if date is not None else raw
+    return _condition(column, op, value, whole_day=date is not None and len(raw) == 10)
+
+
+def filter_sql(filters, correlated=False):
+    """
+    WHERE fragment (over files) and params for parsed filters. A number
+    compares num_value, a date date_value and anything else the text, so each
+    clause is a seek into the matching (meta_key, value, file_id) index.
+
+    By default each metadata clause is `id IN (subquery)`, which collects the
+    matching ids first; that is what a COUNT or a selective filter wants.
+    correlated=True writes EXISTS probes instead, so a listing walked in
+    index order stops after one page when most files match.
+    """
+    conditions = []
+    params = []
+    for key, op, raw in filters:
+        cond, cond_params = _clause(key, op, raw)
+        if key not in FILE_COLUMN_FILTERS:
+            if correlated:
+                cond = f"EXISTS (SELECT 1 FROM metadata m WHERE m.file_id = files.id AND m.meta_key = ? AND {cond})"
+            else:
+                cond = f"id IN (SELECT file_id FROM metadata WHERE meta_key = ? AND {cond})"
+            cond_params = [key, *cond_params]
+        conditions.append(cond)
+        params.extend(cond_params)
+    return " AND ".join(f"({c})" for c in conditions), params
+
+
+def prefer_correlated(conn, filters, page_size) -> bool:
+    """
+    Whether a page of filtered files is cheaper to find by probing files in
+    listing order (filter_sql(correlated=True)) than by collecting and sorting
+    every match. Probing reads about page_size * total / matches rows and
+    collecting reads matches, so it wins once matches > sqrt(page_size * total).
+    Each clause's matches are counted from its index only up to that threshold,
+    so deciding never costs more than a page of the cheaper plan.
+    """
+    clauses = [(key, *_clause(key, op, raw)) for key, op, raw in filters if key not in FILE_COLUMN_FILTERS]
+    if not clauses:
+        return True
+    # MAX(id) is one b-tree step and close enough to the row count
+    total = conn.execute("SELECT MAX(id) FROM files;").fetchone()[0] or 0
+    cap = math.isqrt(page_size * total) + 1
+    for key, cond, cond_params in clauses:
+        matches = conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM metadata WHERE meta_key = ? AND {cond} LIMIT ?);",
+            (key, *cond_params, cap),
+        ).fetchone()[0]
+        # The rarest clause decides, so one under the threshold settles it
+        if matches < cap:
+            return False
+    return True
@@ -0,0 +1,139 @@
+import csv
+import io
+import json
+import os
+import time
+import zipfile
+from ingest import CHUNK_SIZE
+
+# Streaming ZIP export. The archive is produced member by member into a small
+# write buffer that is drained after every chunk, so the response starts at
+# once and memory stays at roughly one CHUNK_SIZE no matter how large the
+# export is (plus a small central-directory entry per member). zipfile
+# handles the unseekable output itself by writing a data descriptor after
+# each member, and ZIP64 records where sizes need them.
+
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_FIELDS = ("file_id", "archive_name", "filename", "mime_type", "size_bytes",
+                   "sha256", "created_at", "comment", "metadata")
+
+# Formats that are already compressed; deflating them again costs CPU for
+# a few bytes at best, so they are stored as-is.
+STORED_PREFIXES = ("image/", "audio/", "video/")
+STORED_TYPES = {
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-bzip2",
+    "application/x-xz",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+# Uncompressed image formats are the exception to the image/ rule
+DEFLATED_TYPES = {"image/bmp", "image/tiff", "image/svg+xml", "image/x-portable-pixmap"}
+
+
+class _Sink:
+    """Write-only file object zipfile writes into; the generator drains it."""
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def write(self, data):
+        self._buf += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def compress_type_for(mime_type) -> int:
+    mime_type = (mime_type or "").lower()
+    if mime_type in DEFLATED_TYPES:
+        return zipfile.ZIP_DEFLATED
+    if mime_type in STORED_TYPES or mime_type.startswith(STORED_PREFIXES):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def archive_name(row) -> str:
+    # Filenames are not unique in the archive, ids are
+    return f"files/{row['id']}-{row['filename']}"
+
+
+def _zip_info(name, date_time=None, compress_type=zipfile.ZIP_DEFLATED, size=0):
+    info = zipfile.ZipInfo(name, date_time=date_time or (1980, 1, 1, 0, 0, 0))
+    info.compress_type = compress_type
+    info.external_attr = 0o644 << 16
+    # Lets zipfile decide up front whether this member needs ZIP64 headers
+    info.file_size = size
+    return info
+
+
+def _date_time(created_at):
+    try:
+        day, clock = str(created_at).split(" ")
+        return tuple(int(x) for x in day.split("-")) + tuple(int(x) for x in clock.split(":")[:3])
+    except (ValueError, TypeError):
+        return None
+
+
+def _write_archive(sink, batches, path_of):
+    """Write the archive into sink, yielding whenever there is output to send."""
+    with zipfile.ZipFile(sink, "w", allowZip64=True) as zf:
+        manifest = _zip_info(MANIFEST_NAME, time.localtime()[:6])
+        with zf.open(manifest, "w") as raw:
+            out = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+            writer = csv.writer(out)
+            writer.writerow(MANIFEST_FIELDS)
+            for rows, metadata in batches(with_metadata=True):
+                for r in rows:
+                    writer.writerow((
+                        r["id"], archive_name(r), r["filename"], r["mime_type"], r["size_bytes"],
+                        r["sha256"], r["created_at"], r["comment"],
+                        json.dumps(metadata.get(r["id"], {}), ensure_ascii=False, sort_keys=True),
+                    ))
+                out.flush()
+                yield
+            out.detach()
+
+        for rows, _ in batches(with_metadata=False):
+            for r in rows:
+                try:
+                    src = open(path_of(r), "rb")
+                except OSError:
+                    continue
+                with src:
+                    info = _zip_info(archive_name(r), _date_time(r["created_at"]),
+                                     compress_type_for(r["mime_type"]), os.fstat(src.fileno()).st_size)
+                    with zf.open(info, "w") as dest:
+                        while chunk := src.read(CHUNK_SIZE):
+                            dest.write(chunk)
+                            yield
+    yield
+
+
+def stream_zip(batches, path_of):
+    """
+    Yield a ZIP archive of the files produced by batches(with_metadata), a
+    callable returning an iterator of (rows, metadata_by_id); path_of(row)
+    says where a row's content is on disk. batches is called
+    twice: once for the manifest, which is written first so a partial
+    download still says what it was meant to contain, and once (without
+    metadata) for the file contents.
+    Files that vanished from disk in between are left out.
+    """
+    sink = _Sink()
+    for _ in _write_archive(sink, batches, path_of):
+        data = sink.drain()
+        if data:
+            yield data
@@ -1,6 +1,8 @@
 
 from pathlib import Path
 from mimetypes import guess_type
+import os
+import uuid
 
 from flask import (
     Flask, render_template, request, redirect,
@@ -14,19 +16,18 @@ from db import ensure_db, get_conn
 UPLOAD_DIR = Path(r"C:\Users\lacky\PyCharmMiscProject\Database\Uploads")
 
 def _unique_path(directory: Path, filename: str) -> Path:
+    """Reserve a new, never-used path for an upload (random token + safe name)."""
     safe = secure_filename(filename or "")
     if not safe:
         safe = "upload"
-    target = directory / safe
-    if not target.exists():
-        return target
-    stem, suffix = target.stem, target.suffix
-    i = 1
     while True:
-        candidate = directory / f"{stem}_{i}{suffix}"
-        if not candidate.exists():
-            return candidate
-        i += 1
+        candidate = directory / f"{uuid.uuid4().hex}_{safe}"
+        try:
+            fd = os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            continue
+        os.close(fd)
+        return candidate
 
 def _render_index(error=None):
     with get_conn() as conn:
@@ -79,9 +80,11 @@ def create_app():
         try:
             file.save(str(dest))
         except Exception as e:
+            # Drop the placeholder _unique_path reserved
+            dest.unlink(missing_ok=True)
             return _render_index(error=f"Failed to save file: {e}"), 500
 
-        filename = dest.name
+        filename = secure_filename(file.filename) or "upload"
         size_bytes = dest.stat().st_size
         mime_type = file.mimetype or guess_type(str(dest))[0]
 